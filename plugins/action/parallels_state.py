@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from ansible.plugins.action import ActionBase
+
+
+class ActionModule(ActionBase):
+    """Change the Parallels Desktop app state and refresh the facts in one go."""
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = frozenset(('state', 'sdk_version_cache'))
+
+    def build_module_call(self):  # type: () -> tuple[str, dict]
+        """Return the name and arguments of the module doing all the work.
+
+        Without a ``state``, only the facts are gathered. Otherwise the
+        ``parallels_desktop`` module gathers them itself once the state is
+        achieved, so both happen in the same remote execution.
+        """
+        module_args = {}
+        if self._task.args.get('sdk_version_cache') is not None:
+            module_args['sdk_version_cache'] = self._task.args['sdk_version_cache']
+
+        state = self._task.args.get('state')
+        if state is None:
+            return 'samdoran.macos.parallels_facts', module_args
+
+        module_args.update({'state': state, 'gather_facts': True})
+        return 'samdoran.macos.parallels_desktop', module_args
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp  # tmp no longer has any effect
+
+        module_name, module_args = self.build_module_call()
+
+        result.update(self._execute_module(
+            module_name=module_name,
+            module_args=module_args,
+            task_vars=task_vars,
+        ))
+        return result
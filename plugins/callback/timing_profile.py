@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+name: timing_profile
+type: aggregate
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Write per-host timing profiles of the tasks of this collection
+requirements:
+  - Enable the plugin with C(callbacks_enabled) in C(ansible.cfg) or C(ANSIBLE_CALLBACKS_ENABLED).
+description:
+  - Record how long every task running a C(samdoran.macos) module, or
+    belonging to a C(samdoran.macos) role, took on each host.
+  - Timing data returned by the modules is recorded along with the task
+    duration. This is the C(command_stats) summary, reported when
+    C(SAMDORAN_MACOS_COMMAND_STATS) is set on the target, and any top-level
+    number named C(elapsed), C(duration) or ending in C(_seconds).
+  - The durations are aggregated per host and for the whole run into
+    histograms, per-action totals and the slowest tasks.
+  - A JSON report with the aggregates and the records, and a CSV file with
+    one row per record, are written in I(output_dir) at the end of every
+    play. Both are rewritten as the run goes on.
+options:
+  output_dir:
+    description: Directory the reports are written to.
+    type: path
+    default: ~/.ansible/timing_profiles
+    env:
+      - name: SAMDORAN_MACOS_TIMING_DIR
+    ini:
+      - section: samdoran_macos_timing_profile
+        key: output_dir
+  slowest:
+    description: Number of tasks listed as the slowest, per host and for the whole run.
+    type: int
+    default: 10
+    env:
+      - name: SAMDORAN_MACOS_TIMING_SLOWEST
+    ini:
+      - section: samdoran_macos_timing_profile
+        key: slowest
+  buckets:
+    description: Upper bounds, in seconds, of the histogram buckets. Longer tasks are counted in a last bucket.
+    type: list
+    elements: float
+    default: [1, 5, 15, 60, 300]
+    env:
+      - name: SAMDORAN_MACOS_TIMING_BUCKETS
+    ini:
+      - section: samdoran_macos_timing_profile
+        key: buckets
+"""
+
+import csv
+import json
+import os
+import re
+import time
+
+from ansible.module_utils.common.text.converters import to_text
+from ansible.plugins.callback import CallbackBase
+
+
+COLLECTION_NAME = 'samdoran.macos'
+TIMING_KEY_RE = re.compile(r'^(?:elapsed|duration|\w+_seconds)$')
+COMMAND_STATS_KEYS = ('count', 'failed', 'timed_out', 'total_seconds', 'max_seconds')
+CSV_FIELDS = (
+    'host', 'play', 'role', 'task', 'action', 'status', 'started_at', 'duration',
+    'command_count', 'command_seconds',
+)
+
+
+def get_task_action(task):  # type: (...) -> str
+    """Return the FQCN of the task action when it is known."""
+    # NOTE: ansible-core 2.19 warns when `resolved_action` is read before the
+    # NOTE: action was resolved, so look at the value it is computed from.
+    if hasattr(task, '_resolved_action'):
+        return task._resolved_action or task.action
+    return getattr(task, 'resolved_action', None) or task.action
+
+
+def get_task_role(task):  # type: (...) -> str | None
+    role = getattr(task, '_role', None)
+    if role is None:
+        return None
+    collection = getattr(role, '_role_collection', None)
+    name = role.get_name()
+    if collection and not name.startswith(collection + '.'):
+        return '{0}.{1}'.format(collection, name)
+    return name
+
+
+def is_collection_task(action, role):  # type: (str, str | None) -> bool
+    prefix = COLLECTION_NAME + '.'
+    return action.startswith(prefix) or (role or '').startswith(prefix)
+
+
+def extract_timing(result):  # type: (dict) -> dict
+    """Pick the timing data out of a module result, summing loop items."""
+    timing = {}
+    items = result.get('results') if isinstance(result.get('results'), list) else [result]
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        for key, value in item.items():
+            if TIMING_KEY_RE.match(key) and isinstance(value, (int, float)) and not isinstance(value, bool):
+                timing[key] = round(timing.get(key, 0) + value, 6)
+        command_stats = item.get('command_stats')
+        if isinstance(command_stats, dict):
+            totals = timing.setdefault('command_stats', dict.fromkeys(COMMAND_STATS_KEYS, 0))
+            for key in COMMAND_STATS_KEYS:
+                if key == 'max_seconds':
+                    totals[key] = max(totals[key], command_stats.get(key, 0))
+                else:
+                    totals[key] = round(totals[key] + command_stats.get(key, 0), 6)
+    return timing
+
+
+def build_histogram(durations, buckets):  # type: (list[float], list[float]) -> dict[str, int]
+    bounds = sorted(buckets)
+    histogram = dict(('<={0:g}s'.format(bound), 0) for bound in bounds)
+    histogram['>{0:g}s'.format(bounds[-1]) if bounds else 'all'] = 0
+    labels = list(histogram)
+    for duration in durations:
+        for bound, label in zip(bounds, labels):
+            if duration <= bound:
+                histogram[label] += 1
+                break
+        else:
+            histogram[labels[-1]] += 1
+    return histogram
+
+
+def summarize_records(records, buckets, slowest):  # type: (list[dict], list[float], int) -> dict
+    durations = [record['duration'] for record in records]
+    actions = {}
+    for record in records:
+        action = actions.setdefault(record['action'], {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+        action['count'] += 1
+        action['total_seconds'] = round(action['total_seconds'] + record['duration'], 6)
+        action['max_seconds'] = max(action['max_seconds'], record['duration'])
+    return {
+        'task_count': len(records),
+        'total_seconds': round(sum(durations), 6),
+        'histogram': build_histogram(durations, buckets),
+        'actions': actions,
+        'slowest': sorted(records, key=lambda record: record['duration'], reverse=True)[:slowest],
+    }
+
+
+class CallbackModule(CallbackBase):
+    """Record the duration of the collection tasks on every host."""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'samdoran.macos.timing_profile'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, *args, **kwargs):
+        super(CallbackModule, self).__init__(*args, **kwargs)
+        self.started_at = time.time()
+        self.playbook_name = 'playbook'
+        self.play_name = None
+        self.report_base = None
+        self.task_started = {}
+        self.host_started = {}
+        self.records = []
+
+    def v2_playbook_on_start(self, playbook):
+        self.playbook_name = os.path.splitext(os.path.basename(playbook._file_name))[0]
+
+    def v2_playbook_on_play_start(self, play):
+        if self.records:
+            self.write_reports()
+        self.play_name = play.get_name()
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self.task_started[task._uuid] = time.time()
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.task_started[task._uuid] = time.time()
+
+    def v2_runner_on_start(self, host, task):
+        self.host_started[(host.get_name(), task._uuid)] = time.time()
+
+    def v2_runner_on_ok(self, result):
+        self.record(result, 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self.record(result, 'failed')
+
+    def v2_runner_on_skipped(self, result):
+        self.record(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        self.record(result, 'unreachable')
+
+    def v2_playbook_on_stats(self, stats):
+        self.write_reports()
+
+    def record(self, result, status):
+        finished_at = time.time()
+        task = result._task
+        host_name = result._host.get_name()
+        action = get_task_action(task)
+        role = get_task_role(task)
+        started_at = self.host_started.pop((host_name, task._uuid), None)
+        if started_at is None:
+            started_at = self.task_started.get(task._uuid, finished_at)
+        if not is_collection_task(action, role):
+            return
+
+        self.records.append({
+            'host': host_name,
+            'play': self.play_name,
+            'role': role,
+            'task': task.get_name(),
+            'action': action,
+            'status': status,
+            'started_at': round(started_at, 6),
+            'duration': round(finished_at - started_at, 6),
+            'timing': extract_timing(result._result),
+        })
+
+    def build_report(self):  # type: () -> dict
+        # NOTE: List elements read from the environment are not converted.
+        buckets = sorted(float(bound) for bound in self.get_option('buckets'))
+        slowest = self.get_option('slowest')
+        by_host = {}
+        for record in self.records:
+            by_host.setdefault(record['host'], []).append(record)
+        return {
+            'playbook': self.playbook_name,
+            'started_at': round(self.started_at, 6),
+            'updated_at': round(time.time(), 6),
+            'buckets': buckets,
+            'summary': summarize_records(self.records, buckets, slowest),
+            'hosts': dict(
+                (host, summarize_records(records, buckets, slowest))
+                for host, records in by_host.items()
+            ),
+            'records': self.records,
+        }
+
+    def write_reports(self):  # type: () -> None
+        output_dir = os.path.expanduser(self.get_option('output_dir'))
+        if self.report_base is None:
+            self.report_base = os.path.join(output_dir, '{name!s}-{stamp!s}-{pid:d}'.format(
+                name=self.playbook_name,
+                stamp=time.strftime('%Y%m%dT%H%M%S', time.localtime(self.started_at)),
+                pid=os.getpid(),
+            ))
+
+        try:
+            if not os.path.isdir(output_dir):
+                os.makedirs(output_dir)
+            with open(self.report_base + '.json', 'w') as json_file:
+                json.dump(self.build_report(), json_file, indent=2, sort_keys=True)
+            with open(self.report_base + '.csv', 'w') as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS)
+                writer.writeheader()
+                for record in self.records:
+                    command_stats = record['timing'].get('command_stats', {})
+                    writer.writerow(dict(
+                        ((field, record[field]) for field in CSV_FIELDS if field in record),
+                        command_count=command_stats.get('count', ''),
+                        command_seconds=command_stats.get('total_seconds', ''),
+                    ))
+        except (IOError, OSError) as report_err:
+            self._display.warning('Failed to write the timing profile to {0}: {1}'.format(
+                self.report_base, to_text(report_err),
+            ))
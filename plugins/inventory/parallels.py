@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+name: parallels
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Parallels Desktop virtual machines inventory source
+description:
+  - Build an inventory of the virtual machines registered on Parallels
+    Desktop hosts, from the output of C(prlctl list --full --all --json).
+  - C(prlctl) is run locally for C(localhost) and over C(ssh) for the other
+    hosts, several hosts at a time.
+  - Every VM is added to the C(parallels_<status>) group and to the
+    C(parallels_host_<host>) group of the host it runs on.
+  - The configured IP address of a VM becomes its C(ansible_host).
+  - The VM listings can be kept in the inventory cache, so that the hosts
+    are only queried again once I(cache_timeout) has passed.
+notes:
+  - VM names are used as inventory host names, so they must be unique across I(hosts).
+extends_documentation_fragment:
+  - constructed
+  - inventory_cache
+options:
+  plugin:
+    description: Token that ensures this is a source file for the C(parallels) plugin.
+    required: true
+    choices: [samdoran.macos.parallels]
+  hosts:
+    description: Parallels Desktop hosts to list the virtual machines of.
+    type: list
+    elements: str
+    default: [localhost]
+  prlctl_path:
+    description: Path of C(prlctl) on the Parallels Desktop hosts.
+    type: str
+    default: /usr/local/bin/prlctl
+  ssh_executable:
+    description: SSH client used to reach the hosts other than C(localhost).
+    type: str
+    default: ssh
+  ssh_args:
+    description: Extra arguments given to I(ssh_executable).
+    type: list
+    elements: str
+    default: [-o, BatchMode=yes]
+  timeout:
+    description: Seconds to wait for the VM listing of each host.
+    type: int
+    default: 30
+  max_workers:
+    description: Number of hosts queried at the same time.
+    type: int
+    default: 8
+"""
+
+EXAMPLES = """
+# parallels.yml
+plugin: samdoran.macos.parallels
+hosts:
+  - mac-ci-01.example.com
+  - mac-ci-02.example.com
+cache: true
+cache_plugin: ansible.builtin.jsonfile
+cache_connection: ~/.ansible/cache/parallels_inventory
+cache_timeout: 600
+keyed_groups:
+  - key: parallels_name.split('-')[0]
+    prefix: os
+"""
+
+from ansible.errors import AnsibleParserError
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable, Constructable
+
+from ..module_utils.command_runner import CommandRunner, run_concurrently
+from ..module_utils.parallels import (
+    PRLCTL_LIST_ARGS,
+    get_vm_address,
+    get_vm_uuid,
+    parse_vm_list,
+)
+from ..module_utils.python_runtime_compat import shlex_join
+
+
+LOCAL_HOSTS = frozenset(('localhost', '127.0.0.1', '::1'))
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+
+    NAME = 'samdoran.macos.parallels'
+
+    def verify_file(self, path):
+        return (
+            super(InventoryModule, self).verify_file(path)
+            and path.endswith(('parallels.yml', 'parallels.yaml'))
+        )
+
+    def build_command(self, host):  # type: (str) -> list[str]
+        command = [self.get_option('prlctl_path')] + list(PRLCTL_LIST_ARGS)
+        if host in LOCAL_HOSTS:
+            return command
+        return (
+            [self.get_option('ssh_executable')]
+            + list(self.get_option('ssh_args'))
+            + [host, shlex_join(command)]
+        )
+
+    def query_hosts(self):  # type: () -> dict[str, list[dict]]
+        """Return the VM listing of every host, skipping unreachable ones."""
+        hosts = self.get_option('hosts')
+        runner = CommandRunner(self.display, default_timeout=self.get_option('timeout'))
+        outcomes = run_concurrently(
+            lambda host: runner.run(self.build_command(host), check=False),
+            hosts,
+            max_workers=self.get_option('max_workers'),
+        )
+
+        vm_lists = {}
+        for host, (res, exc) in zip(hosts, outcomes):
+            if exc is None and res['rc'] == 0:
+                try:
+                    vm_lists[host] = parse_vm_list(res['stdout'])
+                except ValueError as parse_err:
+                    exc = parse_err
+                else:
+                    continue
+            reason = exc if exc is not None else res['stderr'].strip() or 'rc={0}'.format(res['rc'])
+            if self.get_option('strict'):
+                raise AnsibleParserError('Failed to list the VMs of {0}: {1}'.format(host, reason))
+            self.display.warning('Skipping Parallels host {0}: {1}'.format(host, reason))
+        return vm_lists
+
+    def populate(self, vm_lists):  # type: (dict[str, list[dict]]) -> None
+        strict = self.get_option('strict')
+        for parallels_host, vm_list in sorted(vm_lists.items()):
+            host_group = self.inventory.add_group(
+                'parallels_host_{0}'.format(self._sanitize_group_name(parallels_host)),
+            )
+            for vm in vm_list:
+                name = self.inventory.add_host(vm['name'], group=host_group)
+                status_group = self.inventory.add_group(
+                    'parallels_{0}'.format(self._sanitize_group_name(vm['status'])),
+                )
+                self.inventory.add_child(status_group, name)
+
+                hostvars = {
+                    'parallels_name': vm['name'],
+                    'parallels_uuid': get_vm_uuid(vm),
+                    'parallels_status': vm['status'],
+                    'parallels_ip': get_vm_address(vm),
+                    'parallels_host': parallels_host,
+                }
+                for var_name, var_value in hostvars.items():
+                    self.inventory.set_variable(name, var_name, var_value)
+                if hostvars['parallels_ip'] is not None:
+                    self.inventory.set_variable(name, 'ansible_host', hostvars['parallels_ip'])
+
+                self._set_composite_vars(self.get_option('compose'), hostvars, name, strict=strict)
+                self._add_host_to_composed_groups(self.get_option('groups'), hostvars, name, strict=strict)
+                self._add_host_to_keyed_groups(self.get_option('keyed_groups'), hostvars, name, strict=strict)
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache=cache)
+        self._read_config_data(path)
+
+        cache_key = self.get_cache_key(path)
+        user_cache_setting = self.get_option('cache')
+        attempt_to_read_cache = user_cache_setting and cache
+        cache_needs_update = user_cache_setting and not cache
+
+        vm_lists = None
+        if attempt_to_read_cache:
+            try:
+                vm_lists = self._cache[cache_key]
+            except KeyError:
+                cache_needs_update = True
+
+        if vm_lists is None:
+            vm_lists = self.query_hosts()
+        if cache_needs_update:
+            self._cache[cache_key] = vm_lists
+
+        self.populate(vm_lists)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Archive extraction helpers shared by the modules."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+import os
+import shutil
+import stat
+from contextlib import closing
+
+try:
+    import typing as t  # noqa: F401
+except ImportError:
+    pass
+
+
+COPY_BUFSIZE = 1024 * 1024
+
+
+def extract_zip_member(archive, info, dest):  # type: (t.Any, t.Any, str) -> None
+    """Extract one member, keeping the permissions and symlinks of the zip."""
+    target = os.path.realpath(os.path.join(dest, info.filename))
+    if os.path.commonprefix([target, os.path.realpath(dest) + os.sep]) != os.path.realpath(dest) + os.sep:
+        raise ValueError('Refusing to extract {0!r} outside of {1}'.format(info.filename, dest))
+
+    mode = info.external_attr >> 16
+    if info.filename.endswith('/'):
+        if not os.path.isdir(target):
+            os.makedirs(target)
+        return
+
+    parent = os.path.dirname(target)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+
+    if os.path.lexists(target) and (stat.S_ISLNK(mode) or os.path.islink(target)):
+        os.unlink(target)
+
+    if stat.S_ISLNK(mode):
+        os.symlink(archive.read(info), target)
+        return
+
+    # NOTE: Nested and closing() since Python 2.6 has neither multiple
+    # NOTE: context managers per `with` nor a context manager ZipExtFile.
+    with closing(archive.open(info)) as member:
+        with open(target, 'wb') as target_file:
+            shutil.copyfileobj(member, target_file, COPY_BUFSIZE)
+    if stat.S_IMODE(mode):
+        os.chmod(target, stat.S_IMODE(mode))
+
+
+__all__ = (  # noqa: WPS410
+    'COPY_BUFSIZE',
+    'extract_zip_member',
+)
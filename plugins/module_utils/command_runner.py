@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Sviatoslav Sydorenko
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Instrumented subprocess runner shared by the collection modules."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+import os
+import shlex
+import subprocess
+import threading
+import time
+
+try:
+    import typing as t  # noqa: F401
+except ImportError:
+    pass
+
+from ansible.module_utils.common.text.converters import to_bytes, to_text
+from ansible.module_utils.six import string_types
+
+try:
+    from ansible.module_utils.common.parameters import remove_values
+except ImportError:  # ansible < 2.10
+    from ansible.module_utils.basic import remove_values
+
+from .python_runtime_compat import shlex_join as _shlex_join  # noqa: WPS300
+
+
+COMMAND_STATS_ENV_VAR = 'SAMDORAN_MACOS_COMMAND_STATS'
+DEFAULT_MAX_WORKERS = 4
+
+_RUNNER_ATTR = '_samdoran_macos_command_runner'
+_TRUTHY_ENV_VALUES = frozenset(('1', 'true', 'yes', 'on'))
+
+
+class ModuleError(RuntimeError):
+    """Exception representing an Ansible module generic failure."""
+
+    def __init__(
+            self,  # noqa: WPS318
+            msg,  # type: str
+            error_args,  # type: dict
+            *args,  # type: list
+            **kwargs  # type: dict
+    ):  # type: (...) -> None
+        """Initialize a module error instance.
+
+        :param msg: Error message, overrides ``error_args['msg']`` if not set.
+
+        :param error_args: A mapping with arbitrary context.
+        """
+        super(ModuleError, self).__init__(msg, *args, **kwargs)
+
+        self.error_args = error_args
+        self.error_args['msg'] = self.error_args.get('msg', msg)
+
+    def __str__(self):  # type: () -> str
+        return self.error_args['msg']
+
+    def __unicode__(self):  # type: () -> str
+        return to_text(str(self))
+
+    def __repr__(self):  # type: () -> str
+        return (
+            '<{cls}(msg={msg!s}, error_args={error_args!s})> '
+            'at 0x{object_address_str:x}'.format(
+                cls=self.__class__.__name__,
+                error_args=repr(self.error_args),
+                msg=repr(str(self)),
+                object_address_str=id(self),
+            )
+        )
+
+
+class CmdFailedError(ModuleError):
+    """Exception representing an arbitraty command failure."""
+
+    def __init__(
+            self,  # noqa: WPS318
+            msg,  # type: str
+            error_args,  # type: dict
+            *args,  # type: list
+            **kwargs  # type: dict
+    ):  # type: (...) -> None
+        """Initialize a failed command error instance.
+
+        :param msg: Error message, overrides ``error_args['msg']`` if not set.
+
+        :param error_args: A mapping with arbitraty context, must contain
+                           ``cmd`` and ``rc`` -- failed command and return
+                           code respectively.
+        """
+        for mandatory_key in 'cmd', 'rc':
+            if mandatory_key not in error_args:
+                raise AssertionError(
+                    '`error_args` argument must contain `{missing_arg!s}` key'.
+                    format(missing_arg=mandatory_key),
+                )
+
+        kwargs['error_args'] = error_args
+        super(CmdFailedError, self).__init__(msg, *args, **kwargs)
+
+    def __str__(self):  # type: () -> str
+        """Render the exception instance as a string."""
+        msg = super(CmdFailedError, self).__str__()
+        return '[rc={rc}] {msg}'.format(msg=msg, rc=self.error_args['rc'])
+
+    def __repr__(self):  # type: () -> str
+        """Render the exception instance representation as a string."""
+        parent_repr = super(CmdFailedError, self).__repr__()
+        return '{parent_repr} [failed with rc={rc}]'.format(
+            parent_repr=parent_repr,
+            rc=self.error_args['rc'],
+        )
+
+
+class CmdTimeoutError(CmdFailedError):
+    """Exception representing a command killed after exceeding its timeout."""
+
+
+def command_stats_requested():  # type: () -> bool
+    """Check whether the command statistics are to be reported."""
+    return (
+        os.environ.get(COMMAND_STATS_ENV_VAR, '').lower()
+        in _TRUTHY_ENV_VALUES
+    )
+
+
+def run_concurrently(
+        func,  # type: t.Callable[[t.Any], t.Any]  # noqa: WPS318
+        items,  # type: t.Iterable[t.Any]
+        max_workers=DEFAULT_MAX_WORKERS,  # type: int
+):  # type: (...) -> list[tuple[t.Any, BaseException | None]]
+    """Call *func* on every item using a bounded number of threads.
+
+    :returns: ``(result, exception)`` pairs in the order of *items*.
+    """
+    items = list(items)
+    outcomes = [(None, None)] * len(items)  # type: list
+    if not items:
+        return outcomes
+
+    pending = list(reversed(list(enumerate(items))))
+    pending_lock = threading.Lock()
+
+    def worker():  # type: () -> None  # noqa: WPS430
+        while True:
+            with pending_lock:
+                if not pending:
+                    return
+                item_index, item = pending.pop()
+            try:
+                outcomes[item_index] = func(item), None
+            except Exception as exc:  # noqa: WPS424
+                outcomes[item_index] = None, exc
+
+    workers = [
+        threading.Thread(target=worker)
+        for _worker_index in range(max(1, min(max_workers, len(items))))
+    ]
+    for worker_thread in workers:
+        worker_thread.daemon = True
+        worker_thread.start()
+    for worker_thread in workers:  # noqa: WPS440
+        worker_thread.join()
+
+    return outcomes
+
+
+class CommandRunner:
+    """Run subprocesses on behalf of a module, recording their timing.
+
+    Every call made through :meth:`run` or :meth:`run_many` is recorded,
+    and the aggregate is attached to module results by :meth:`annotate`
+    when the ``SAMDORAN_MACOS_COMMAND_STATS`` environment variable is set.
+
+    Like :meth:`AnsibleModule.run_command`, the module ``no_log`` values are
+    masked in the command, its output and everything logged or raised.
+    """
+
+    def __init__(
+            self,  # noqa: WPS318
+            module,  # type: t.Any
+            default_timeout=None,  # type: float | None
+    ):  # type: (...) -> None
+        """Initialize a command runner bound to an Ansible module."""
+        self.module = module
+        self.default_timeout = default_timeout
+        self.calls = []  # type: list[dict[str, t.Any]]
+        self._calls_lock = threading.Lock()
+
+    def run(  # noqa: WPS211
+            self,  # noqa: WPS318
+            cmd,  # type: str | list[str] | tuple[str, ...]
+            check=True,  # type: bool
+            data=None,  # type: str | None
+            binary_data=False,  # type: bool
+            timeout=None,  # type: float | None
+            environ_update=None,  # type: dict[str, str] | None
+            cwd=None,  # type: str | None
+    ):  # type: (...) -> dict[str, t.Any]
+        """Invoke given command, recording how long it took.
+
+        :param check: Raise on a non-zero return code.
+        :param data: Text sent to the standard input. A trailing newline
+                     is appended unless *binary_data* is set, like
+                     :meth:`AnsibleModule.run_command` does.
+        :param timeout: Seconds to wait before killing the command.
+
+        A command given as a string is split like a shell would, but not
+        run through one, as :meth:`AnsibleModule.run_command` does.
+
+        :raises CmdTimeoutError: When the command exceeded its timeout.
+        :raises CmdFailedError: On unsuccessful return code if *check* is
+                                set, with the ``errno`` as the return code
+                                when the command could not be started.
+        """
+        if isinstance(cmd, string_types):
+            cmd = shlex.split(cmd)
+        cmd = list(cmd)
+        cmd_string = self._mask(_shlex_join(cmd))
+        if timeout is None:
+            timeout = self.default_timeout
+
+        env = dict(os.environ, LANG='C', LC_ALL='C', LC_MESSAGES='C')
+        env.update(environ_update or {})
+
+        if data is not None and not binary_data:
+            data += '\n'
+
+        self.module.debug('Executing: {cmd!s}'.format(cmd=cmd_string))  # noqa: G001
+        started = time.time()
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE if data is not None else None,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=cwd,
+                env=env,
+                close_fds=True,
+            )
+        except OSError as os_err:
+            return self._fail_to_start(cmd, cmd_string, os_err, started, check)
+        timed_out = threading.Event()
+
+        def kill_on_timeout():  # type: () -> None  # noqa: WPS430
+            timed_out.set()
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, kill_on_timeout)
+            timer.daemon = True
+            timer.start()
+        try:
+            b_stdout, b_stderr = proc.communicate(
+                None if data is None else to_bytes(data),
+            )
+        finally:
+            if timer is not None:
+                timer.cancel()
+        duration = time.time() - started
+
+        res = {
+            'cmd': self._mask(cmd),
+            'cmd_string': cmd_string,
+            'rc': proc.returncode,
+            'stdout': self._mask(to_text(b_stdout, errors='surrogate_or_strict')),
+            'stderr': self._mask(to_text(b_stderr, errors='surrogate_or_strict')),
+            'duration': round(duration, 6),
+        }
+        self._record(res, timed_out.is_set())
+
+        if timed_out.is_set():
+            self.module.debug(
+                'Running `{cmd!s}` timed out after {timeout!s}s'.  # noqa: G001
+                format(cmd=cmd_string, timeout=timeout),
+            )
+            raise CmdTimeoutError(
+                'Running `{cmd!s}` timed out after {timeout!s}s'.
+                format(cmd=cmd_string, timeout=timeout),
+                error_args=res,
+            )
+
+        if check and proc.returncode != 0:
+            self.module.debug(
+                'Running `{cmd!s}` failed with the return '  # noqa: G001
+                'code of `{rc:d}`'.
+                format(cmd=cmd_string, rc=proc.returncode),
+            )
+            raise CmdFailedError(
+                'Running `{cmd!s}` was unsuccessful'.
+                format(cmd=cmd_string),
+                error_args=res,
+            )
+
+        self.module.debug(
+            'Running `{cmd!s}` finished in {duration:.3f}s'.  # noqa: G001
+            format(cmd=cmd_string, duration=duration),
+        )
+
+        return res
+
+    def run_many(
+            self,  # noqa: WPS318
+            calls,  # type: t.Iterable[dict[str, t.Any]]
+            max_workers=DEFAULT_MAX_WORKERS,  # type: int
+    ):  # type: (...) -> list[dict[str, t.Any]]
+        """Invoke a batch of commands concurrently.
+
+        :param calls: Keyword arguments for :meth:`run`, one mapping per
+                      command.
+        :param max_workers: Upper bound of commands running at once.
+
+        :returns: Results in the order of *calls*.
+
+        :raises CmdFailedError: The first failure in *calls* order, once
+                                every command has finished.
+        """
+        outcomes = run_concurrently(
+            lambda call_kwargs: self.run(**call_kwargs),
+            calls,
+            max_workers=max_workers,
+        )
+        for _res, exc in outcomes:
+            if exc is not None:
+                raise exc
+        return [res for res, _exc in outcomes]
+
+    def _fail_to_start(
+            self,  # noqa: WPS318
+            cmd,  # type: list[str]
+            cmd_string,  # type: str
+            os_err,  # type: OSError
+            started,  # type: float
+            check,  # type: bool
+    ):  # type: (...) -> dict[str, t.Any]
+        """Report a command that could not be started like a failed one."""
+        res = {
+            'cmd': self._mask(cmd),
+            'cmd_string': cmd_string,
+            'rc': os_err.errno,
+            'stdout': '',
+            'stderr': self._mask(to_text(os_err, errors='surrogate_or_strict')),
+            'duration': round(time.time() - started, 6),
+        }
+        self._record(res, False)
+        self.module.debug(
+            'Running `{cmd!s}` could not start: {err!s}'.  # noqa: G001
+            format(cmd=cmd_string, err=res['stderr']),
+        )
+        if check:
+            raise CmdFailedError(
+                'Running `{cmd!s}` was unsuccessful: {err!s}'.
+                format(cmd=cmd_string, err=res['stderr']),
+                error_args=res,
+            )
+        return res
+
+    def _mask(self, value):  # type: (t.Any) -> t.Any
+        no_log_values = getattr(self.module, 'no_log_values', None)
+        if not no_log_values:
+            return value
+        return remove_values(value, no_log_values)
+
+    def _record(self, res, timed_out):  # type: (dict, bool) -> None
+        with self._calls_lock:
+            self.calls.append({
+                'cmd': res['cmd_string'],
+                'rc': res['rc'],
+                'duration': res['duration'],
+                'timed_out': timed_out,
+            })
+
+    def summary(self):  # type: () -> dict[str, t.Any]
+        """Aggregate the recorded calls."""
+        with self._calls_lock:
+            calls = list(self.calls)
+        durations = [call['duration'] for call in calls]
+        total = sum(durations)
+        return {
+            'count': len(calls),
+            'failed': len([call for call in calls if call['rc'] != 0]),
+            'timed_out': len([call for call in calls if call['timed_out']]),
+            'total_seconds': round(total, 6),
+            'max_seconds': round(max(durations), 6) if durations else 0,
+            'mean_seconds': (
+                round(total / len(durations), 6) if durations else 0
+            ),
+            'calls': calls,
+        }
+
+    def annotate(self, result):  # type: (dict) -> dict
+        """Add ``command_stats`` to a module result, if requested."""
+        if command_stats_requested():
+            result['command_stats'] = self.summary()
+        return result
+
+
+def get_command_runner(module):  # type: (t.Any) -> CommandRunner
+    """Return the command runner attached to *module*, creating it once."""
+    runner = getattr(module, _RUNNER_ATTR, None)
+    if runner is None:
+        runner = CommandRunner(module)
+        setattr(module, _RUNNER_ATTR, runner)
+    return runner
+
+
+__all__ = (  # noqa: WPS410
+    'CmdFailedError',
+    'CmdTimeoutError',
+    'CommandRunner',
+    'ModuleError',
+    'get_command_runner',
+    'run_concurrently',
+)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Parsing of the Parallels Desktop CLI output shared by the plugins."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+import json
+import re
+
+try:
+    import typing as t  # noqa: F401
+except ImportError:
+    pass
+
+
+PRLCTL_LIST_ARGS = ('list', '--full', '--all', '--json')
+NO_ADDRESS = '-'
+# NOTE: `prlctl statistics` prints one `<counter> : <value>` line per counter.
+STATISTICS_LINE_RE = re.compile(r'^\s*(?P<counter>[\w.]+)\s*:\s*(?P<value>-?\d+(?:\.\d+)?)\s*$')
+
+
+def parse_vm_list(stdout):  # type: (str | bytes) -> list[dict[str, t.Any]]
+    """Parse the output of ``prlctl list --full --all --json``."""
+    return json.loads(stdout)
+
+
+def count_running(vm_list):  # type: (list[dict[str, t.Any]]) -> int
+    """Count the VMs in the *running* status."""
+    return len([vm for vm in vm_list if vm['status'] == 'running'])
+
+
+def get_vm_uuid(vm):  # type: (dict[str, t.Any]) -> str
+    """Return the UUID of *vm* without the curly braces ``prlctl`` adds."""
+    return vm['uuid'].strip('{}')
+
+
+def get_vm_address(vm):  # type: (dict[str, t.Any]) -> str | None
+    """Return the configured IP address of *vm*, if any."""
+    address = vm.get('ip_configured')
+    if not address or address == NO_ADDRESS:
+        return None
+    return address
+
+
+def parse_vm_statistics(stdout):  # type: (str) -> dict[str, float]
+    """Parse the numeric counters printed by ``prlctl statistics <vm>``."""
+    counters = {}
+    for line in stdout.splitlines():
+        match = STATISTICS_LINE_RE.match(line)
+        if match is not None:
+            counters[match.group('counter')] = float(match.group('value'))
+    return counters
+
+
+__all__ = (  # noqa: WPS410
+    'PRLCTL_LIST_ARGS',
+    'count_running',
+    'get_vm_address',
+    'get_vm_uuid',
+    'parse_vm_list',
+    'parse_vm_statistics',
+)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Parallels Desktop facts collectors shared by the modules."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+import hashlib
+import json
+import os
+
+from ansible.module_utils.common.process import get_bin_path
+from ansible.module_utils.common.text.converters import to_bytes, to_native
+
+from .command_runner import get_command_runner  # noqa: WPS300
+from .parallels import PRLCTL_LIST_ARGS, count_running, parse_vm_list  # noqa: WPS300
+
+DEFAULT_SDK_VERSION_CACHE = '~/.ansible/cache/samdoran.macos/parallels_sdk.json'
+
+# command: python -c 'import prlsdkapi; prlsdkapi.init_desktop_sdk(); print(prlsdkapi.ApiHelper().get_version()); prlsdkapi.deinit_sdk()'
+
+SDK_PACKAGE_NAME = 'prlsdkapi'
+SDK_FINGERPRINT_SUFFIXES = ('.py', '.so', '.dylib')
+
+
+def find_sdk_package():
+    """Return the path of the installed SDK package without importing it."""
+    try:
+        from importlib.util import find_spec
+    except ImportError:  # Python 2
+        import imp
+        try:
+            return imp.find_module(SDK_PACKAGE_NAME)[1]
+        except ImportError:
+            return None
+
+    try:
+        spec = find_spec(SDK_PACKAGE_NAME)
+    except (ImportError, ValueError):
+        return None
+
+    if spec is None or not spec.origin or not os.path.exists(spec.origin):
+        return None
+
+    if os.path.basename(spec.origin).startswith('__init__.'):
+        return os.path.dirname(spec.origin)
+
+    return spec.origin
+
+
+def get_sdk_fingerprint(sdk_path):
+    """Compute a cheap fingerprint of the SDK package from file metadata."""
+    if os.path.isdir(sdk_path):
+        file_paths = [
+            os.path.join(sdk_path, file_name)
+            for file_name in sorted(os.listdir(sdk_path))
+            if file_name.endswith(SDK_FINGERPRINT_SUFFIXES)
+        ]
+    else:
+        file_paths = [sdk_path]
+
+    digest = hashlib.sha256()
+    for file_path in file_paths:
+        file_stat = os.stat(file_path)
+        digest.update(to_bytes('{path}:{size}:{mtime}\n'.format(
+            path=file_path,
+            size=file_stat.st_size,
+            mtime=file_stat.st_mtime,
+        )))
+
+    return digest.hexdigest()
+
+
+def read_sdk_version_cache(cache_path, fingerprint):
+    try:
+        with open(cache_path, 'r') as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if not isinstance(cache, dict) or cache.get('fingerprint') != fingerprint:
+        return None
+
+    return cache.get('sdk_version')
+
+
+def write_sdk_version_cache(module, cache_path, fingerprint, sdk_version):
+    cache_dir = os.path.dirname(cache_path)
+    try:
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        tmp_path = '{path}.{pid}.tmp'.format(path=cache_path, pid=os.getpid())
+        with open(tmp_path, 'w') as cache_file:
+            json.dump({'fingerprint': fingerprint, 'sdk_version': sdk_version}, cache_file)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError) as err:
+        if module is not None:
+            module.warn('Unable to cache the Parallels SDK version in {path}: {err}'.format(path=cache_path, err=to_native(err)))
+
+
+def query_sdk_version():
+    try:
+        import prlsdkapi
+    except ImportError:
+        return ''
+
+    prlsdkapi.init_desktop_sdk()
+    try:
+        return prlsdkapi.ApiHelper().get_version()
+    finally:
+        prlsdkapi.deinit_sdk()
+
+
+def get_sdk_version(module=None, cache_path=None):
+    sdk_path = find_sdk_package()
+    if sdk_path is None:
+        return ''
+
+    if not cache_path:
+        return to_native(query_sdk_version())
+
+    fingerprint = get_sdk_fingerprint(sdk_path)
+    sdk_version = read_sdk_version_cache(cache_path, fingerprint)
+    if sdk_version is None:
+        sdk_version = to_native(query_sdk_version())
+        # NOTE: Check mode reads the cache but never writes to the target.
+        if sdk_version and not getattr(module, 'check_mode', False):
+            write_sdk_version_cache(module, cache_path, fingerprint, sdk_version)
+
+    return to_native(sdk_version)
+
+
+def get_server_info(module, data):
+    prlsrvctl_bin = None
+    try:
+        prlsrvctl_bin = get_bin_path('prlsrvctl', ['/usr/local/bin/'])
+    except ValueError:
+        pass
+
+    if prlsrvctl_bin is not None:
+        command = [prlsrvctl_bin, 'info', '--json']
+        res = get_command_runner(module).run(command, check=False)
+        if res['rc'] != 0:
+            module.warn('Failed to gather Parallels facts')
+
+        else:
+            srv_info = json.loads(res['stdout'])
+
+            for k in srv_info:
+                data[k.replace(' ', '_')] = srv_info[k]
+
+            # 'Version': 'Desktop 16.0.0-48916',
+            version_string = srv_info['Version']
+            edition, full_version = version_string.split(' ', 1)
+            data['Version'] = {}
+            data['Version']['Edition'] = edition
+            data['Version']['Full'] = full_version
+            data['Version']['Major'] = full_version.split('.')[0]
+            data['Version']['MajorMinor'] = full_version.split('-')[0]
+            data['Version']['Release'] = full_version.split('-')[1]
+
+
+def get_vm_info(module, data):
+    prlctl_bin = None
+    try:
+        prlctl_bin = get_bin_path('prlctl', ['/usr/local/bin'])
+    except ValueError:
+        pass
+
+    if prlctl_bin is not None:
+        command = [prlctl_bin] + list(PRLCTL_LIST_ARGS)
+        res = get_command_runner(module).run(command, check=False)
+        if res['rc'] != 0:
+            module.warn('Failed to gather Parallels virtual machine facts')
+
+        else:
+            data['VMs'] = parse_vm_list(res['stdout'])
+            data['running_vm_count'] = count_running(data['VMs'])
+
+
+def gather_parallels_facts(module, sdk_version_cache=None):
+    """Return the ``parallels`` facts of the host."""
+    parallels_data = {
+        'Version': {
+            'Edition': '',
+            'Full': '',
+            'Major': '',
+            'MajorMinor': '',
+            'Release': '',
+        },
+        'VMs': [],
+        'running_vm_count': 0,
+    }
+
+    get_server_info(module, parallels_data)
+    get_vm_info(module, parallels_data)
+
+    parallels_data['sdk_version'] = get_sdk_version(module, sdk_version_cache)
+    return parallels_data
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Sviatoslav Sydorenko
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Opt-in profiling of module entry points.
+
+Setting ``SAMDORAN_MACOS_PROFILE_DIR`` on the target makes every decorated
+entry point run under :mod:`cProfile` and :mod:`tracemalloc`. Each run
+leaves a ``.pstats`` file and a plain text top-N summary in that directory.
+``SAMDORAN_MACOS_PROFILE_TOP`` controls how many entries the summary lists.
+
+When the variable is unset, the only overhead is one environment lookup
+per module invocation; the profilers are not even imported.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+import functools
+import os
+import sys
+import time
+
+try:
+    import typing as t  # noqa: F401
+except ImportError:
+    pass
+
+
+PROFILE_DIR_ENV_VAR = 'SAMDORAN_MACOS_PROFILE_DIR'
+PROFILE_TOP_ENV_VAR = 'SAMDORAN_MACOS_PROFILE_TOP'
+DEFAULT_PROFILE_TOP = 25
+
+
+def _get_profile_top():  # type: () -> int
+    try:
+        return int(os.environ.get(PROFILE_TOP_ENV_VAR, DEFAULT_PROFILE_TOP))
+    except ValueError:
+        return DEFAULT_PROFILE_TOP
+
+
+def _write_profile_reports(  # noqa: WPS211
+        profile_dir,  # type: str  # noqa: WPS318
+        base_name,  # type: str
+        profiler,  # type: t.Any
+        memory_snapshot,  # type: t.Any
+        peak_memory,  # type: int | None
+        wall_time,  # type: float
+        top,  # type: int
+):  # type: (...) -> None
+    import pstats
+
+    try:
+        from StringIO import StringIO  # Python 2
+    except ImportError:
+        from io import StringIO
+
+    if not os.path.isdir(profile_dir):
+        os.makedirs(profile_dir)
+
+    base_path = os.path.join(profile_dir, base_name)
+    profiler.dump_stats(base_path + '.pstats')
+
+    summary = StringIO()
+    summary.write('Wall time: {wall:.3f}s\n'.format(wall=wall_time))
+    if peak_memory is not None:
+        summary.write('Peak traced memory: {peak:d} bytes\n'.format(
+            peak=peak_memory,
+        ))
+    summary.write('\n')
+
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats('cumulative').print_stats(top)
+
+    if memory_snapshot is not None:
+        summary.write('Top {top:d} allocation sites:\n'.format(top=top))
+        for memory_stat in memory_snapshot.statistics('lineno')[:top]:
+            summary.write('{stat!s}\n'.format(stat=memory_stat))
+
+    with open(base_path + '.txt', 'w') as summary_file:
+        summary_file.write(summary.getvalue())
+
+
+def _run_profiled(
+        entrypoint,  # type: t.Callable[..., t.Any]  # noqa: WPS318
+        name,  # type: str
+        profile_dir,  # type: str
+        args,  # type: tuple
+        kwargs,  # type: dict
+):  # type: (...) -> t.Any
+    import cProfile
+
+    try:
+        import tracemalloc
+    except ImportError:  # Python 2
+        tracemalloc = None
+
+    base_name = '{name!s}-{stamp!s}-{pid:d}'.format(
+        name=name,
+        stamp=time.strftime('%Y%m%dT%H%M%S'),
+        pid=os.getpid(),
+    )
+
+    profiler = cProfile.Profile()
+    if tracemalloc is not None:
+        tracemalloc.start()
+    started = time.time()
+    profiler.enable()
+    try:
+        return entrypoint(*args, **kwargs)
+    finally:
+        # NOTE: Modules leave via `SystemExit` from `exit_json()`, so the
+        # NOTE: reports are written on the way out regardless of outcome.
+        profiler.disable()
+        wall_time = time.time() - started
+        memory_snapshot = None
+        peak_memory = None
+        if tracemalloc is not None:
+            memory_snapshot = tracemalloc.take_snapshot()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        try:
+            _write_profile_reports(
+                profile_dir, base_name, profiler,
+                memory_snapshot, peak_memory, wall_time, _get_profile_top(),
+            )
+        except (IOError, OSError) as profile_err:
+            # NOTE: The module result has already been emitted on stdout.
+            sys.stderr.write(
+                'Failed to write the profile of {name!s}: {err!s}\n'.
+                format(name=name, err=profile_err),
+            )
+
+
+def profile_entrypoint(name):  # type: (str) -> t.Callable
+    """Decorate a module entry point to be profiled on request.
+
+    :param name: Prefix of the report file names, usually the module name.
+    """
+    def decorator(entrypoint):  # type: (t.Callable) -> t.Callable  # noqa: WPS430
+        @functools.wraps(entrypoint)
+        def wrapper(*args, **kwargs):  # type: (...) -> t.Any  # noqa: WPS430
+            profile_dir = os.environ.get(PROFILE_DIR_ENV_VAR)
+            if not profile_dir:
+                return entrypoint(*args, **kwargs)
+
+            return _run_profiled(
+                entrypoint, name, os.path.expanduser(profile_dir),
+                args, kwargs,
+            )
+
+        return wrapper
+
+    return decorator
+
+
+__all__ = ('profile_entrypoint',)  # noqa: WPS410
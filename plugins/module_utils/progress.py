@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Sviatoslav Sydorenko
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Progress files for long-running module invocations.
+
+A module given a progress file path rewrites that file as a single JSON
+document every time it makes progress. The file is replaced atomically, so
+a reader polling it, for example while the module runs under ``async``,
+never sees a partially written document.
+
+The document holds the current ``stage`` and its details, the time
+elapsed since the module started, and one event per stage change.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+import errno
+import json
+import os
+import tempfile
+import time
+
+try:
+    import typing as t  # noqa: F401
+except ImportError:
+    pass
+
+
+PROGRESS_FORMAT = 1
+
+
+class ProgressFile:
+    """Writer of the progress file of one module invocation."""
+
+    def __init__(self, path, **details):  # type: (str | None, t.Any) -> None
+        """Start a progress document, written to *path* if it is set."""
+        self.path = path
+        self.started_at = time.time()
+        self.document = {
+            'format': PROGRESS_FORMAT,
+            'pid': os.getpid(),
+            'started_at': self.started_at,
+            'updated_at': self.started_at,
+            'elapsed': 0.0,
+            'stage': None,
+            'details': {},
+            'finished': False,
+            'failed': False,
+            'msg': None,
+            'events': [],
+        }  # type: dict[str, t.Any]
+        self.document.update(details)
+
+    def update(self, stage, **details):  # type: (str, t.Any) -> None
+        """Record *stage* as current, adding an event when it changed."""
+        now = time.time()
+        elapsed = round(now - self.started_at, 3)
+        if stage != self.document['stage']:
+            self.document['events'].append({
+                'stage': stage,
+                'elapsed': elapsed,
+                'details': details,
+            })
+        self.document.update({
+            'updated_at': now,
+            'elapsed': elapsed,
+            'stage': stage,
+            'details': details,
+        })
+        self.write()
+
+    def refresh(self, **details):  # type: (t.Any) -> None
+        """Update the details of the current stage."""
+        self.update(self.document['stage'], **dict(self.document['details'], **details))
+
+    def finish(self, failed, msg):  # type: (bool, str | None) -> None
+        """Mark the invocation as complete."""
+        self.document.update({'finished': True, 'failed': failed, 'msg': msg})
+        self.update('finished', **self.document['details'])
+
+    def write(self):  # type: () -> None
+        """Replace the progress file with the current document.
+
+        Failing to report progress is not worth failing the module for,
+        so write errors are ignored.
+        """
+        if not self.path:
+            return
+
+        progress_dir = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=progress_dir, prefix='.progress-')
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(self.document, tmp_file, sort_keys=True)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            pass
+
+
+def read_progress(path):  # type: (str) -> dict[str, t.Any] | None
+    """Return the progress document in *path*, ``None`` if there is none yet."""
+    try:
+        with open(path) as progress_file:
+            return json.load(progress_file)
+    except (IOError, OSError):
+        if os.path.exists(path):
+            raise
+        return None
+
+
+def is_process_alive(pid):  # type: (int) -> bool
+    """Tell whether the process *pid* still exists."""
+    try:
+        os.kill(pid, 0)
+    except OSError as os_err:
+        # NOTE: EPERM means the process exists but belongs to someone else.
+        return os_err.errno != errno.ESRCH
+    return True
+
+
+__all__ = (  # noqa: WPS410
+    'ProgressFile',
+    'is_process_alive',
+    'read_progress',
+)
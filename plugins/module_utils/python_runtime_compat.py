@@ -11,7 +11,6 @@ __metaclass__ = type
 
 
 import signal
-import sys
 
 try:
     import typing as t  # noqa: F401
@@ -19,23 +18,27 @@ except ImportError:
     pass
 
 
-from ansible.module_utils.six.moves import shlex_quote as _shlex_quote
+def raise_from(value, from_value):
+    """Raise *value* chained to *from_value*.
 
-if sys.version_info[:2] > (3,):
-    exec("""def raise_from(value, from_value):
+    This has the effect of ``raise value from from_value`` while staying
+    valid Python 2 syntax, which does not need an ``exec()`` trampoline.
+    """
+    if isinstance(value, type):
+        value = value()
+    value.__cause__ = from_value
+    value.__suppress_context__ = True
     try:
-        raise value from from_value
+        raise value
     finally:
         value = None
-""")
-else:
-    def raise_from(value, from_value):
-        raise value
 
 
 try:
     from shlex import join as shlex_join  # Python 3.8+
 except ImportError:
+    from ansible.module_utils.six.moves import shlex_quote as _shlex_quote
+
     # Vendored from
     # https://github.com/python/cpython/blob/e500cc0/Lib/shlex.py#L316-L318
     def shlex_join(  # noqa: WPS440
@@ -63,22 +66,44 @@ except NameError:
             super(TimeoutError, self).__init__(errno, *args, **kwargs)
 
 
-def get_signal_name(signal_constant):  # type: (int | signal.Signals) -> str
+_SIGNAL_NAMES = {}  # type: dict[int, str]
+
+
+def _build_signal_names():  # type: () -> dict[int, str]
     try:
-        return signal.Signals(signal_constant).name  # Python 3
+        return dict(
+            (int(signal_member), signal_member.name)
+            for signal_member in signal.Signals  # Python 3
+        )
     except AttributeError:
         pass
 
     # Python 2:
+    signal_names = {}  # type: dict[int, str]
+    for signal_name in sorted(dir(signal)):  # noqa: WPS421
+        if signal_name.startswith('SIG') and signal_name[3] != '_':
+            signal_names.setdefault(getattr(signal, signal_name), signal_name)
+    return signal_names
+
+
+def get_signal_name(signal_constant):  # type: (int | signal.Signals) -> str
+    """Return the canonical name of *signal_constant*, like ``SIGKILL``.
+
+    :raises LookupError: If the signal is unknown to this platform.
+    """
+    if not _SIGNAL_NAMES:
+        _SIGNAL_NAMES.update(_build_signal_names())
+
     try:
-        return next(
-            signal_name
-            for signal_name in dir(signal)  # noqa: WPS421
-            if signal_name.startswith('SIG') and signal_name[3] != '_'
-            and getattr(signal, signal_name) == signal_constant
+        return _SIGNAL_NAMES[int(signal_constant)]
+    except (KeyError, TypeError, ValueError) as lookup_exc:
+        raise_from(
+            LookupError(
+                'Unknown signal: {signal!r}'.format(signal=signal_constant),
+            ),
+            lookup_exc,
         )
-    except StopIteration as iter_stop_exc:
-        raise raise_from(LookupError, iter_stop_exc)  # MyPy hack
+        raise LookupError  # NOTE: MyPy hack
 
 
-__all__ = ('get_signal_name', 'shlex_join', 'TimeoutError')  # noqa: WPS410
+__all__ = ('get_signal_name', 'raise_from', 'shlex_join', 'TimeoutError')  # noqa: WPS410
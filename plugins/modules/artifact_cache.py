@@ -0,0 +1,534 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: artifact_cache
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Download installers into a persistent content-addressed cache
+notes:
+  - Without I(checksum), a URL found in the cache index is not fetched
+    again. This suits the versioned installer URLs used by the roles of
+    this collection; set I(force) when a URL may serve new content.
+description:
+  - Keep downloaded artifacts in a size-bounded cache on the target,
+    stored under C(objects/<algorithm>/<digest>) in I(cache_dir).
+  - When I(checksum) is known, a cached copy is used without any network
+    access. Otherwise the URL is looked up in the cache index.
+  - Downloads are hashed while streaming and written to a partial file.
+    An interrupted transfer is resumed with an HTTP range request, in the
+    same run up to I(retries) times, or on the next run.
+  - After each run the least recently used artifacts are evicted until
+    the cache fits in I(max_size). The requested artifact is never evicted.
+options:
+  url:
+    description: HTTP, HTTPS or FTP URL of the artifact.
+    type: str
+    required: true
+  checksum:
+    description:
+      - Expected checksum of the artifact, as C(<algorithm>:<hex digest>).
+      - The artifact is stored under that algorithm. C(sha256) is used when unset.
+    type: str
+  dest:
+    description:
+      - Path to symlink to the cached artifact, for tools that expect a given file name.
+      - The file attributes, such as I(owner) and I(mode), are set on the
+        cached artifact the symlink points to.
+    type: path
+  cache_dir:
+    description: Directory of the artifact cache.
+    type: path
+    default: /var/tmp/samdoran.macos/artifacts
+  max_size:
+    description:
+      - Size the cache is trimmed to after each run, in bytes or with a unit such as C(10G).
+    type: str
+    default: 20G
+  force:
+    description: Download the artifact again even when the URL is in the cache index.
+    type: bool
+    default: false
+  retries:
+    description: Number of times an interrupted transfer is resumed within a run.
+    type: int
+    default: 3
+  timeout:
+    description: Timeout in seconds of each HTTP request.
+    type: int
+    default: 30
+  validate_certs:
+    description: Whether to validate the server TLS certificate.
+    type: bool
+    default: true
+extends_documentation_fragment:
+  - ansible.builtin.files
+"""
+
+EXAMPLES = """
+- name: Download the Parallels Desktop installer
+  samdoran.macos.artifact_cache:
+    url: https://download.parallels.com/desktop/v16/16.0.0-48916/ParallelsDesktop-16.0.0-48916.dmg
+    dest: /var/tmp/ParallelsInstall/ParallelsDesktop-16.0.0-48916.dmg
+
+- name: Download a verified Python installer
+  samdoran.macos.artifact_cache:
+    url: https://www.python.org/ftp/python/3.8.6/python-3.8.6-macosx10.9.pkg
+    checksum: md5:68170127a953e7f12465c1798f0965b8
+    max_size: 5G
+  register: python_pkg
+"""
+
+RETURN = """
+path:
+  description: Path of the artifact in the cache
+  returned: success
+  type: str
+  sample: /var/tmp/samdoran.macos/artifacts/objects/sha256/4c9c...e2a1
+dest:
+  description:
+    - Path of the symlink to the cached artifact.
+    - In check mode, where the symlink would be created.
+  returned: when I(dest) is set
+  type: str
+url:
+  description: URL of the artifact
+  returned: always
+  type: str
+checksum:
+  description: Checksum of the artifact, as C(<algorithm>:<hex digest>)
+  returned: success
+  type: str
+size:
+  description: Size of the artifact in bytes
+  returned: success
+  type: int
+cache_hit:
+  description: Whether the artifact was already cached
+  returned: success
+  type: bool
+downloaded_bytes:
+  description: Number of bytes transferred during this run
+  returned: success
+  type: int
+resumed_from:
+  description: Offset the transfer was first resumed from, C(0) when it was not resumed
+  returned: success
+  type: int
+evicted:
+  description: Cache keys of the artifacts evicted during this run
+  returned: success
+  type: list
+  elements: str
+"""
+
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import re
+import socket
+import tempfile
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_native
+from ansible.module_utils.common.text.formatters import human_to_bytes
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.urls import fetch_url
+
+from ..module_utils.profiling import profile_entrypoint
+
+
+CHUNK_SIZE = 1024 * 1024
+CONTENT_RANGE_TOTAL_RE = re.compile(r'^bytes \*/(\d+)$')
+DEFAULT_ALGORITHM = 'sha256'
+INDEX_FILENAME = 'index.json'
+LOCK_FILENAME = '.lock'
+
+
+class TransferInterrupted(Exception):
+    """The connection dropped before the whole artifact was received."""
+
+    def __init__(self, msg, offset, received):  # type: (str, int, int) -> None
+        super(TransferInterrupted, self).__init__(msg)
+        self.offset = offset
+        self.received = received
+
+
+class StreamingHash:
+    """Hash of the partial file, kept up to date as chunks are appended."""
+
+    def __init__(self, algorithm):  # type: (str) -> None
+        self.algorithm = algorithm
+        self.reset()
+
+    def reset(self):  # type: () -> None
+        self.hasher = hashlib.new(self.algorithm)
+
+    def update(self, chunk):  # type: (bytes) -> None
+        self.hasher.update(chunk)
+
+    def hexdigest(self):  # type: () -> str
+        return self.hasher.hexdigest()
+
+
+class ArtifactCache:
+    """Objects stored by digest, with an index of URLs and access times."""
+
+    def __init__(self, cache_dir):  # type: (str) -> None
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        self.index = {'entries': {}, 'urls': {}}
+
+    def object_path(self, key):  # type: (str) -> str
+        return os.path.join(self.cache_dir, 'objects', key)
+
+    def partial_path(self, url):  # type: (str) -> str
+        url_digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'partial', url_digest)
+
+    def load(self):  # type: () -> None
+        try:
+            with open(self.index_path) as index_file:
+                index = json.load(index_file)
+        except (IOError, OSError, ValueError):
+            # NOTE: A lost index only costs a download per artifact.
+            return
+        self.index['entries'] = index.get('entries', {})
+        self.index['urls'] = index.get('urls', {})
+
+    def save(self):  # type: () -> None
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.index-')
+        with os.fdopen(fd, 'w') as tmp_file:
+            json.dump(self.index, tmp_file, indent=2, sort_keys=True)
+        os.rename(tmp_path, self.index_path)
+
+    def lookup(self, key):  # type: (str) -> dict | None
+        entry = self.index['entries'].get(key)
+        try:
+            size = os.path.getsize(self.object_path(key))
+        except OSError:
+            return None
+        if entry is None or entry.get('size') != size:
+            entry = {'size': size}
+            self.index['entries'][key] = entry
+        return entry
+
+    def touch(self, key, url):  # type: (str, str) -> None
+        self.index['entries'][key]['last_used'] = time.time()
+        self.index['urls'][url] = key
+
+    def add(self, key, url, src_path, size):  # type: (str, str, str, int) -> None
+        object_path = self.object_path(key)
+        object_dir = os.path.dirname(object_path)
+        if not os.path.isdir(object_dir):
+            os.makedirs(object_dir)
+        os.rename(src_path, object_path)
+        self.index['entries'][key] = {'size': size, 'url': url}
+        self.touch(key, url)
+
+    def evict(self, max_size, keep):  # type: (int, str) -> list[str]
+        """Remove the least recently used objects until *max_size* is met."""
+        entries = self.index['entries']
+        total = sum(entry['size'] for entry in entries.values())
+        evicted = []
+        for key in sorted(entries, key=lambda name: entries[name].get('last_used', 0)):
+            if total <= max_size:
+                break
+            if key == keep:
+                continue
+            try:
+                os.unlink(self.object_path(key))
+            except OSError as os_err:
+                if os_err.errno != errno.ENOENT:
+                    raise
+            total -= entries.pop(key)['size']
+            evicted.append(key)
+
+        self.index['urls'] = dict(
+            (url, key) for url, key in self.index['urls'].items() if key in entries
+        )
+        return evicted
+
+
+def parse_checksum(module, checksum):  # type: (...) -> tuple[str, str | None]
+    if not checksum:
+        return DEFAULT_ALGORITHM, None
+    algorithm, sep, digest = checksum.partition(':')
+    algorithm = algorithm.lower()
+    if not sep or not digest:
+        module.fail_json(msg='checksum must be given as <algorithm>:<hex digest>')
+    if algorithm not in hashlib.algorithms_available:
+        module.fail_json(msg='Unsupported checksum algorithm {0}'.format(algorithm))
+    return algorithm, digest.lower()
+
+
+def hash_file(path, hasher):  # type: (str, StreamingHash) -> None
+    with open(path, 'rb') as src_file:
+        for chunk in iter(lambda: src_file.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+
+
+def read_partial_meta(partial_path):  # type: (str) -> dict
+    try:
+        with open(partial_path + '.json') as meta_file:
+            return json.load(meta_file)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def discard_partial(partial_path):  # type: (str) -> None
+    for path in (partial_path, partial_path + '.json'):
+        try:
+            os.unlink(path)
+        except OSError as os_err:
+            if os_err.errno != errno.ENOENT:
+                raise
+
+
+def fetch_once(module, url, partial_path, hasher):  # type: (...) -> dict
+    """Fetch *url* into *partial_path*, resuming from what is there.
+
+    *hasher* must already cover the existing partial content. It is reset
+    when the server ignores the range request, or rejects it for a partial
+    file that does not match the size of the artifact.
+    """
+    offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+    meta = read_partial_meta(partial_path)
+    headers = {}
+    if offset:
+        headers['Range'] = 'bytes={0}-'.format(offset)
+        validator = meta.get('etag') or meta.get('last_modified')
+        if validator:
+            headers['If-Range'] = validator
+
+    resp, info = fetch_url(module, url, headers=headers, timeout=module.params['timeout'])
+    status = info.get('status')
+    if offset and status == 416:
+        total = CONTENT_RANGE_TOTAL_RE.match(info.get('content-range') or '')
+        if total and int(total.group(1)) == offset:
+            # NOTE: The partial file already holds the whole artifact.
+            return {'status': 'complete', 'offset': offset, 'received': 0}
+        # NOTE: The partial file is larger than the artifact, or the server
+        # NOTE: does not say how large it is. Neither can be resumed.
+        discard_partial(partial_path)
+        hasher.reset()
+        return fetch_once(module, url, partial_path, hasher)
+    if resp is None or status not in (200, 206):
+        module.fail_json(msg='Failed to download {0}: {1}'.format(url, info.get('msg')), status_code=status)
+
+    mode = 'ab'
+    if status == 200 and offset:
+        # NOTE: The server sent the whole artifact, start over.
+        mode = 'wb'
+        offset = 0
+        hasher.reset()
+
+    with open(partial_path + '.json', 'w') as meta_file:
+        json.dump({
+            'url': url,
+            'etag': info.get('etag'),
+            'last_modified': info.get('last-modified'),
+        }, meta_file)
+
+    expected_length = info.get('content-length')
+    received = 0
+    read_err = None
+    with open(partial_path, mode) as partial_file:
+        try:
+            for chunk in iter(lambda: resp.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                partial_file.write(chunk)
+                received += len(chunk)
+        except (IOError, OSError, socket.error, http_client.HTTPException) as exc:
+            read_err = to_native(exc)
+
+    # NOTE: A dropped connection does not always raise, so the length the
+    # NOTE: server announced is what tells a complete transfer apart.
+    if read_err is None and expected_length and received < int(expected_length):
+        read_err = 'received {0} of {1} bytes'.format(received, expected_length)
+    if read_err is not None:
+        raise TransferInterrupted(
+            '{0} interrupted after {1} bytes: {2}'.format(url, offset + received, read_err),
+            offset, received,
+        )
+    return {'status': 'complete', 'offset': offset, 'received': received}
+
+
+def download(module, cache, url, algorithm):  # type: (...) -> dict
+    partial_path = cache.partial_path(url)
+    partial_dir = os.path.dirname(partial_path)
+    if not os.path.isdir(partial_dir):
+        os.makedirs(partial_dir)
+
+    hasher = StreamingHash(algorithm)
+    if os.path.exists(partial_path):
+        hash_file(partial_path, hasher)
+
+    downloaded = 0
+    resumed_from = 0
+    attempts = module.params['retries'] + 1
+    for attempt in range(attempts):
+        try:
+            transfer = fetch_once(module, url, partial_path, hasher)
+        except TransferInterrupted as interrupted:
+            transfer = {'offset': interrupted.offset, 'received': interrupted.received}
+            if attempt + 1 == attempts:
+                module.fail_json(
+                    msg='{0}. The next run resumes the transfer.'.format(interrupted),
+                    downloaded_bytes=downloaded + interrupted.received,
+                )
+        downloaded += transfer['received']
+        resumed_from = resumed_from or transfer['offset']
+        if 'status' in transfer:
+            break
+
+    return {
+        'partial_path': partial_path,
+        'digest': hasher.hexdigest(),
+        'size': os.path.getsize(partial_path),
+        'downloaded_bytes': downloaded,
+        'resumed_from': resumed_from,
+    }
+
+
+def link_dest(module, dest, object_path):  # type: (...) -> bool
+    if os.path.islink(dest) and os.readlink(dest) == object_path:
+        return False
+    if module.check_mode:
+        return True
+    if os.path.lexists(dest):
+        if os.path.isdir(dest) and not os.path.islink(dest):
+            module.fail_json(msg='dest {0} is a directory'.format(dest))
+        os.unlink(dest)
+    dest_dir = os.path.dirname(dest)
+    if dest_dir and not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+    os.symlink(object_path, dest)
+    return True
+
+
+def initial_results(module):  # type: (...) -> dict
+    """Return the results of a run that found nothing in the cache yet."""
+    results = {
+        'changed': False,
+        'url': module.params['url'],
+        'cache_hit': False,
+        'downloaded_bytes': 0,
+        'resumed_from': 0,
+        'evicted': [],
+    }
+    # NOTE: Check mode reports where the symlink would be, so that later
+    # NOTE: tasks using it can be checked too.
+    if module.params['dest']:
+        results['dest'] = module.params['dest']
+    return results
+
+
+def fetch_artifact(module, cache):  # type: (...) -> dict
+    url = module.params['url']
+    algorithm, expected = parse_checksum(module, module.params['checksum'])
+
+    key = None
+    if expected:
+        key = '{0}/{1}'.format(algorithm, expected)
+    elif not module.params['force']:
+        key = cache.index['urls'].get(url)
+        if key and not key.startswith(algorithm + '/'):
+            key = None
+
+    results = initial_results(module)
+    entry = cache.lookup(key) if key else None
+
+    if entry is not None:
+        results['cache_hit'] = True
+    elif module.check_mode:
+        results['changed'] = True
+        return results
+    else:
+        transfer = download(module, cache, url, algorithm)
+        if expected and transfer['digest'] != expected:
+            discard_partial(transfer['partial_path'])
+            module.fail_json(
+                msg='The checksum of {0} does not match: expected {1}, got {2}'.format(url, expected, transfer['digest']),
+                downloaded_bytes=transfer['downloaded_bytes'],
+            )
+        key = '{0}/{1}'.format(algorithm, transfer['digest'])
+        cache.add(key, url, transfer['partial_path'], transfer['size'])
+        discard_partial(transfer['partial_path'])
+        results['changed'] = True
+        results['downloaded_bytes'] = transfer['downloaded_bytes']
+        results['resumed_from'] = transfer['resumed_from']
+        entry = cache.index['entries'][key]
+
+    results['path'] = cache.object_path(key)
+    results['checksum'] = key.replace('/', ':', 1)
+    results['size'] = entry['size']
+    if module.check_mode:
+        return results
+
+    cache.touch(key, url)
+    results['evicted'] = cache.evict(human_to_bytes(module.params['max_size']), keep=key)
+    results['changed'] |= bool(results['evicted'])
+    return results
+
+
+@profile_entrypoint('artifact_cache')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'url': {'type': 'str', 'required': True},
+            'checksum': {'type': 'str'},
+            'dest': {'type': 'path'},
+            'cache_dir': {'type': 'path', 'default': '/var/tmp/samdoran.macos/artifacts'},
+            'max_size': {'type': 'str', 'default': '20G'},
+            'force': {'type': 'bool', 'default': False},
+            'retries': {'type': 'int', 'default': 3},
+            'timeout': {'type': 'int', 'default': 30},
+            'validate_certs': {'type': 'bool', 'default': True},
+        },
+        add_file_common_args=True,
+        supports_check_mode=True,
+    )
+    try:
+        human_to_bytes(module.params['max_size'])
+    except ValueError as size_err:
+        module.fail_json(msg='Invalid max_size: {0}'.format(to_native(size_err)))
+
+    cache = ArtifactCache(module.params['cache_dir'])
+    if not os.path.isdir(cache.cache_dir):
+        if module.check_mode:
+            # NOTE: An empty cache, nothing is found in it.
+            module.exit_json(**dict(initial_results(module), changed=True))
+        os.makedirs(cache.cache_dir)
+
+    with open(os.path.join(cache.cache_dir, LOCK_FILENAME), 'a') as lock_file:
+        # NOTE: Serializes concurrent runs against the same cache.
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        cache.load()
+        results = fetch_artifact(module, cache)
+        if not module.check_mode:
+            cache.save()
+
+    if 'dest' in results and 'path' in results:
+        try:
+            results['changed'] |= link_dest(module, module.params['dest'], results['path'])
+        except OSError as link_err:
+            module.fail_json(msg='Failed to link {0}: {1}'.format(module.params['dest'], to_native(link_err)), **results)
+        file_args = module.load_file_common_arguments(module.params, path=results['path'])
+        results['changed'] = module.set_fs_attributes_if_different(file_args, results['changed'])
+
+    module.exit_json(**results)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,16 @@ short_description: Bootstrap CA file using macOS system cerots
 notes: []
 description:
     - Get valid CAs from macOS system keychain and use them to build a CA file for use by Python
+    - The admin and system trust settings are exported once per run and
+      indexed by certificate fingerprint. Certificates distrusted for SSL,
+      or only trusted for other purposes, are left out before the
+      remaining ones are validated.
+    - Certificates are validated by C(openssl). With I(validation=per_cert)
+      every certificate is checked by its own C(openssl x509 -checkend 0)
+      process. With I(validation=batched) the certificates are split into a
+      few batches, each checked by a single C(openssl verify) process, and
+      only the certificates it gives no clear verdict for are checked on
+      their own.
 attributes:
     check_mode:
         support: full
@@ -29,16 +39,73 @@ options:
       type: list
       elements: str
       default: ['/System/Library/Keychains/SystemRootCertificates.keychain']
+    trust_settings:
+      description:
+        - Only keep the certificates trusted for SSL according to the admin and system trust settings.
+        - Certificates without any trust settings are only trusted when they come from the system roots keychain.
+      type: bool
+      default: true
+    validation:
+      description:
+        - How the certificates are checked for expiry by C(openssl).
+        - C(per_cert) runs one C(openssl x509) process per certificate.
+        - C(batched) runs at most eight C(openssl verify) processes, which is
+          faster with many certificates.
+      type: str
+      choices: [per_cert, batched]
+      default: per_cert
 """
 
 EXAMPLES = """
 """
 
 RETURN = """
+openssl_cafile:
+  description: Path of the CA file used by the Python C(ssl) module
+  returned: always
+  type: str
+  sample: /Library/Frameworks/Python.framework/Versions/3.8/etc/openssl/cert.pem
+cert_counts:
+  description: Number of certificates at each step of building the CA file
+  returned: always
+  type: dict
+  contains:
+    found:
+      description: Certificates found in the keychains
+      type: int
+    untrusted:
+      description: Certificates left out because they are not trusted for SSL
+      type: int
+    invalid:
+      description: Certificates left out because they are expired or unreadable
+      type: int
+    written:
+      description: Certificates written to the CA file
+      type: int
+    rechecked:
+      description:
+        - Certificates checked on their own because the batched validation gave no verdict for them.
+        - Only reported with I(validation=batched).
+      type: int
+  sample:
+    found: 165
+    untrusted: 14
+    invalid: 2
+    written: 149
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
 """
 
+import base64
+import hashlib
 import os
+import plistlib
 import re
+import shutil
 import ssl
 import tempfile
 
@@ -46,6 +113,30 @@ from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.process import get_bin_path
 from ansible.module_utils._text import to_bytes
 
+from ..module_utils.command_runner import CmdFailedError, get_command_runner
+from ..module_utils.profiling import profile_entrypoint
+
+OPENSSL_MAX_WORKERS = 8
+
+SYSTEM_ROOTS_KEYCHAIN = '/System/Library/Keychains/SystemRootCertificates.keychain'
+# NOTE: Admin trust settings take precedence over the system ones.
+TRUST_SETTINGS_DOMAINS = ('-d', '-s')
+# NOTE: DER encoding of the Apple SSL policy OID, 1.2.840.113635.100.1.3
+SSL_POLICY_OID = b'\x2a\x86\x48\x86\xf7\x63\x64\x01\x03'
+SSL_POLICY_NAME = 'sslServer'
+TRUST_RESULT_TRUST_ROOT = 1
+TRUST_RESULT_TRUST_AS_ROOT = 2
+TRUST_RESULT_DENY = 3
+# NOTE: `openssl verify` output, e.g. `cert-0001.pem: OK` on stdout and
+# NOTE: `error 10 at 0 depth lookup: certificate has expired` followed by
+# NOTE: `error cert-0002.pem: verification failed` on stderr. LibreSSL and
+# NOTE: OpenSSL 1.0 print the errors on stdout after the `cert-0002.pem: `
+# NOTE: prefix instead.
+VERIFY_RESULT_RE = re.compile(r'^(?P<file>cert-\d+\.pem): ?(?P<rest>.*)$')
+VERIFY_FAILED_RE = re.compile(r'^error (?P<file>cert-\d+\.pem): verification failed')
+VERIFY_ERROR_RE = re.compile(r'^error (?P<code>\d+) at (?P<depth>\d+) depth lookup:')
+X509_V_ERR_CERT_HAS_EXPIRED = 10
+
 
 def file_is_different(file, certs):
     try:
@@ -89,17 +180,98 @@ def get_certs(module, keychains):
         module.fail_json("Unable to find 'security'")
 
     cert_re = re.compile(r'-----BEGIN CERTIFICATE-----.*?-----END CERTIFICATE-----', re.DOTALL)
+    runner = get_command_runner(module)
     certs = []
-    for keychain in module.params['keychains']:
+    for keychain in keychains:
         command = [security_bin, 'find-certificate', '-a', '-p', keychain]
-        rc, out, err = module.run_command(command)
-        matches = cert_re.findall(out)
-        if matches:
-            certs.extend(matches)
+        try:
+            res = runner.run(command)
+        except CmdFailedError as cmd_err:
+            module.fail_json(**runner.annotate(cmd_err.error_args))
+        certs.extend((keychain, cert) for cert in cert_re.findall(res['stdout']))
 
     return certs
 
 
+def get_fingerprint(cert):
+    """ Return the SHA-1 fingerprint trust settings are keyed by """
+    body = re.sub(r'-----[A-Z ]+-----|\s', '', cert)
+    return hashlib.sha1(base64.b64decode(body)).hexdigest().upper()
+
+
+def parse_trust_settings(data):
+    """ Index an exported trust settings plist by certificate fingerprint """
+    try:
+        plist = plistlib.loads(data)
+    except AttributeError:  # Python 2
+        plist = plistlib.readPlistFromString(data)
+
+    return dict(
+        (fingerprint.upper(), entry.get('trustSettings', []))
+        for fingerprint, entry in plist.get('trustList', {}).items()
+        if isinstance(entry, dict)
+    )
+
+
+def get_ssl_trust(settings):
+    """ Return whether trust settings trust a cert for SSL, None when they do not say """
+    if not settings:
+        # NOTE: An empty list means the certificate is trusted for everything.
+        return True
+
+    for setting in settings:
+        if setting.get('kSecTrustSettingsPolicyString'):
+            # NOTE: Restricted to given host names, not usable in a CA file.
+            continue
+        policy = setting.get('kSecTrustSettingsPolicy')
+        if policy is not None and getattr(policy, 'data', policy) != SSL_POLICY_OID \
+                and setting.get('kSecTrustSettingsPolicyName') != SSL_POLICY_NAME:
+            continue
+
+        result = setting.get('kSecTrustSettingsResult', TRUST_RESULT_TRUST_ROOT)
+        if result in (TRUST_RESULT_TRUST_ROOT, TRUST_RESULT_TRUST_AS_ROOT):
+            return True
+        if result == TRUST_RESULT_DENY:
+            return False
+
+    return None
+
+
+def get_trust_settings(module):
+    """ Export the admin and system trust settings once, indexed by fingerprint """
+    security_bin = module.get_bin_path('security', required=True)
+    runner = get_command_runner(module)
+    export_dir = tempfile.mkdtemp()
+    trust_indexes = []
+    try:
+        for domain in TRUST_SETTINGS_DOMAINS:
+            export_path = os.path.join(export_dir, 'trust{0}.plist'.format(domain))
+            res = runner.run([security_bin, 'trust-settings-export', domain, export_path], check=False)
+            if res['rc'] != 0:
+                # NOTE: Exporting a domain without any trust settings fails.
+                if 'No Trust Settings were found' not in res['stderr']:
+                    module.warn('Unable to export the trust settings ({0}): {1}'.format(domain, res['stderr'].strip()))
+                trust_indexes.append({})
+                continue
+            with open(export_path, 'rb') as export_file:
+                trust_indexes.append(parse_trust_settings(export_file.read()))
+    finally:
+        shutil.rmtree(export_dir)
+
+    return trust_indexes
+
+
+def is_trusted_for_ssl(keychain, cert, trust_indexes):
+    fingerprint = get_fingerprint(cert)
+    for trust_index in trust_indexes:
+        if fingerprint in trust_index:
+            trusted = get_ssl_trust(trust_index[fingerprint])
+            if trusted is not None:
+                return trusted
+
+    return keychain == SYSTEM_ROOTS_KEYCHAIN
+
+
 def validate_certs(module, certs):
     valid_certs = []
 
@@ -109,15 +281,100 @@ def validate_certs(module, certs):
         module.fail_json("Unable to find 'openssl'")
 
     command = [openssl_bin, 'x509', '-inform', 'pem', '-checkend', '0', '-noout']
-    for cert in certs:
-        rc, out, err = module.run_command(command, data=cert)
-
-        if rc == 0:
+    results = get_command_runner(module).run_many(
+        ({'cmd': command, 'data': cert, 'check': False} for cert in certs),
+        max_workers=OPENSSL_MAX_WORKERS,
+    )
+    for cert, res in zip(certs, results):
+        if res['rc'] == 0:
             valid_certs.append(cert)
 
     return valid_certs
 
 
+def parse_verify_output(stdout, stderr):
+    """ Map each cert file of an ``openssl verify`` run to True, False when expired, or None """
+    verdicts = {}
+
+    def conclude(cert_file, errors):
+        # NOTE: Only the first error is reported, and only an expiry of the
+        # NOTE: cert itself is as conclusive as `x509 -checkend 0`.
+        if errors[:1] == [(X509_V_ERR_CERT_HAS_EXPIRED, 0)]:
+            verdicts[cert_file] = False
+        else:
+            verdicts.setdefault(cert_file, None)
+
+    for stream in (stdout, stderr):
+        current_file = None
+        errors = []
+        for line in stream.splitlines():
+            result = VERIFY_RESULT_RE.match(line)
+            failed = VERIFY_FAILED_RE.match(line)
+            error = VERIFY_ERROR_RE.match(line)
+            if result:
+                current_file = result.group('file')
+                errors = []
+                if result.group('rest') == 'OK':
+                    verdicts[current_file] = True
+            elif failed:
+                conclude(failed.group('file'), errors)
+                errors = []
+            elif error:
+                errors.append((int(error.group('code')), int(error.group('depth'))))
+                if current_file is not None:
+                    conclude(current_file, errors)
+
+    return verdicts
+
+
+def validate_certs_batched(module, certs):
+    """ Check the certs with a few ``openssl verify`` runs, rechecking the undecided ones on their own """
+    openssl_bin = module.get_bin_path('openssl', required=True)
+    runner = get_command_runner(module)
+    cert_files = ['cert-{0:04d}.pem'.format(index) for index in range(len(certs))]
+    certs_by_file = dict(zip(cert_files, certs))
+    batch_count = min(OPENSSL_MAX_WORKERS, len(certs))
+    batches = [cert_files[index::batch_count] for index in range(batch_count)]
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        for cert_file, cert in certs_by_file.items():
+            with open(os.path.join(work_dir, cert_file), 'w') as f:
+                f.write(cert + '\n')
+        calls = []
+        for index, batch in enumerate(batches):
+            # NOTE: Trusting the batch itself makes each cert its own chain,
+            # NOTE: so only its own validity is checked.
+            bundle_file = 'batch-{0:d}.pem'.format(index)
+            with open(os.path.join(work_dir, bundle_file), 'w') as f:
+                f.writelines(certs_by_file[cert_file] + '\n' for cert_file in batch)
+            calls.append({
+                'cmd': [openssl_bin, 'verify', '-CAfile', bundle_file, '-partial_chain'] + batch,
+                'check': False,
+                'cwd': work_dir,
+            })
+        results = runner.run_many(calls, max_workers=OPENSSL_MAX_WORKERS)
+    finally:
+        shutil.rmtree(work_dir)
+
+    verdicts = {}
+    for res in results:
+        # NOTE: 2 means some certs failed, anything else that openssl did
+        # NOTE: not get to verify them.
+        if res['rc'] in (0, 2):
+            verdicts.update(parse_verify_output(res['stdout'], res['stderr']))
+
+    undecided = [cert_file for cert_file in cert_files if verdicts.get(cert_file) is None]
+    if undecided:
+        module.debug('Checking {0} certificates on their own'.format(len(undecided)))
+        rechecked = set(validate_certs(module, [certs_by_file[cert_file] for cert_file in undecided]))
+        verdicts.update((cert_file, certs_by_file[cert_file] in rechecked) for cert_file in undecided)
+
+    valid_certs = [certs_by_file[cert_file] for cert_file in cert_files if verdicts[cert_file]]
+    return valid_certs, len(undecided)
+
+
+@profile_entrypoint('bootstrap_certs')
 def main():
 
     module = AnsibleModule(
@@ -126,7 +383,16 @@ def main():
                 'type': 'list',
                 'elements': 'str',
                 'no_log': False,
-                'default': ['/System/Library/Keychains/SystemRootCertificates.keychain'],
+                'default': [SYSTEM_ROOTS_KEYCHAIN],
+            },
+            'trust_settings': {
+                'type': 'bool',
+                'default': True,
+            },
+            'validation': {
+                'type': 'str',
+                'choices': ['per_cert', 'batched'],
+                'default': 'per_cert',
             },
         },
         add_file_common_args=True,
@@ -140,8 +406,24 @@ def main():
     # Get path and filename expected by ssl library
     openssl_cafile_path = ssl.get_default_verify_paths().openssl_cafile
 
-    certs = get_certs(module, module.params['keychains'])
-    valid_certs = validate_certs(module, certs)
+    keychain_certs = get_certs(module, module.params['keychains'])
+    if module.params['trust_settings']:
+        trust_indexes = get_trust_settings(module)
+        certs = [cert for keychain, cert in keychain_certs if is_trusted_for_ssl(keychain, cert, trust_indexes)]
+    else:
+        certs = [cert for keychain, cert in keychain_certs]
+    if module.params['validation'] == 'batched':
+        valid_certs, rechecked = validate_certs_batched(module, certs)
+    else:
+        valid_certs, rechecked = validate_certs(module, certs), None
+    results['cert_counts'] = {
+        'found': len(keychain_certs),
+        'untrusted': len(keychain_certs) - len(certs),
+        'invalid': len(certs) - len(valid_certs),
+        'written': len(valid_certs),
+    }
+    if rechecked is not None:
+        results['cert_counts']['rechecked'] = rechecked
 
     if file_is_different(openssl_cafile_path, valid_certs):
         file_args = module.load_file_common_arguments(module.params, path=openssl_cafile_path)
@@ -149,7 +431,7 @@ def main():
 
     results['openssl_cafile'] = openssl_cafile_path
 
-    module.exit_json(**results)
+    module.exit_json(**get_command_runner(module).annotate(results))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,355 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: homebrew_reconcile
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Reconcile Homebrew formulae, casks and taps in bulk
+notes:
+  - Packages are matched by name, full name or alias for formulae, and by token or full token for casks.
+description:
+  - Read the installed formulae, casks and taps once, compute what differs
+    from the desired state, then apply the difference with as few C(brew)
+    invocations as possible.
+  - Homebrew is updated at most once per run. Installs, upgrades and
+    removals without extra options are batched into a single C(brew)
+    command per kind. When a batch fails, its packages are retried one at
+    a time so that the failure is attributed to the right package.
+options:
+  packages:
+    description:
+      - Formulae to manage.
+      - Each item is either a formula name or a dictionary with the
+        C(name), C(state) and C(install_options) keys.
+      - C(state) is one of C(present), C(latest) or C(absent) and defaults to I(state).
+    type: list
+    elements: raw
+    default: []
+  casks:
+    description:
+      - Casks to manage.
+      - Each item is either a cask token or a dictionary with the C(name) and C(state) keys.
+    type: list
+    elements: raw
+    default: []
+  taps:
+    description: Taps that must be present.
+    type: list
+    elements: str
+    default: []
+  state:
+    description: Default state of the packages and casks that do not set one.
+    type: str
+    choices: [present, latest, absent]
+    default: latest
+  update_homebrew:
+    description:
+      - Run C(brew update) once before reading the installed state.
+      - A failing update only emits a warning.
+    type: bool
+    default: true
+  fail_on_error:
+    description:
+      - Fail the task when any package could not be reconciled.
+      - When disabled, failures are only reported in C(packages).
+    type: bool
+    default: true
+"""
+
+EXAMPLES = """
+- name: Install command line tools and apps
+  samdoran.macos.homebrew_reconcile:
+    taps:
+      - hashicorp/tap
+    packages:
+      - git
+      - hashicorp/tap/terraform
+      - name: wget
+        install_options: [--HEAD]
+      - name: python@3.8
+        state: absent
+    casks:
+      - firefox
+    fail_on_error: false
+"""
+
+RETURN = """
+packages:
+  description: Outcome for every requested tap, formula and cask.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Requested name
+      type: str
+    kind:
+      description: One of C(tap), C(formula) or C(cask)
+      type: str
+    state:
+      description: Requested state
+      type: str
+    action:
+      description: One of C(none), C(tap), C(install), C(upgrade) or C(uninstall)
+      type: str
+    changed:
+      description: Whether the action was applied
+      type: bool
+    failed:
+      description: Whether the action failed
+      type: bool
+    msg:
+      description: Error output of the failed C(brew) command
+      type: str
+      returned: when failed
+  sample:
+    - name: git
+      kind: formula
+      state: latest
+      action: upgrade
+      changed: true
+      failed: false
+failed_packages:
+  description: Names of the taps, formulae and casks that could not be reconciled
+  returned: always
+  type: list
+  elements: str
+updated:
+  description: Whether C(brew update) was run successfully
+  returned: always
+  type: bool
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
+"""
+
+import json
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.six import string_types
+
+from ..module_utils.command_runner import CmdFailedError, get_command_runner
+from ..module_utils.profiling import profile_entrypoint
+
+BREW_OPT_DIRS = ['/opt/homebrew/bin', '/usr/local/bin']
+BREW_ENVIRON = {
+    'HOMEBREW_NO_AUTO_UPDATE': '1',
+    'HOMEBREW_NO_ENV_HINTS': '1',
+}
+PACKAGE_STATES = ('present', 'latest', 'absent')
+
+
+def normalize_requests(module, items, kind):
+    requests = []
+    for item in items:
+        if isinstance(item, string_types):
+            item = {'name': item}
+        if not isinstance(item, dict) or not item.get('name'):
+            module.fail_json(msg='Every {kind} must be a name or a dictionary with a name: {item!r}'.format(kind=kind, item=item))
+
+        state = item.get('state') or module.params['state']
+        if state not in PACKAGE_STATES:
+            module.fail_json(msg='Invalid state {state!r} for {kind} {name}'.format(state=state, kind=kind, name=item['name']))
+
+        install_options = item.get('install_options') or []
+        if isinstance(install_options, string_types):
+            install_options = install_options.split()
+
+        requests.append({
+            'name': item['name'],
+            'kind': kind,
+            'state': state,
+            'install_options': ['--{0}'.format(opt.lstrip('-')) for opt in install_options],
+        })
+    return requests
+
+
+def read_installed(runner, brew):
+    """Index the installed formulae and casks by every name they go by."""
+    res = runner.run([brew, 'info', '--json=v2', '--installed'], environ_update=BREW_ENVIRON)
+    info = json.loads(res['stdout'])
+
+    installed = {'formula': {}, 'cask': {}}
+    for formula in info.get('formulae', []):
+        entry = {'outdated': bool(formula.get('outdated'))}
+        for name in [formula.get('name'), formula.get('full_name')] + list(formula.get('aliases') or []):
+            if name:
+                installed['formula'][name] = entry
+    for cask in info.get('casks', []):
+        entry = {'outdated': bool(cask.get('outdated'))}
+        for name in (cask.get('token'), cask.get('full_token')):
+            if name:
+                installed['cask'][name] = entry
+    return installed
+
+
+def read_taps(runner, brew):
+    res = runner.run([brew, 'tap'], environ_update=BREW_ENVIRON)
+    return set(line.strip() for line in res['stdout'].splitlines() if line.strip())
+
+
+def plan_action(request, installed):
+    current = installed[request['kind']].get(request['name'])
+    if request['state'] == 'absent':
+        return 'uninstall' if current else 'none'
+    if current is None:
+        return 'install'
+    if request['state'] == 'latest' and current['outdated']:
+        return 'upgrade'
+    return 'none'
+
+
+def brew_command(brew, action, kind, names, install_options=None):
+    command = [brew, action]
+    if kind == 'cask':
+        command.append('--cask')
+    return command + list(names) + list(install_options or [])
+
+
+def apply_batch(runner, brew, action, kind, requests):
+    """Run one ``brew`` command for *requests*, retrying one by one on failure."""
+    if not requests:
+        return
+    if len(requests) == 1:
+        apply_single(runner, brew, action, kind, requests[0])
+        return
+
+    try:
+        runner.run(brew_command(brew, action, kind, [req['name'] for req in requests]), environ_update=BREW_ENVIRON)
+    except CmdFailedError:
+        # Part of the batch may have been applied before brew gave up, so
+        # only retry what is still out of line with the desired state.
+        installed = read_installed(runner, brew)
+        for request in requests:
+            if plan_action(request, installed) == 'none':
+                request['changed'] = True
+            else:
+                apply_single(runner, brew, action, kind, request)
+    else:
+        for request in requests:
+            request['changed'] = True
+
+
+def apply_single(runner, brew, action, kind, request):
+    command = brew_command(brew, action, kind, [request['name']], request['install_options'])
+    try:
+        runner.run(command, environ_update=BREW_ENVIRON)
+    except CmdFailedError as cmd_err:
+        request['failed'] = True
+        request['msg'] = cmd_err.error_args['stderr'].strip() or str(cmd_err)
+    else:
+        request['changed'] = True
+
+
+def reconcile(module, runner, brew):
+    formulae = normalize_requests(module, module.params['packages'], 'formula')
+    casks = normalize_requests(module, module.params['casks'], 'cask')
+    taps = [
+        {'name': tap, 'kind': 'tap', 'state': 'present', 'install_options': []}
+        for tap in module.params['taps']
+    ]
+
+    updated = False
+    if module.params['update_homebrew'] and not module.check_mode:
+        res = runner.run([brew, 'update'], check=False, environ_update={'HOMEBREW_NO_ENV_HINTS': '1'})
+        # NOTE: A stale index is no reason to leave the packages alone.
+        if res['rc'] == 0:
+            updated = True
+        else:
+            module.warn('brew update failed, using the current Homebrew index: {0}'.format(
+                res['stderr'].strip() or 'rc={0}'.format(res['rc']),
+            ))
+
+    requests = taps + formulae + casks
+    for request in requests:
+        request.update({'action': 'none', 'changed': False, 'failed': False})
+
+    if taps:
+        present_taps = read_taps(runner, brew)
+        for request in taps:
+            if request['name'] not in present_taps:
+                request['action'] = 'tap'
+
+    installed = read_installed(runner, brew)
+    for request in formulae + casks:
+        request['action'] = plan_action(request, installed)
+
+    pending = [request for request in requests if request['action'] != 'none']
+    if module.check_mode:
+        for request in pending:
+            request['changed'] = True
+        return requests, updated
+
+    for request in taps:
+        if request['action'] == 'tap':
+            apply_single(runner, brew, 'tap', 'tap', request)
+
+    for kind, kind_requests in (('formula', formulae), ('cask', casks)):
+        for action in ('install', 'upgrade', 'uninstall'):
+            batchable = []
+            for request in kind_requests:
+                if request['action'] != action:
+                    continue
+                if request['install_options'] and action != 'uninstall':
+                    apply_single(runner, brew, action, kind, request)
+                else:
+                    batchable.append(request)
+            apply_batch(runner, brew, action, kind, batchable)
+
+    return requests, updated
+
+
+@profile_entrypoint('homebrew_reconcile')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'packages': {'type': 'list', 'elements': 'raw', 'default': []},
+            'casks': {'type': 'list', 'elements': 'raw', 'default': []},
+            'taps': {'type': 'list', 'elements': 'str', 'default': []},
+            'state': {'type': 'str', 'choices': list(PACKAGE_STATES), 'default': 'latest'},
+            'update_homebrew': {'type': 'bool', 'default': True},
+            'fail_on_error': {'type': 'bool', 'default': True},
+        },
+        supports_check_mode=True,
+    )
+    runner = get_command_runner(module)
+
+    brew = module.get_bin_path('brew', required=True, opt_dirs=BREW_OPT_DIRS)
+
+    try:
+        requests, updated = reconcile(module, runner, brew)
+    except CmdFailedError as cmd_err:
+        module.fail_json(**runner.annotate(cmd_err.error_args))
+
+    packages = [
+        dict((key, value) for key, value in request.items() if key != 'install_options')
+        for request in requests
+    ]
+    failed_packages = [request['name'] for request in requests if request['failed']]
+    results = {
+        'changed': any(request['changed'] for request in requests),
+        'packages': packages,
+        'failed_packages': failed_packages,
+        'updated': updated,
+    }
+
+    if failed_packages and module.params['fail_on_error']:
+        results['msg'] = 'Failed to reconcile: {0}'.format(', '.join(failed_packages))
+        module.fail_json(**runner.annotate(results))
+
+    module.exit_json(**runner.annotate(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: parallels_autodeploy
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Prepare the Parallels Desktop mass deployment package
+notes:
+  - The archive is only read with Python's C(zipfile), no C(unzip) binary is needed.
+description:
+  - Read the version of the Parallels Desktop mass deployment package
+    from the index of C(pd-autodeploy.zip) without extracting anything.
+  - Extract the archive only when its content hash differs from the one
+    recorded by the previous extraction. The hash is computed from the
+    names, sizes and CRC-32 checksums stored in the zip index, so the
+    archive itself is never read in full to decide.
+  - Apply the license key and the other C(deploy.cfg) settings in a single
+    pass, and symlink the installer DMG into the package, replacing any
+    other C(ParallelsDesktop-*.dmg) found there.
+options:
+  src:
+    description: Path to C(pd-autodeploy.zip) on the target.
+    type: path
+    required: true
+  dest:
+    description:
+      - Directory to extract the archive into. It is created when missing.
+      - The file attributes given to the module are applied to this directory.
+    type: path
+    required: true
+  license_key:
+    description: Parallels Desktop license key to set in C(deploy.cfg).
+    type: str
+  settings:
+    description:
+      - Other C(deploy.cfg) settings to apply.
+      - Commented out settings are uncommented, missing ones are appended.
+    type: dict
+    default:
+      updates_auto_check: '0'
+      updates_auto_download: 'off'
+  installer_dmg:
+    description: Parallels Desktop DMG to symlink into the package.
+    type: path
+extends_documentation_fragment:
+  - ansible.builtin.files
+"""
+
+EXAMPLES = """
+- name: Prepare the Parallels auto-deploy package
+  samdoran.macos.parallels_autodeploy:
+    src: /var/tmp/ParallelsInstall/pd-autodeploy.zip
+    dest: /var/tmp/ParallelsInstall/pd-autodeploy
+    license_key: "{{ parallels_license_key }}"
+    installer_dmg: /var/tmp/ParallelsInstall/ParallelsDesktop-16.0.0-48916.dmg
+    owner: administrator
+    group: staff
+    mode: '0755'
+  register: autodeploy
+
+- name: Generate a flat Parallels installer package
+  command:
+    argv:
+      - "{{ autodeploy.scripts_dir }}/prepare"
+      - --dest
+      - "{{ autodeploy.package_root }}"
+    chdir: "{{ autodeploy.scripts_dir }}"
+    creates: "{{ autodeploy.package }}"
+"""
+
+RETURN = """
+version:
+  description: Version of the mass deployment package
+  returned: success
+  type: str
+  sample: 1.6.1
+content_hash:
+  description: SHA-256 hash of the zip index
+  returned: success
+  type: str
+extracted:
+  description: Whether the archive was extracted during this run
+  returned: success
+  type: bool
+package_root:
+  description: Directory of the extracted mass deployment package
+  returned: success
+  type: str
+  sample: /var/tmp/ParallelsInstall/pd-autodeploy/Parallels Desktop mass deployment package v1.6.1
+package:
+  description: Path of the flat installer package that C(prepare) generates
+  returned: success
+  type: str
+scripts_dir:
+  description: Directory holding the C(prepare) script
+  returned: success
+  type: str
+config:
+  description: Path of C(deploy.cfg)
+  returned: success
+  type: str
+dmg_dir:
+  description: Directory the installer DMG is symlinked into
+  returned: success
+  type: str
+config_changed:
+  description: Names of the C(deploy.cfg) settings that were changed
+  returned: success
+  type: list
+  elements: str
+"""
+
+import errno
+import fnmatch
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_bytes, to_native
+
+from ..module_utils.archive import extract_zip_member
+from ..module_utils.profiling import profile_entrypoint
+
+
+PACKAGE_ROOT_RE = re.compile(r'^(Parallels Desktop mass deployment package v([^/]+))/')
+PACKAGE_BASE_NAME = 'Parallels Desktop Autodeploy'
+CONFIG_RELPATH = os.path.join('License Key and Configuration', 'deploy.cfg')
+DMG_DIRNAME = 'Parallels Desktop DMG'
+DMG_PATTERN = 'ParallelsDesktop-*.dmg'
+CONTENT_HASH_FILENAME = '.pd-autodeploy.sha256'
+
+
+def get_content_hash(archive):  # type: (zipfile.ZipFile) -> str
+    """Hash the zip index, which changes whenever any member does."""
+    digest = hashlib.sha256()
+    for info in sorted(archive.infolist(), key=lambda member: member.filename):
+        digest.update(to_bytes('{0}\0{1}\0{2}\n'.format(info.filename, info.file_size, info.CRC)))
+    return digest.hexdigest()
+
+
+def find_package_root(archive):  # type: (zipfile.ZipFile) -> tuple[str, str]
+    for name in archive.namelist():
+        match = PACKAGE_ROOT_RE.match(name)
+        if match:
+            return match.group(1), match.group(2)
+    raise LookupError('No mass deployment package directory in the archive')
+
+
+def read_content_hash(dest):  # type: (str) -> str
+    try:
+        with open(os.path.join(dest, CONTENT_HASH_FILENAME)) as hash_file:
+            return hash_file.read().strip()
+    except (IOError, OSError):
+        return ''
+
+
+def extract(archive, dest, content_hash):
+    for info in archive.infolist():
+        extract_zip_member(archive, info, dest)
+    # NOTE: Written last so that an interrupted extraction is redone.
+    with open(os.path.join(dest, CONTENT_HASH_FILENAME), 'w') as hash_file:
+        hash_file.write(content_hash + '\n')
+
+
+def render_config(content, settings):  # type: (str, dict[str, str]) -> tuple[str, list[str]]
+    """Apply *settings* to the text of ``deploy.cfg`` in one pass."""
+    lines = content.splitlines(True)
+    pending = dict(settings)
+    changed = []
+    for index, line in enumerate(lines):
+        match = re.match(r'^#* *([A-Za-z0-9_]+)=".*"$', line.rstrip('\r\n'))
+        if not match or match.group(1) not in pending:
+            continue
+        key = match.group(1)
+        wanted = '{0}="{1}"'.format(key, pending.pop(key))
+        if line.rstrip('\r\n') != wanted:
+            lines[index] = wanted + line[len(line.rstrip('\r\n')):]
+            changed.append(key)
+
+    if pending and lines and not lines[-1].endswith('\n'):
+        lines[-1] += '\n'
+    for key in sorted(pending):
+        lines.append('{0}="{1}"\n'.format(key, pending[key]))
+        changed.append(key)
+
+    return ''.join(lines), changed
+
+
+def update_config(module, config_path, settings):
+    with open(config_path) as config_file:
+        content = config_file.read()
+    new_content, changed = render_config(content, settings)
+    if changed and not module.check_mode:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(config_path))
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(new_content)
+        shutil.copymode(config_path, tmp_path)
+        module.atomic_move(tmp_path, config_path)
+    return changed
+
+
+def link_installer_dmg(module, dmg_dir, installer_dmg):  # type: (...) -> bool
+    link_path = os.path.join(dmg_dir, os.path.basename(installer_dmg))
+    changed = False
+    try:
+        entries = os.listdir(dmg_dir)
+    except OSError as os_err:
+        if os_err.errno != errno.ENOENT:
+            raise
+        entries = []
+
+    for entry in entries:
+        entry_path = os.path.join(dmg_dir, entry)
+        if not fnmatch.fnmatch(entry, DMG_PATTERN):
+            continue
+        if entry_path == link_path and os.path.islink(entry_path) and os.readlink(entry_path) == installer_dmg:
+            continue
+        changed = True
+        if not module.check_mode:
+            os.unlink(entry_path)
+
+    if not os.path.islink(link_path):
+        changed = True
+        if not module.check_mode:
+            os.symlink(installer_dmg, link_path)
+    return changed
+
+
+def prepare(module):
+    src = module.params['src']
+    dest = module.params['dest']
+
+    try:
+        archive = zipfile.ZipFile(src)
+    except (IOError, OSError, zipfile.BadZipfile) as zip_err:
+        module.fail_json(msg='Unable to read {0}: {1}'.format(src, to_native(zip_err)))
+
+    with archive:
+        try:
+            root_name, version = find_package_root(archive)
+        except LookupError as lookup_err:
+            module.fail_json(msg='{0} in {1}'.format(lookup_err, src))
+        content_hash = get_content_hash(archive)
+
+        package_root = os.path.join(dest, root_name)
+        scripts_dir = os.path.join(package_root, PACKAGE_BASE_NAME, 'Scripts')
+        results = {
+            'changed': False,
+            'version': version,
+            'content_hash': content_hash,
+            'extracted': False,
+            'package_root': package_root,
+            'package': os.path.join(package_root, PACKAGE_BASE_NAME) + '.pkg',
+            'scripts_dir': scripts_dir,
+            'config': os.path.join(scripts_dir, CONFIG_RELPATH),
+            'dmg_dir': os.path.join(scripts_dir, DMG_DIRNAME),
+            'config_changed': [],
+        }
+
+        if read_content_hash(dest) != content_hash:
+            results['changed'] = results['extracted'] = True
+            if module.check_mode:
+                # NOTE: Nothing to inspect until the archive is extracted.
+                return results
+            if not os.path.isdir(dest):
+                os.makedirs(dest)
+            try:
+                extract(archive, dest, content_hash)
+            except (IOError, OSError, ValueError) as extract_err:
+                module.fail_json(msg='Failed to extract {0}: {1}'.format(src, to_native(extract_err)), **results)
+
+    settings = dict((key, to_native(value)) for key, value in module.params['settings'].items())
+    if module.params['license_key'] is not None:
+        settings['license_key'] = module.params['license_key']
+    if settings:
+        try:
+            results['config_changed'] = update_config(module, results['config'], settings)
+        except (IOError, OSError) as config_err:
+            module.fail_json(msg='Failed to update {0}: {1}'.format(results['config'], to_native(config_err)), **results)
+        results['changed'] |= bool(results['config_changed'])
+
+    if module.params['installer_dmg']:
+        try:
+            results['changed'] |= link_installer_dmg(module, results['dmg_dir'], module.params['installer_dmg'])
+        except OSError as link_err:
+            module.fail_json(msg='Failed to link the installer DMG: {0}'.format(to_native(link_err)), **results)
+
+    return results
+
+
+@profile_entrypoint('parallels_autodeploy')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'src': {'type': 'path', 'required': True},
+            'dest': {'type': 'path', 'required': True},
+            'license_key': {'type': 'str', 'no_log': True},
+            'settings': {
+                'type': 'dict',
+                'default': {
+                    'updates_auto_check': '0',
+                    'updates_auto_download': 'off',
+                },
+            },
+            'installer_dmg': {'type': 'path'},
+        },
+        add_file_common_args=True,
+        supports_check_mode=True,
+    )
+
+    results = prepare(module)
+
+    if os.path.isdir(module.params['dest']):
+        file_args = module.load_file_common_arguments(module.params, path=module.params['dest'])
+        results['changed'] = module.set_fs_attributes_if_different(file_args, results['changed'])
+
+    module.exit_json(**results)
+
+
+if __name__ == '__main__':
+    main()
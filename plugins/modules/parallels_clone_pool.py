@@ -0,0 +1,432 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: parallels_clone_pool
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Keep a warm pool of linked clones of a Parallels Desktop VM
+notes:
+  - Concurrent runs against the same pool are serialized with a lock on the
+    pool index, so two jobs never lease the same clone.
+description:
+  - Maintain a pool of linked clones of a template VM, created with
+    C(prlctl clone --linked), so that CI jobs can lease a clone instantly
+    instead of waiting for a clone to be created.
+  - The pool is tracked in a JSON index on the host. Each run reconciles
+    the index against a single C(prlctl list) call, whatever the pool size.
+  - Released clones are destroyed, and recreated when I(recycle) is set,
+    by a background process, so that releasing never blocks the job. The
+    outcome of background work is picked up by the next run, from the exit
+    status the background process records. A clone whose background work
+    failed is destroyed rather than leased.
+options:
+  pool:
+    description: Name of the pool, also used as the prefix of the clone names.
+    type: str
+    required: true
+  template:
+    description: Name or UUID of the VM to clone.
+    type: str
+    required: true
+  state:
+    description:
+      - C(present) creates clones until I(size) clones are ready to be leased.
+      - C(acquired) leases a ready clone, creating one when none is ready,
+        then tops the pool up in the background.
+      - C(released) returns I(clone) to the pool.
+      - C(absent) destroys every clone of the pool. Clones still being
+        created or recycled in the background are left to the next run.
+    type: str
+    choices: [present, acquired, released, absent]
+    default: present
+  size:
+    description: Number of clones to keep ready to be leased.
+    type: int
+    default: 4
+  clone:
+    description: Name of the clone to release. Required with I(state=released).
+    type: str
+  recycle:
+    description:
+      - Recreate released clones from the template.
+      - When disabled, released clones are destroyed and the pool is only
+        topped up by the next C(present) or C(acquired) run.
+    type: bool
+    default: true
+  index_dir:
+    description:
+      - Directory of the pool indexes and background work logs.
+      - It is created when missing, except in check mode where a missing index is an empty pool.
+    type: path
+    default: ~/.ansible/cache/samdoran.macos/clone_pools
+  max_workers:
+    description: Number of clones created at the same time.
+    type: int
+    default: 4
+"""
+
+EXAMPLES = """
+- name: Keep eight macOS guests ready
+  samdoran.macos.parallels_clone_pool:
+    pool: macos-ci
+    template: macOS-12-template
+    size: 8
+
+- name: Lease a guest for the job
+  samdoran.macos.parallels_clone_pool:
+    pool: macos-ci
+    template: macOS-12-template
+    state: acquired
+  register: lease
+
+- name: Give the guest back once the job is done
+  samdoran.macos.parallels_clone_pool:
+    pool: macos-ci
+    template: macOS-12-template
+    state: released
+    clone: "{{ lease.clone.name }}"
+"""
+
+RETURN = """
+clone:
+  description: Leased clone
+  returned: when I(state=acquired)
+  type: dict
+  contains:
+    name:
+      description: Name of the clone
+      type: str
+    uuid:
+      description: UUID of the clone
+      type: str
+  sample:
+    name: macos-ci-0007
+    uuid: 7d1d0b67-3b2f-4b4e-8e0a-bd3ab17c2c52
+created:
+  description: Names of the clones created during this run
+  returned: always
+  type: list
+  elements: str
+scheduled:
+  description: Names of the clones handed over to background work during this run
+  returned: always
+  type: list
+  elements: str
+pool_status:
+  description: Number of clones of the pool in each state after the run
+  returned: always
+  type: dict
+  sample:
+    ready: 7
+    leased: 1
+    creating: 0
+    recycling: 1
+    deleting: 0
+    stale: 0
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
+"""
+
+import errno
+import fcntl
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..module_utils.command_runner import CmdFailedError, get_command_runner, run_concurrently
+from ..module_utils.parallels import get_vm_uuid, parse_vm_list
+from ..module_utils.profiling import profile_entrypoint
+from ..module_utils.progress import is_process_alive
+from ..module_utils.python_runtime_compat import shlex_join
+
+
+CLONE_STATES = ('ready', 'leased', 'creating', 'recycling', 'deleting', 'stale')
+# NOTE: States owned by a background process until it exits.
+BACKGROUND_STATES = frozenset(('creating', 'recycling', 'deleting'))
+
+
+class ClonePool:
+    """On-host index of the clones of a pool."""
+
+    def __init__(self, index_dir, pool):  # type: (str, str) -> None
+        self.pool = pool
+        self.index_path = os.path.join(index_dir, '{0}.json'.format(pool))
+        self.log_path = os.path.join(index_dir, '{0}.log'.format(pool))
+        self.index = {'counter': 0, 'clones': {}}
+
+    def status_path(self, name):  # type: (str) -> str
+        """Return where the background work on *name* records its exit status."""
+        return os.path.join(os.path.dirname(self.index_path), '{0}.{1}.rc'.format(self.pool, name))
+
+    def pop_exit_status(self, name):  # type: (str) -> int | None
+        """Return and forget the exit status of the background work on *name*."""
+        status_path = self.status_path(name)
+        try:
+            with open(status_path) as status_file:
+                status = int(status_file.read().strip())
+        except (IOError, OSError, ValueError):
+            # NOTE: The background process was killed before recording it.
+            status = None
+        try:
+            os.unlink(status_path)
+        except OSError as os_err:
+            if os_err.errno != errno.ENOENT:
+                raise
+        return status
+
+    @property
+    def clones(self):  # type: () -> dict[str, dict]
+        return self.index['clones']
+
+    def load(self):  # type: () -> None
+        try:
+            with open(self.index_path) as index_file:
+                self.index = json.load(index_file)
+        except (IOError, OSError) as os_err:
+            if os_err.errno != errno.ENOENT:
+                raise
+
+    def save(self):  # type: () -> None
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.index_path), prefix='.{0}-'.format(self.pool))
+        with os.fdopen(fd, 'w') as tmp_file:
+            json.dump(self.index, tmp_file, indent=2, sort_keys=True)
+        os.rename(tmp_path, self.index_path)
+
+    def next_name(self):  # type: () -> str
+        self.index['counter'] += 1
+        return '{0}-{1:04d}'.format(self.pool, self.index['counter'])
+
+    def in_state(self, state):  # type: (str) -> list[str]
+        return sorted(name for name, clone in self.clones.items() if clone['state'] == state)
+
+    def status(self):  # type: () -> dict[str, int]
+        return dict((state, len(self.in_state(state))) for state in CLONE_STATES)
+
+    def reconcile(self, vms_by_name):  # type: (dict[str, dict]) -> None
+        """Fold finished background work and vanished VMs into the index."""
+        for name, clone in list(self.clones.items()):
+            if clone['state'] in BACKGROUND_STATES:
+                if self.is_busy(name):
+                    continue
+                exit_status = self.pop_exit_status(name)
+            vm = vms_by_name.get(name)
+            if vm is None:
+                del self.clones[name]
+            elif clone['state'] == 'deleting':
+                # NOTE: The background delete failed, try again.
+                clone['state'] = 'stale'
+            elif clone['state'] in BACKGROUND_STATES:
+                # NOTE: A failed recycle may leave the used VM behind.
+                state = 'ready' if exit_status == 0 else 'stale'
+                clone.update(state=state, uuid=get_vm_uuid(vm), pid=None)
+            elif clone['state'] != 'stale':
+                clone['uuid'] = get_vm_uuid(vm)
+
+    def is_busy(self, name):  # type: (str) -> bool
+        """Tell whether background work on *name* is still running."""
+        clone = self.clones[name]
+        return clone['state'] in BACKGROUND_STATES and bool(clone.get('pid')) and is_process_alive(clone['pid'])
+
+
+def list_vms(runner, prlctl):  # type: (...) -> dict[str, dict]
+    res = runner.run([prlctl, 'list', '--all', '--json'])
+    return dict((vm['name'], vm) for vm in parse_vm_list(res['stdout']))
+
+
+def clone_command(prlctl, template, name):  # type: (str, str, str) -> list[str]
+    return [prlctl, 'clone', template, '--name', name, '--linked']
+
+
+def destroy_commands(prlctl, name):  # type: (str, str) -> list[list[str]]
+    return [[prlctl, 'stop', name, '--kill'], [prlctl, 'delete', name]]
+
+
+def spawn_background(pool, name, commands):  # type: (ClonePool, str, list[list[str]]) -> int
+    """Run *commands* on *name* in a detached shell outliving the module, return its PID."""
+    status_path = pool.status_path(name)
+    pool.pop_exit_status(name)
+    script = '(\n{0}\n)\necho $? > {1}'.format(
+        '\n'.join(
+            # NOTE: `prlctl stop` fails on a stopped VM, which is fine.
+            shlex_join(command) + (' || true' if command[1] == 'stop' else ' || exit 1')
+            for command in commands
+        ),
+        shlex_join([status_path]),
+    )
+    with open(pool.log_path, 'a') as log_file:
+        log_file.write('# {0}\n{1}\n'.format(time.strftime('%Y-%m-%dT%H:%M:%S'), script))
+        log_file.flush()
+        with open(os.devnull, 'rb') as devnull:
+            proc = subprocess.Popen(
+                ['/bin/sh', '-c', script],
+                stdin=devnull,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                close_fds=True,
+                preexec_fn=os.setsid,
+            )
+    return proc.pid
+
+
+def create_clones(module, runner, prlctl, pool, count):  # type: (...) -> list[str]
+    """Create *count* clones right away, a few at a time."""
+    names = [pool.next_name() for _clone_index in range(count)]
+    outcomes = run_concurrently(
+        lambda name: runner.run(clone_command(prlctl, module.params['template'], name)),
+        names,
+        max_workers=module.params['max_workers'],
+    )
+    created = []
+    errors = []
+    for name, (_res, exc) in zip(names, outcomes):
+        if exc is None:
+            created.append(name)
+            pool.clones[name] = {'state': 'ready', 'uuid': None, 'pid': None}
+        else:
+            errors.append('{0}: {1}'.format(name, getattr(exc, 'error_args', {}).get('stderr', '').strip() or exc))
+    if errors:
+        pool.save()
+        module.fail_json(msg='Failed to create clones: {0}'.format('; '.join(errors)), created=created)
+    return created
+
+
+def schedule(pool, name, state, commands):  # type: (...) -> None
+    clone = pool.clones.setdefault(name, {'uuid': None})
+    clone.update(state=state, pid=spawn_background(pool, name, commands))
+
+
+def top_up_in_background(module, prlctl, pool, scheduled):  # type: (...) -> None
+    missing = module.params['size'] - len(pool.in_state('ready')) - len(pool.in_state('creating'))
+    for _clone_index in range(max(missing, 0)):
+        name = pool.next_name()
+        schedule(pool, name, 'creating', [clone_command(prlctl, module.params['template'], name)])
+        scheduled.append(name)
+
+
+def manage_pool(module, runner, prlctl, pool):  # type: (...) -> dict
+    params = module.params
+    state = params['state']
+    results = {'changed': False, 'created': [], 'scheduled': []}
+
+    pool.reconcile(list_vms(runner, prlctl))
+
+    stale = pool.in_state('stale')
+    if state == 'absent':
+        # NOTE: Clones still in a background state after reconciling have a
+        # NOTE: live worker, and deleting them would race it.
+        targets = [name for name in pool.clones if pool.clones[name]['state'] not in BACKGROUND_STATES]
+    else:
+        surplus = max(len(pool.in_state('ready')) - params['size'], 0) if state == 'present' else 0
+        targets = stale + pool.in_state('ready')[-surplus:] if surplus else stale
+
+    if state == 'released':
+        clone = pool.clones.get(params['clone'])
+        if clone is None:
+            module.fail_json(msg='{0} is not a clone of the {1} pool'.format(params['clone'], pool.pool))
+        if clone['state'] == 'leased':
+            targets = targets + [params['clone']]
+
+    if module.check_mode:
+        results['changed'] = bool(targets) or (
+            state in ('present', 'acquired') and len(pool.in_state('ready')) < params['size']
+        )
+        results['pool_status'] = pool.status()
+        return results
+
+    for name in targets:
+        commands = destroy_commands(prlctl, name)
+        next_state = 'deleting'
+        if state == 'released' and name == params['clone'] and params['recycle']:
+            commands.append(clone_command(prlctl, params['template'], name))
+            next_state = 'recycling'
+        schedule(pool, name, next_state, commands)
+        results['scheduled'].append(name)
+
+    if state == 'present':
+        missing = params['size'] - len(pool.in_state('ready'))
+        if missing > 0:
+            results['created'] = create_clones(module, runner, prlctl, pool, missing)
+
+    if state == 'acquired':
+        ready = pool.in_state('ready')
+        if not ready:
+            ready = results['created'] = create_clones(module, runner, prlctl, pool, 1)
+        name = ready[0]
+        if pool.clones[name]['uuid'] is None:
+            pool.clones[name]['uuid'] = get_vm_uuid(list_vms(runner, prlctl)[name])
+        pool.clones[name].update(state='leased', leased_at=time.time())
+        results['clone'] = {'name': name, 'uuid': pool.clones[name]['uuid']}
+        top_up_in_background(module, prlctl, pool, results['scheduled'])
+
+    results['changed'] = bool(results['created'] or results['scheduled'] or 'clone' in results)
+    results['pool_status'] = pool.status()
+    return results
+
+
+def update_pool(module, runner, prlctl, pool):  # type: (...) -> dict
+    """Run :func:`manage_pool` against the index, locked for the whole run."""
+    index_dir = os.path.dirname(pool.index_path)
+    if not os.path.isdir(index_dir):
+        os.makedirs(index_dir)
+
+    with open(pool.index_path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        pool.load()
+        results = manage_pool(module, runner, prlctl, pool)
+        if not module.check_mode:
+            pool.save()
+    return results
+
+
+@profile_entrypoint('parallels_clone_pool')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'pool': {'type': 'str', 'required': True},
+            'template': {'type': 'str', 'required': True},
+            'state': {'type': 'str', 'choices': ['present', 'acquired', 'released', 'absent'], 'default': 'present'},
+            'size': {'type': 'int', 'default': 4},
+            'clone': {'type': 'str'},
+            'recycle': {'type': 'bool', 'default': True},
+            'index_dir': {'type': 'path', 'default': '~/.ansible/cache/samdoran.macos/clone_pools'},
+            'max_workers': {'type': 'int', 'default': 4},
+        },
+        required_if=[('state', 'released', ['clone'])],
+        supports_check_mode=True,
+    )
+    runner = get_command_runner(module)
+    prlctl = module.get_bin_path('prlctl', required=True, opt_dirs=['/usr/local/bin'])
+
+    index_dir = module.params['index_dir']
+    pool = ClonePool(index_dir, module.params['pool'])
+    try:
+        if module.check_mode and not os.path.isdir(index_dir):
+            # NOTE: Without an index directory the pool is empty, and check
+            # NOTE: mode does not create it.
+            results = manage_pool(module, runner, prlctl, pool)
+        else:
+            results = update_pool(module, runner, prlctl, pool)
+    except CmdFailedError as cmd_err:
+        module.fail_json(**runner.annotate(cmd_err.error_args))
+
+    module.exit_json(**runner.annotate(results))
+
+
+if __name__ == '__main__':
+    main()
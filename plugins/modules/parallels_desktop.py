@@ -36,6 +36,9 @@ description:
 - waiting for it to terminate and then following up with
 - C(kill -SIGTERM) and finally with C(kill -SIGKILL) as the last
 - resort. The use of the fallbacks depends on the ``state`` requested.
+- Every running instance of the app, e.g. one per logged in user, is
+- stopped. The instances go through the fallbacks together, so stopping
+- them all takes as long as stopping the slowest one.
 notes: []
 
 options:
@@ -52,6 +55,30 @@ options:
     - murdered
     type: str
 
+  gather_facts:
+    default: false
+    description: >-
+      Gather the C(parallels) facts, like
+      M(samdoran.macos.parallels_facts) does, once the requested state
+      is achieved and return them in the same result.
+    type: bool
+
+  sdk_version_cache:
+    default: ~/.ansible/cache/samdoran.macos/parallels_sdk.json
+    description: >-
+      Path to the file caching the Parallels Virtualization SDK version
+      when I(gather_facts) is set. Set to an empty string to always query
+      the SDK. The cache is read but not written in check mode.
+    type: path
+
+  progress_file:
+    description: >-
+      Path of a JSON file rewritten with the current stage, the VMs still
+      running and the elapsed time as the module makes progress. Read it
+      with M(samdoran.macos.parallels_desktop_status) while the module
+      runs under C(async).
+    type: path
+
 ...
 """
 
@@ -62,12 +89,31 @@ EXAMPLES = """
   samdoran.macos.parallels_desktop:
     state: murdered
 
+- name: Stop Parallels Desktop in the background, reporting progress
+  samdoran.macos.parallels_desktop:
+    state: murdered
+    progress_file: /var/tmp/parallels-desktop-progress.json
+  async: 900
+  poll: 0
+
+- name: Start Parallels Desktop and refresh the Parallels facts
+  samdoran.macos.parallels_desktop:
+    state: started
+    gather_facts: true
+
 ...
 """
 
 RETURN = """
 ---
 
+ansible_facts:
+  description: >-
+    The C(parallels) facts, as returned by
+    M(samdoran.macos.parallels_facts)
+  returned: when I(gather_facts) is set and the facts could be gathered
+  type: dict
+
 cmd:
   description: Raw underlying command
   returned: failure
@@ -78,11 +124,82 @@ cmd_string:
   returned: failure
   type: str
 
+command_stats:
+  description: >-
+    Count and latency of the subprocesses run by the module, reported when
+    the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a
+    true value on the target.
+  returned: when requested
+  type: dict
+  contains:
+    count:
+      description: Number of subprocesses run
+      type: int
+    failed:
+      description: Number of subprocesses exiting with a non-zero code
+      type: int
+    timed_out:
+      description: Number of subprocesses killed on timeout
+      type: int
+    total_seconds:
+      description: Combined wall-clock time of all subprocesses
+      type: float
+    max_seconds:
+      description: Wall-clock time of the slowest subprocess
+      type: float
+    mean_seconds:
+      description: Average wall-clock time of a subprocess
+      type: float
+    calls:
+      description: Command string, return code and duration of each call
+      type: list
+      elements: dict
+
+duration:
+  description: Wall-clock time of the underlying command in seconds
+  returned: failure
+  type: float
+
 msg:
   description: Execution details
   returned: always
   type: str
 
+processes:
+  description: What happened to each instance of the app, by PID
+  returned: when a stopped I(state) is requested
+  type: list
+  elements: dict
+  contains:
+    pid:
+      description: PID of the instance
+      type: int
+    outcome:
+      description: >-
+        The stop method the instance exited after, either C(terminated),
+        C(killed) or C(murdered), or C(running) if it survived them all or
+        in check mode
+      type: str
+    seconds:
+      description: >-
+        Seconds from the first stop attempt to the instance exit, or
+        C(null) if it did not exit
+      type: float
+    errors:
+      description: Errors delivering the stop requests to the instance
+      type: list
+      elements: str
+  sample:
+    - pid: 4242
+      outcome: terminated
+      seconds: 1.52
+      errors: []
+    - pid: 4343
+      outcome: murdered
+      seconds: 101.03
+      errors:
+        - '[rc=1] Running `kill -SIGTERM 4343` was unsuccessful'
+
 rc:
   description: Return code of the underlying command
   returned: failure
@@ -114,18 +231,31 @@ except ImportError:
     pass
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.common.text.converters import to_text
+from ..module_utils.command_runner import (  # noqa: WPS300
+    CmdFailedError,
+    CommandRunner,
+    ModuleError as ParallelsDesktopModuleError,
+    get_command_runner,
+    run_concurrently,
+)
+from ..module_utils.parallels_facts import (  # noqa: WPS300
+    DEFAULT_SDK_VERSION_CACHE,
+    gather_parallels_facts,
+)
+from ..module_utils.profiling import profile_entrypoint
+from ..module_utils.progress import ProgressFile
 from ..module_utils.python_runtime_compat import raise_from
 
 from ..module_utils.python_runtime_compat import (  # noqa: WPS300
     get_signal_name,
     shlex_join as _shlex_join,
-    TimeoutError,
 )
 
 PY2 = sys.version_info[0] == 2
 
 VM_SHUTDOWN_GRACE_DELAY = 30
+VM_SHUTDOWN_POLL_INTERVAL = 5
+APP_EXIT_POLL_INTERVAL = 0.5
 
 
 PARALLELS_DESKTOP_APP_NAME = 'Parallels Desktop'
@@ -139,6 +269,13 @@ _STOPPED_STATE_REQUESTS = [
     'murdered',
 ]  # type: list[str]
 
+# NOTE: Progress stage reported while trying each stop method.
+_APP_STOP_PROGRESS_STAGES = {
+    'terminated': 'quitting_app',
+    'killed': 'terminating_app',
+    'murdered': 'killing_app',
+}  # type: dict[str, str]
+
 
 ANTICIPATED_KILL_FAILURES = (
     OSError if PY2
@@ -146,85 +283,12 @@ ANTICIPATED_KILL_FAILURES = (
 )  # type: Exception | tuple[Exception, ...]
 
 
-class ParallelsDesktopModuleError(RuntimeError):
-    """Exception representing an Ansible module generic failure."""
-
-    def __init__(
-            self,  # noqa: WPS318
-            msg,  # type: str
-            error_args,  # type: dict
-            *args,  # type: list
-            **kwargs  # type: dict
-    ):  # type: (...) -> None
-        """Initialize a Parallels Desktop error instance.
-
-        :param msg: Error message, overrides ``error_args['msg']`` if not set.
-
-        :param error_args: A mapping with arbitrary context.
-        """
-        super(ParallelsDesktopModuleError, self).__init__(msg, *args, **kwargs)
-
-        self.error_args = error_args
-        self.error_args['msg'] = self.error_args.get('msg', msg)
-
-    def __str__(self):  # type: () -> str
-        return self.error_args['msg']
-
-    def __unicode__(self):  # type: () -> str
-        return to_text(str(self))
-
-    def __repr__(self):  # type: () -> str
-        return (
-            '<{cls}(msg={msg!s}, error_args={error_args!s})> '
-            'at 0x{object_address_str:x}'.format(
-                cls=self.__class__.__name__,
-                error_args=repr(self.error_args),
-                msg=repr(str(self)),
-                object_address_str=id(self),
-            )
-        )
-
-
-class CmdFailedError(ParallelsDesktopModuleError):
-    """Exception representing an arbitraty command failure."""
-
-    def __init__(
-            self,  # noqa: WPS318
-            msg,  # type: str
-            error_args,  # type: dict
-            *args,  # type: list
-            **kwargs  # type: dict
-    ):  # type: (...) -> None
-        """Initialize a failed command error instance.
-
-        :param msg: Error message, overrides ``error_args['msg']`` if not set.
-
-        :param error_args: A mapping with arbitraty context, must contain
-                           ``cmd`` and ``rc`` -- failed command and return
-                           code respectively.
-        """
-        for mandatory_key in 'cmd', 'rc':
-            if mandatory_key not in error_args:
-                raise AssertionError(
-                    '`error_args` argument must contain `{missing_arg!s}` key'.
-                    format(missing_arg=mandatory_key),
-                )
+def _format_pids(pids):  # type: (list[int]) -> str
+    return ', '.join(str(pid) for pid in pids)
 
-        kwargs['error_args'] = error_args
-        super(CmdFailedError, self).__init__(msg, *args, **kwargs)
 
-    def __str__(self):  # type: () -> str
-        """Render the exception instance as a string."""
-        msg = super(CmdFailedError, self).__str__()
-        return '[rc={rc}] {msg}'.format(msg=msg, rc=self.error_args['rc'])
-
-    def __repr__(self):  # type: () -> str
-        """Render the exception instance representation as a string."""
-        parent_repr = super(CmdFailedError, self).__repr__()
-        return '{parent_repr} [failed with rc={rc}]'.format(
-            parent_repr=parent_repr,
-            rc=self.error_args['rc'],
-        )
+def _sorted_processes(processes):  # type: (dict[int, dict]) -> list[dict]
+    return [processes[pid] for pid in sorted(processes)]
 
 
 def process_syscall_errors(
@@ -299,9 +363,25 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
                     'default': 'started',
                     'choices': ['started'] + _STOPPED_STATE_REQUESTS,
                 },
+                'gather_facts': {
+                    'default': False,
+                    'type': 'bool',
+                },
+                'sdk_version_cache': {
+                    'default': DEFAULT_SDK_VERSION_CACHE,
+                    'type': 'path',
+                },
+                'progress_file': {
+                    'type': 'path',
+                },
             },
             supports_check_mode=True,
         )
+        self.progress = ProgressFile(
+            self.params['progress_file'],
+            requested_state=self.requested_state,
+        )
+        self.progress.update('checking_app')
 
         self.osascript = self.get_bin_path(
             'osascript',
@@ -326,7 +406,47 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
                 ),
             )
 
+    @property
+    def runner(self):  # type: () -> CommandRunner
+        """Return the instrumented command runner of this module."""
+        return get_command_runner(self)
+
+    def exit_json(self, **kwargs):  # type: (...) -> t.NoReturn
+        """Exit successfully, reporting command stats if requested.
+
+        The ``parallels`` facts are gathered right before exiting when
+        ``gather_facts`` is set, so they reflect the state achieved. The
+        state is achieved already, so failing to gather them only warns.
+        """
+        if self.params.get('gather_facts'):
+            try:
+                kwargs['ansible_facts'] = {
+                    'parallels': gather_parallels_facts(
+                        self, self.params['sdk_version_cache'],
+                    ),
+                }
+            except Exception as facts_exc:  # noqa: WPS424
+                self.warn(
+                    'Unable to gather the Parallels facts: {exc!s}'.
+                    format(exc=facts_exc),
+                )
+        self.progress.finish(failed=False, msg=kwargs.get('msg'))
+        super(ParallelsDesktopAnsibleModule, self).exit_json(
+            **self.runner.annotate(kwargs)
+        )
+
+    def fail_json(self, msg, **kwargs):  # type: (...) -> t.NoReturn
+        """Exit with a failure, reporting command stats if requested."""
+        # NOTE: Argument validation failures happen before progress exists.
+        progress = getattr(self, 'progress', None)
+        if progress is not None:
+            progress.finish(failed=True, msg=msg)
+        super(ParallelsDesktopAnsibleModule, self).fail_json(
+            msg, **self.runner.annotate(kwargs)
+        )
+
     @classmethod
+    @profile_entrypoint('parallels_desktop')
     def execute(cls):  # type: () -> None
         """Start invocation processing on initialized Ansible module."""
         cls().run()
@@ -371,43 +491,13 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
 
         :raises CmdFailedError: On unsuccessful return code.
         """
-        if not isinstance(cmd, str):
-            cmd = list(cmd)
-        return_code, standard_output, error_output = self.run_command(
-            cmd,
-            encoding='utf-8',
-            environ_update={},
-        )
-        cmd_string = cmd if isinstance(cmd, str) else _shlex_join(cmd)
-        res = {
-            'cmd': cmd,
-            'cmd_string': cmd_string,
-            'rc': return_code,
-            'stdout': standard_output,
-            'stderr': error_output,
-        }
-
-        if return_code != 0:
-            self.debug(
-                'Running `{cmd!s}` failed with the return '  # noqa: G001
-                'code of `{rc:d}`'.
-                format(cmd=cmd_string, rc=return_code),
-            )
-            raise CmdFailedError(
-                'Running `{cmd!s}` was unsuccessful'.
-                format(cmd=cmd_string),
-                error_args=res,
-            )
-
-        self.debug(
-            'Running `{cmd!s}` succeeded'.  # noqa: G001
-            format(cmd=cmd_string),
-        )
+        return self.runner.run(cmd)
 
-        return res
+    def get_parallels_pids(self):  # type: () -> list[int]
+        """Look up PIDs of the running Parallels instances.
 
-    def get_parallels_pid(self):  # type: () -> int
-        """Look up PID of the running Parallels instance.
+        Several instances run at once when Parallels Desktop has been
+        started in more than one user session.
 
         :raises LookupError: If there's no Parallels process.
         """
@@ -433,7 +523,10 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
             )
             raise LookupError  # NOTE: MyPy hack
 
-        return int(command_result['stdout'].strip())
+        return sorted(
+            int(pid_line)
+            for pid_line in command_result['stdout'].split()
+        )
 
     def get_running_vm_ids(self):  # type: () -> list[str]
         """Return a list of running VM UUIDs."""
@@ -448,7 +541,8 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
 
         This is implemented in several stages:
         * First, the ACPI signal is sent to the VMs
-        * Then, a 30-second delay gives those VMs to shut down gracefully
+        * Then, those VMs get up to 30 seconds to shut down gracefully,
+          polling the ones still running every 5 seconds
         * Finally, the remaining VMs are force-killed
         """
         vm_ids = self.get_running_vm_ids()
@@ -457,6 +551,7 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
             self.debug('No VMs are online. Nothing to do.')
             return
 
+        self.progress.update('stopping_vms', remaining_vms=vm_ids)
         if self.check_mode:
             return
 
@@ -465,10 +560,7 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
                 (self.prlctl_exe, 'stop', virtual_machine_uuid, '--acpi'),
             )
 
-        self.log('Taking a 30s nap to allow the VMs shut down gracefully...')
-        time.sleep(VM_SHUTDOWN_GRACE_DELAY)
-
-        remaining_vm_ids = self.get_running_vm_ids()
+        remaining_vm_ids = self.wait_for_vms_to_shut_down(vm_ids)
 
         if not remaining_vm_ids:
             self.debug('Gracefull shutdown exited all the VMs successfully...')
@@ -486,6 +578,7 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
         if not (set(vm_ids) >= set(remaining_vm_ids)):  # noqa: WPS508
             self.warn('A new VM got spawned while shutting down all VMs.')
 
+        self.progress.update('killing_vms', remaining_vms=remaining_vm_ids)
         for virtual_machine_uuid in remaining_vm_ids:  # noqa: WPS440
             self.run_with_raise(
                 (self.prlctl_exe, 'stop', virtual_machine_uuid, '--kill'),
@@ -499,18 +592,84 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
                 'all VMs: {vms!s}.'.format(vms=', '.join(remaining_vm_ids)),
             )
 
+    def wait_for_vms_to_shut_down(
+            self,  # noqa: WPS318
+            vm_ids,  # type: list[str]
+    ):  # type: (...) -> list[str]
+        """Give the VMs the grace delay to shut down, polling the survivors.
+
+        :returns: UUIDs of the VMs still running when the delay is over.
+        """
+        self.log(
+            'Waiting up to {delay:d}s for the VMs to shut down '
+            'gracefully...'.format(delay=VM_SHUTDOWN_GRACE_DELAY),
+        )
+        deadline = time.time() + VM_SHUTDOWN_GRACE_DELAY
+        remaining_vm_ids = vm_ids
+        while remaining_vm_ids:
+            time_left = deadline - time.time()
+            self.progress.update(
+                'waiting_for_vms',
+                remaining_vms=remaining_vm_ids,
+                grace_seconds_left=round(max(time_left, 0), 1),
+            )
+            if time_left <= 0:
+                break
+            time.sleep(min(VM_SHUTDOWN_POLL_INTERVAL, time_left))
+            remaining_vm_ids = self.get_running_vm_ids()
+
+        return remaining_vm_ids
+
+    def get_surviving_parallels_pids(
+            self,  # noqa: WPS318
+            original_pids,  # type: list[int]
+    ):  # type: (...) -> list[int]
+        """Return which of the original Parallels instances are still alive.
+
+        :raises ParallelsDesktopModuleError: If a Parallels Desktop process
+                                             not in *original_pids* appears.
+        """
+        try:
+            running_pids = self.get_parallels_pids()
+        except LookupError:
+            return []
+
+        new_pids = sorted(set(running_pids) - set(original_pids))
+        if new_pids:
+            raise ParallelsDesktopModuleError(
+                msg='Another `{app_name}` instance got re-spawned '
+                'unexpectedly by an external process. Make sure not '
+                'to start {app_name} while this module is running...'.
+                format(app_name=PARALLELS_DESKTOP_APP_NAME),
+                error_args={
+                    'Original {app_name} PIDs'.
+                    format(app_name=PARALLELS_DESKTOP_APP_NAME):
+                    original_pids,
+                    'New {app_name} PIDs'.
+                    format(app_name=PARALLELS_DESKTOP_APP_NAME):
+                    new_pids,
+                },
+            )
+
+        return [pid for pid in original_pids if pid in running_pids]
+
     def wait_for_parallels_app_to_die(
             self,  # noqa: WPS318
-            original_pid,  # type: int
+            original_pids,  # type: list[int]
             wait_cycles=100,  # type: int
-    ):  # type: (...) -> None
-        """Block until Parallels Desktop is dead or timeout reached.
+            on_exit=None,  # type: t.Callable[[int], None] | None
+    ):  # type: (...) -> list[int]
+        """Block until all Parallels Desktop instances are dead or timeout reached.
 
-        :param original_pid: Process ID for running the check against.
+        All the instances are polled together, so the wait lasts as long as
+        the slowest of them.
+
+        :param original_pids: Process IDs for running the check against.
         :param wait_cycles: Number of half-a-second loop iterations to wait for
                             Parallels to shut down.
+        :param on_exit: Called with each PID as soon as it is gone.
 
-        :raises TimeoutError: When the wait cycle exceeded.
+        :returns: PIDs still running when the wait cycles are exhausted.
         :raises ParallelsDesktopModuleError: If Parallels Desktop process is
                                              substituted suddenly.
         """
@@ -518,44 +677,54 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
         # NOTE: behavior except for the higher check frequency for better
         # NOTE: responsiveness.
         # FIXME: Should this implement a jittered exponential backoff instead??
-        try:
-            self.get_parallels_pid()
-        except LookupError:
-            return
+        remaining_pids = list(original_pids)
 
-        cycle_delay = 0.5
+        def reap(running_pids):  # type: (list[int]) -> list[int]  # noqa: WPS430
+            for gone_pid in set(remaining_pids) - set(running_pids):
+                if on_exit is not None:
+                    on_exit(gone_pid)
+            return running_pids
+
+        remaining_pids = reap(self.get_surviving_parallels_pids(original_pids))
+
+        cycle_delay = APP_EXIT_POLL_INTERVAL
         for wait_cycle in range(wait_cycles):
+            if not remaining_pids:
+                break
             time.sleep(cycle_delay)
             self.debug(
                 'Waitied for {duration!s}...'.  # noqa: G001
                 format(duration=cycle_delay * wait_cycle),
             )
-
-            try:
-                parallels_desktop_pid = self.get_parallels_pid()
-            except LookupError:
-                break
-            if parallels_desktop_pid != original_pid:
-                raise ParallelsDesktopModuleError(
-                    msg='Another `{app_name}` instance got re-spawned '
-                    'unexpectedly by an external process. Make sure not '
-                    'to start {app_name} while this module is running...'.
-                    format(app_name=PARALLELS_DESKTOP_APP_NAME),
-                    error_args={
-                        'Original {app_name} PID'.
-                        format(app_name=PARALLELS_DESKTOP_APP_NAME):
-                        original_pid,
-                        'New {app_name} PID'.
-                        format(app_name=PARALLELS_DESKTOP_APP_NAME):
-                        parallels_desktop_pid,
-                    },
-                )
-        else:
-            # Still running
-            raise TimeoutError(
-                'Timed out waiting for process PID {pid:d}.'.
-                format(pid=original_pid),
+            self.progress.refresh(
+                pids=remaining_pids, wait_cycle=wait_cycle + 1,
             )
+            remaining_pids = reap(
+                self.get_surviving_parallels_pids(original_pids),
+            )
+
+        return remaining_pids
+
+    def signal_parallels_instances(
+            self,  # noqa: WPS318
+            pids,  # type: list[int]
+            process_signal,  # type: signal.Signals
+    ):  # type: (...) -> list[tuple[int, CmdFailedError | None]]
+        """Send *process_signal* to all the given instances at once.
+
+        :returns: ``(pid, error)`` pairs, the error being set when the signal
+                  could not be delivered.
+        """
+        outcomes = run_concurrently(
+            lambda pid: process_syscall_errors(os.kill, pid, process_signal)(),
+            pids,
+        )
+        signal_errors = []  # type: list[tuple[int, CmdFailedError | None]]
+        for pid, (_res, kill_exc) in zip(pids, outcomes):
+            if kill_exc is not None and not isinstance(kill_exc, CmdFailedError):
+                raise kill_exc
+            signal_errors.append((pid, kill_exc))
+        return signal_errors
 
     def kindly_ask_parallels_desktop_app_to_quit(self):  # type: () -> None
         """Tell Parallels to quit via ``osascript``.
@@ -604,9 +773,10 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
     ):  # type: () -> dict[str, bool | str]
         """Make sure the Parallels Desktop app is running."""
         try:
-            parallels_pid = self.get_parallels_pid()
+            parallels_pids = self.get_parallels_pids()
         except LookupError:
-            parallels_pid = -1
+            parallels_pids = []
+            self.progress.update('starting_app')
             spawn_parallels_cmd = 'open', '-a', 'Parallels Desktop', '--hide'
             # NOTE: This may error out with rc=1 and the following stderr:
             # NOTE: "LSOpenURLsWithRole() failed for the application
@@ -614,14 +784,14 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
 
             if not self.check_mode:
                 self.run_with_raise(spawn_parallels_cmd)
-                parallels_pid = self.get_parallels_pid()
+                parallels_pids = self.get_parallels_pids()
 
             return {
                 'msg': 'The {app!s} app (process: `{proc!s}`; '
-                'PID: `{pid:d}`) has been started successfully.'.
+                'PIDs: `{pids!s}`) has been started successfully.'.
                 format(
                     app=PARALLELS_DESKTOP_APP_NAME,
-                    pid=parallels_pid,
+                    pids=_format_pids(parallels_pids),
                     proc=PARALLELS_DESKTOP_PROCESS_NAME,
                 ),
                 'changed': True,
@@ -629,10 +799,10 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
 
         return {
             'msg': 'The {app!s} app (process: `{proc!s}`; '
-            'PID: `{pid:d}`) is already running.'.
+            'PIDs: `{pids!s}`) is already running.'.
             format(
                 app=PARALLELS_DESKTOP_APP_NAME,
-                pid=parallels_pid,
+                pids=_format_pids(parallels_pids),
                 proc=PARALLELS_DESKTOP_PROCESS_NAME,
             ),
             'changed': False,
@@ -640,10 +810,10 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
 
     def ensure_app_terminated(  # noqa: WPS231
             self,  # noqa: WPS318
-    ):  # type: () -> dict[str, bool | str]
-        """Make sure the Parallels Desktop app isn't running.
+    ):  # type: () -> dict[str, bool | str | list]
+        """Make sure no Parallels Desktop app instance is running.
 
-        If it does, attempt terminating in 3 fallback stages:
+        If any does, attempt terminating in 3 fallback stages:
         * Using ``osascript`` (stops here, if the `terminated` state
           is requested)
         * Using ``SIGTERM`` kill signal (stops if the requested state
@@ -651,86 +821,127 @@ class ParallelsDesktopAnsibleModule(AnsibleModule):  # noqa: WPS214
         * Using ``SIGKILL`` kill signal (stops if the requested state
           is `murdered`)
 
+        Every instance found, e.g. one per logged in user, goes through the
+        stages together: each stage signals all the survivors of the
+        previous one at once and then waits for all of them at once. What
+        happened to each PID is reported in ``processes``.
+
         This function attempts to shut down any running VMs before attempting
         to do the same to the Parallels Desktop app itself.
 
         :raises ParallelsDesktopModuleError: If the procedure hasn't succeeded.
         """
         try:
-            parallels_pid = self.get_parallels_pid()
+            parallels_pids = self.get_parallels_pids()
         except LookupError as lookup_error:
             return {
                 'msg': str(lookup_error),
                 'changed': False,
+                'processes': [],
             }
 
-        terminate_parallels = process_syscall_errors(
-            os.kill, parallels_pid, signal.SIGTERM,
-        )
-        destroy_parallels = process_syscall_errors(
-            os.kill, parallels_pid, signal.SIGKILL,
-        )
+        started_at = time.time()
+        processes = dict(
+            (pid, {'pid': pid, 'outcome': 'running', 'seconds': None, 'errors': []})
+            for pid in parallels_pids
+        )  # type: dict[int, dict]
+
+        def record_stage(stage):  # type: (str) -> t.Callable[[int], None]  # noqa: WPS430
+            def record_exit(pid):  # type: (int) -> None  # noqa: WPS430
+                processes[pid]['outcome'] = stage
+                processes[pid]['seconds'] = round(time.time() - started_at, 3)
+            return record_exit
+
+        def quit_parallels(pids):  # type: (list[int]) -> list  # noqa: WPS430
+            try:
+                self.kindly_ask_parallels_desktop_app_to_quit()
+            except CmdFailedError as cmd_err:
+                return [(pid, cmd_err) for pid in pids]
+            return []
+
         parallels_termination_stages = (
+            ('terminated', quit_parallels, 100, (errno.EPERM, )),
             (
-                'terminated',
-                self.kindly_ask_parallels_desktop_app_to_quit,
+                'killed',
+                lambda pids: self.signal_parallels_instances(pids, signal.SIGTERM),
                 100,
                 (errno.EPERM, ),
             ),
-            ('killed', terminate_parallels, 100, (errno.EPERM, )),
-            ('murdered', destroy_parallels, 5, ()),
+            (
+                'murdered',
+                lambda pids: self.signal_parallels_instances(pids, signal.SIGKILL),
+                5,
+                (),
+            ),
         )
 
         self.ensure_running_vms_stopped()
 
-        killing_error_message = None
+        remaining_pids = parallels_pids
         for (
             stage,
             kill_parallels,
             wait_cycles,
             ignorrable_errors,
         ) in parallels_termination_stages:
-            if not self.check_mode:
-                try:
-                    kill_parallels()
-                except CmdFailedError as cmd_err:
-                    if cmd_err.error_args.get('rc') not in ignorrable_errors:
-                        raise
+            self.progress.update(
+                _APP_STOP_PROGRESS_STAGES[stage],
+                pids=remaining_pids,
+                wait_cycle=0,
+                wait_cycles=wait_cycles,
+            )
+            if self.check_mode:
+                # NOTE: Nothing was signalled, so every PID stays `running`.
+                remaining_pids = []
+                break
 
-            try:
-                if not self.check_mode:
-                    self.wait_for_parallels_app_to_die(
-                        parallels_pid, wait_cycles,
+            for pid, cmd_err in kill_parallels(remaining_pids):
+                if cmd_err is None:
+                    continue
+                processes[pid]['errors'].append(str(cmd_err))
+                if cmd_err.error_args.get('rc') not in ignorrable_errors:
+                    raise ParallelsDesktopModuleError(
+                        msg=str(cmd_err),
+                        error_args=dict(
+                            cmd_err.error_args,
+                            processes=_sorted_processes(processes),
+                        ),
                     )
-            except TimeoutError as timeout_exc:
-                killing_error_message = str(timeout_exc)
-            else:
-                return {
-                    'msg': 'The {app!s} app (process: `{proc!s}`; '
-                    'PID: `{pid:d}`) has been {stage!s}.'.
-                    format(
-                        app=PARALLELS_DESKTOP_APP_NAME,
-                        pid=parallels_pid,
-                        proc=PARALLELS_DESKTOP_PROCESS_NAME,
-                        stage=stage,
-                    ),
-                    'changed': True,
-                }
 
-            if self.requested_state == stage:
+            remaining_pids = self.wait_for_parallels_app_to_die(
+                remaining_pids, wait_cycles, on_exit=record_stage(stage),
+            )
+            if not remaining_pids or self.requested_state == stage:
                 break
 
-        raise ParallelsDesktopModuleError(
-            changed=False,
-            error_args={},
-            msg='Failed to terminate the {app!s} app '
-            '(process: `{proc!s}`): {msg!s}'.
+        if remaining_pids:
+            raise ParallelsDesktopModuleError(
+                error_args={
+                    'changed': False,
+                    'processes': _sorted_processes(processes),
+                },
+                msg='Failed to terminate the {app!s} app '
+                '(process: `{proc!s}`): Timed out waiting for '
+                'PIDs {pids!s}.'.
+                format(
+                    app=PARALLELS_DESKTOP_APP_NAME,
+                    pids=_format_pids(remaining_pids),
+                    proc=PARALLELS_DESKTOP_PROCESS_NAME,
+                ),
+            )
+
+        return {
+            'msg': 'The {app!s} app (process: `{proc!s}`; '
+            'PIDs: `{pids!s}`) has been {stage!s}.'.
             format(
                 app=PARALLELS_DESKTOP_APP_NAME,
-                msg=killing_error_message,
+                pids=_format_pids(parallels_pids),
                 proc=PARALLELS_DESKTOP_PROCESS_NAME,
+                stage=stage,
             ),
-        )
+            'changed': True,
+            'processes': _sorted_processes(processes),
+        }
 
 
 if __name__ == '__main__':
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright Sviatoslav Sydorenko
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Support for following the progress of the Parallels Desktop module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+---
+
+module: parallels_desktop_status
+version_added: 2.7.0
+
+author:
+- Sviatoslav Sydorenko (@webknjaz)
+
+short_description: Read the progress of a M(samdoran.macos.parallels_desktop) run
+description:
+- Read the progress file written by M(samdoran.macos.parallels_desktop)
+  when its C(progress_file) option is set.
+- This is meant for following a run started with C(async), to report its
+  progress or to give up on it after a deadline of the caller's choosing.
+notes:
+- The file only appears once the module got past its argument parsing,
+  so a missing file is not an error.
+
+options:
+  path:
+    description: Path of the progress file.
+    required: true
+    type: path
+
+...
+"""
+
+EXAMPLES = """
+---
+
+- name: Stop Parallels Desktop in the background
+  samdoran.macos.parallels_desktop:
+    state: murdered
+    progress_file: /var/tmp/parallels-desktop-progress.json
+  async: 900
+  poll: 0
+
+- name: Wait for Parallels Desktop to be stopped, for 5 minutes at most
+  samdoran.macos.parallels_desktop_status:
+    path: /var/tmp/parallels-desktop-progress.json
+  register: parallels_stop
+  until: >-
+    parallels_stop.exists
+    and (parallels_stop.finished or not parallels_stop.running)
+  retries: 60
+  delay: 5
+  failed_when: >-
+    parallels_stop.failed_run
+    or (parallels_stop.exists and not parallels_stop.finished)
+
+...
+"""
+
+RETURN = """
+---
+
+exists:
+  description: Whether the progress file exists yet
+  returned: always
+  type: bool
+
+requested_state:
+  description: State requested from M(samdoran.macos.parallels_desktop)
+  returned: when the file exists
+  type: str
+
+stage:
+  description: >-
+    Current stage, one of C(checking_app), C(starting_app),
+    C(stopping_vms), C(waiting_for_vms), C(killing_vms),
+    C(quitting_app), C(terminating_app), C(killing_app) and C(finished)
+  returned: when the file exists
+  type: str
+
+details:
+  description: >-
+    Details of the current stage, such as C(remaining_vms),
+    C(grace_seconds_left), C(pids), C(wait_cycle) and C(wait_cycles)
+  returned: when the file exists
+  type: dict
+
+elapsed:
+  description: Seconds between the start of the run and its last update
+  returned: when the file exists
+  type: float
+
+age:
+  description: Seconds since the last update of the file
+  returned: when the file exists
+  type: float
+
+finished:
+  description: Whether the run is complete
+  returned: always
+  type: bool
+
+failed_run:
+  description: Whether the run completed with a failure
+  returned: always
+  type: bool
+
+running:
+  description: Whether the process of an unfinished run is still alive
+  returned: always
+  type: bool
+
+run_msg:
+  description: Final message of the run
+  returned: when the run is finished
+  type: str
+
+events:
+  description: One entry per stage change, with its C(stage), C(elapsed) time and C(details)
+  returned: when the file exists
+  type: list
+  elements: dict
+
+...
+"""
+
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_native
+
+from ..module_utils.profiling import profile_entrypoint
+from ..module_utils.progress import is_process_alive, read_progress
+
+
+def summarize_progress(progress):  # type: (dict | None) -> dict
+    """Turn a progress document into the module result."""
+    if progress is None:
+        return {
+            'exists': False,
+            'finished': False,
+            'failed_run': False,
+            'running': False,
+        }
+
+    result = {
+        'exists': True,
+        'requested_state': progress.get('requested_state'),
+        'stage': progress['stage'],
+        'details': progress['details'],
+        'elapsed': progress['elapsed'],
+        'age': round(max(time.time() - progress['updated_at'], 0), 3),
+        'finished': progress['finished'],
+        'failed_run': progress['failed'],
+        'running': not progress['finished'] and is_process_alive(progress['pid']),
+        'events': progress['events'],
+    }
+    if progress['finished']:
+        result['run_msg'] = progress['msg']
+    return result
+
+
+@profile_entrypoint('parallels_desktop_status')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'path': {'type': 'path', 'required': True},
+        },
+        supports_check_mode=True,
+    )
+
+    try:
+        progress = read_progress(module.params['path'])
+    except (IOError, OSError, ValueError) as read_err:
+        module.fail_json(msg='Failed to read {0}: {1}'.format(module.params['path'], to_native(read_err)))
+
+    module.exit_json(changed=False, **summarize_progress(progress))
+
+
+if __name__ == '__main__':
+    main()
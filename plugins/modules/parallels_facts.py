@@ -16,6 +16,17 @@ short_description: Gather information about Parallels using the C(prlsrvctl) com
 notes: []
 description:
   - Gather information about Parallels using the C(prlsrvctl) command.
+  - The Parallels Virtualization SDK version is read from a cache keyed by
+    the fingerprint of the installed C(prlsdkapi) package. The SDK is only
+    imported and initialized when that cache is missing or stale.
+options:
+  sdk_version_cache:
+    description:
+      - Path to the file caching the Parallels Virtualization SDK version.
+      - Set to an empty string to always query the SDK.
+      - The cache is read but not written in check mode.
+    type: path
+    default: ~/.ansible/cache/samdoran.macos/parallels_sdk.json
 """
 
 EXAMPLES = """
@@ -72,6 +83,10 @@ ansible_facts:
               ip_configured: 10.72.22.3
               status: running
               uuid: 39a76fba-275e-4d54-8227-281e1346641e
+        sdk_version:
+          description: Version reported by the Parallels Virtualization SDK, empty when it is not installed
+          type: str
+          sample: '524288'
         Version:
           description: Parallels version information
           type: dict
@@ -81,108 +96,40 @@ ansible_facts:
             Major: '16'
             MajorMinor: 16.0.0
             Release: '48916'
-
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
 """
 
-import json
-
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.common.process import get_bin_path
-from ansible.module_utils.common.text.converters import to_native
-
-# command: python -c 'import prlsdkapi; prlsdkapi.init_desktop_sdk(); print(prlsdkapi.ApiHelper().get_version()); prlsdkapi.deinit_sdk()'
-
-HAS_PARALLELS_SDK = True
-try:
-    import prlsdkapi
-except ImportError:
-    HAS_PARALLELS_SDK = False
-
-
-def get_sdk_version():
-    sdk_version = ''
-    if HAS_PARALLELS_SDK:
-        prlsdkapi.init_desktop_sdk()
-        sdk_version = prlsdkapi.ApiHelper().get_version()
-        prlsdkapi.deinit_sdk()
-
-    return to_native(sdk_version)
-
-
-def get_server_info(module, data):
-    prlsrvctl_bin = None
-    try:
-        prlsrvctl_bin = get_bin_path('prlsrvctl', ['/usr/local/bin/'])
-    except ValueError:
-        pass
 
-    if prlsrvctl_bin is not None:
-        command = [prlsrvctl_bin, 'info', '--json']
-        rc, out, err = module.run_command(command)
-        if rc != 0:
-            module.warn('Failed to gather Parallels facts')
-
-        else:
-            srv_info = json.loads(out)
-
-            for k in srv_info:
-                data[k.replace(' ', '_')] = srv_info[k]
-
-            # 'Version': 'Desktop 16.0.0-48916',
-            version_string = srv_info['Version']
-            edition, full_version = version_string.split(' ', 1)
-            data['Version'] = {}
-            data['Version']['Edition'] = edition
-            data['Version']['Full'] = full_version
-            data['Version']['Major'] = full_version.split('.')[0]
-            data['Version']['MajorMinor'] = full_version.split('-')[0]
-            data['Version']['Release'] = full_version.split('-')[1]
-
-
-def get_vm_info(module, data):
-    prlctl_bin = None
-    try:
-        prlctl_bin = get_bin_path('prlctl', ['/usr/local/bin'])
-    except ValueError:
-        pass
-
-    if prlctl_bin is not None:
-        command = [prlctl_bin, 'list', '--full', '--all', '--json']
-        rc, out, err = module.run_command(command)
-        if rc != 0:
-            module.warn('Failed to gather Parallels virtual machine facts')
-
-        else:
-            data['VMs'] = json.loads(out)
-            data['running_vm_count'] = len([vm for vm in data['VMs'] if vm['status'] == 'running'])
+from ..module_utils.command_runner import get_command_runner
+from ..module_utils.parallels_facts import DEFAULT_SDK_VERSION_CACHE, gather_parallels_facts
+from ..module_utils.profiling import profile_entrypoint
 
 
+@profile_entrypoint('parallels_facts')
 def main():
     module = AnsibleModule(
-        argument_spec={},
+        argument_spec={
+            'sdk_version_cache': {
+                'type': 'path',
+                'default': DEFAULT_SDK_VERSION_CACHE,
+            },
+        },
         supports_check_mode=True,
     )
 
-    results = {'ansible_facts': {}}
-    parallels_data = {
-        'Version': {
-            'Edition': '',
-            'Full': '',
-            'Major': '',
-            'MajorMinor': '',
-            'Release': '',
+    results = {
+        'ansible_facts': {
+            'parallels': gather_parallels_facts(module, module.params['sdk_version_cache']),
         },
-        'VMs': [],
-        'running_vm_count': 0,
     }
 
-    get_server_info(module, parallels_data)
-    get_vm_info(module, parallels_data)
-
-    parallels_data['sdk_version'] = get_sdk_version()
-    results['ansible_facts']['parallels'] = parallels_data
-
-    module.exit_json(**results)
+    module.exit_json(**get_command_runner(module).annotate(results))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,253 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: parallels_sdk_install
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Install the Parallels Virtualization SDK from its disk image
+notes:
+  - Installing requires root privileges.
+  - In check mode the disk image is not attached.
+description:
+  - Read the version of the installed Parallels Virtualization SDK from its
+    package receipts with C(pkgutil), without loading the SDK.
+  - When the SDK is missing, or I(version) is set and differs from the
+    installed one, install the package from the I(src) disk image.
+  - The disk image is only attached when an install is needed. A volume
+    already mounted from I(src) is reused and left mounted. Otherwise the
+    image is attached, the package installed and the image detached in
+    the same run, whether or not the install succeeded.
+options:
+  src:
+    description:
+      - Path of the SDK disk image on the target.
+      - It only has to exist when an install is needed.
+    type: path
+    required: true
+  version:
+    description:
+      - Package version the SDK receipt must have, as reported by C(pkgutil --pkg-info).
+      - When unset, the SDK is only installed if no receipt is found.
+    type: str
+  pkg:
+    description: Path of the installer package inside the mounted volume.
+    type: str
+    default: Parallels Virtualization SDK.pkg
+  receipt_pattern:
+    description: Regular expression searched in the package identifiers to find the SDK receipts.
+    type: str
+    default: '^com\\.parallels\\..*sdk'
+  force:
+    description: Install the package even if the receipt matches.
+    type: bool
+    default: false
+"""
+
+EXAMPLES = """
+- name: Install the Parallels Virtualization SDK unless it is there
+  samdoran.macos.parallels_sdk_install:
+    src: /var/tmp/ParallelsVirtualizationSDK-18.1.1-53328-mac.dmg
+  become: yes
+
+- name: Find out whether the SDK needs an upgrade
+  samdoran.macos.parallels_sdk_install:
+    src: /var/tmp/ParallelsVirtualizationSDK-18.1.1-53328-mac.dmg
+    version: 18.1.1
+  check_mode: yes
+  register: sdk_check
+"""
+
+RETURN = """
+install_needed:
+  description: Whether the installed SDK did not match, before any install
+  returned: always
+  type: bool
+previous_version:
+  description: Version of the SDK receipt before the install, or C(null) without a receipt
+  returned: always
+  type: str
+  sample: 17.1.4
+installed_version:
+  description: Version of the SDK receipt after the install, or C(null) without a receipt
+  returned: always
+  type: str
+  sample: 18.1.1
+receipts:
+  description: Identifiers of the package receipts matching I(receipt_pattern)
+  returned: always
+  type: list
+  elements: str
+  sample:
+    - com.parallels.pkg.sdk
+mount_point:
+  description: Where the disk image was mounted for the install
+  returned: when the SDK was installed
+  type: str
+  sample: /Volumes/Parallels Virtualization SDK
+reused_mount:
+  description: Whether the disk image was already mounted, in which case it is left mounted
+  returned: when the SDK was installed
+  type: bool
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
+"""
+
+import os
+import plistlib
+import re
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_bytes
+
+from ..module_utils.command_runner import CmdFailedError, get_command_runner
+from ..module_utils.profiling import profile_entrypoint
+
+
+def load_plist(data):  # type: (str) -> dict
+    try:
+        return plistlib.loads(to_bytes(data))
+    except AttributeError:  # Python 2
+        return plistlib.readPlistFromString(to_bytes(data))
+
+
+def get_receipts(module, pkgutil):  # type: (AnsibleModule, str) -> tuple[list[str], str | None]
+    """Return the SDK receipt identifiers and the version of the first one."""
+    runner = get_command_runner(module)
+    pattern = re.compile(module.params['receipt_pattern'])
+    res = runner.run([pkgutil, '--pkgs'])
+    receipts = sorted(pkg_id for pkg_id in res['stdout'].split() if pattern.search(pkg_id))
+    if not receipts:
+        return receipts, None
+
+    res = runner.run([pkgutil, '--pkg-info-plist', receipts[0]])
+    return receipts, load_plist(res['stdout']).get('pkg-version')
+
+
+def get_mount_points(entities):  # type: (list[dict]) -> list[str]
+    return [entity['mount-point'] for entity in entities if entity.get('mount-point')]
+
+
+def find_mount_point(module, hdiutil, src):  # type: (AnsibleModule, str, str) -> str | None
+    """Return where *src* is already mounted, if it is."""
+    res = get_command_runner(module).run([hdiutil, 'info', '-plist'])
+    src_path = os.path.realpath(src)
+    for image in load_plist(res['stdout']).get('images', []):
+        if os.path.realpath(image.get('image-path', '')) != src_path:
+            continue
+        mount_points = get_mount_points(image.get('system-entities', []))
+        if mount_points:
+            return mount_points[0]
+    return None
+
+
+def attach(module, hdiutil, src):  # type: (AnsibleModule, str, str) -> str
+    res = get_command_runner(module).run([hdiutil, 'attach', '-nobrowse', '-readonly', '-noverify', '-plist', src])
+    mount_points = get_mount_points(load_plist(res['stdout']).get('system-entities', []))
+    if not mount_points:
+        module.fail_json(**get_command_runner(module).annotate({
+            'msg': 'Attaching {0} did not mount any volume'.format(src),
+        }))
+    return mount_points[0]
+
+
+def detach(module, hdiutil, mount_point):  # type: (AnsibleModule, str, str) -> None
+    runner = get_command_runner(module)
+    res = runner.run([hdiutil, 'detach', mount_point], check=False)
+    if res['rc'] != 0:
+        # NOTE: Spotlight or the installer may still hold files on the volume.
+        res = runner.run([hdiutil, 'detach', '-force', mount_point], check=False)
+    if res['rc'] != 0:
+        module.warn('Unable to detach {0}: {1}'.format(mount_point, res['stderr'].strip()))
+
+
+def install(module, mount_point):  # type: (AnsibleModule, str) -> None
+    pkg_path = os.path.join(mount_point, module.params['pkg'])
+    if not os.path.exists(pkg_path):
+        module.fail_json(**get_command_runner(module).annotate({
+            'msg': 'The package {0} is not in the volume mounted at {1}'.format(module.params['pkg'], mount_point),
+        }))
+    installer = module.get_bin_path('installer', required=True)
+    get_command_runner(module).run([installer, '-pkg', pkg_path, '-target', '/'])
+
+
+@profile_entrypoint('parallels_sdk_install')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'src': {'type': 'path', 'required': True},
+            'version': {'type': 'str'},
+            'pkg': {'type': 'str', 'default': 'Parallels Virtualization SDK.pkg'},
+            'receipt_pattern': {'type': 'str', 'default': r'^com\.parallels\..*sdk'},
+            'force': {'type': 'bool', 'default': False},
+        },
+        supports_check_mode=True,
+    )
+    params = module.params
+    runner = get_command_runner(module)
+    pkgutil = module.get_bin_path('pkgutil', required=True)
+
+    try:
+        receipts, previous_version = get_receipts(module, pkgutil)
+    except CmdFailedError as cmd_err:
+        module.fail_json(**runner.annotate(cmd_err.error_args))
+    install_needed = (
+        params['force']
+        or previous_version is None
+        or (params['version'] is not None and previous_version != params['version'])
+    )
+    results = {
+        'changed': install_needed,
+        'install_needed': install_needed,
+        'previous_version': previous_version,
+        'installed_version': previous_version,
+        'receipts': receipts,
+    }
+    if not install_needed or module.check_mode:
+        module.exit_json(**runner.annotate(results))
+
+    if not os.path.exists(params['src']):
+        module.fail_json(**runner.annotate(dict(results, changed=False, msg='The disk image {0} does not exist'.format(
+            params['src'],
+        ))))
+
+    hdiutil = module.get_bin_path('hdiutil', required=True)
+    try:
+        mount_point = find_mount_point(module, hdiutil, params['src'])
+        results['reused_mount'] = mount_point is not None
+        if mount_point is None:
+            mount_point = attach(module, hdiutil, params['src'])
+        results['mount_point'] = mount_point
+        try:
+            install(module, mount_point)
+        finally:
+            if not results['reused_mount']:
+                detach(module, hdiutil, mount_point)
+        results['receipts'], results['installed_version'] = get_receipts(module, pkgutil)
+    except CmdFailedError as cmd_err:
+        module.fail_json(**runner.annotate(dict(results, changed=False, **cmd_err.error_args)))
+
+    if params['version'] is not None and results['installed_version'] != params['version']:
+        module.fail_json(**runner.annotate(dict(
+            results,
+            msg='The installed SDK package has version {0}, not {1}'.format(
+                results['installed_version'], params['version'],
+            ),
+        )))
+
+    module.exit_json(**runner.annotate(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: parallels_state
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Manage the Parallels Desktop app state and refresh the Parallels facts at once
+notes:
+  - This is an action plugin. It runs a single module on the target, either
+    M(samdoran.macos.parallels_desktop) with I(gather_facts) set or
+    M(samdoran.macos.parallels_facts) when I(state) is omitted.
+description:
+  - Bring the Parallels Desktop app to the requested state and gather the
+    C(parallels) facts in the same remote execution, saving the separate
+    M(samdoran.macos.parallels_facts) task and its round-trip.
+  - The facts are gathered after the state change, so they describe the
+    resulting state of the host.
+options:
+  state:
+    description:
+      - Requested state of the Parallels Desktop app, see
+        M(samdoran.macos.parallels_desktop).
+      - When omitted, only the facts are gathered.
+    type: str
+    choices: [started, terminated, killed, murdered]
+  sdk_version_cache:
+    description:
+      - Path to the file caching the Parallels Virtualization SDK version.
+      - Set to an empty string to always query the SDK.
+    type: path
+    default: ~/.ansible/cache/samdoran.macos/parallels_sdk.json
+"""
+
+EXAMPLES = """
+- name: Start Parallels Desktop and refresh the Parallels facts
+  samdoran.macos.parallels_state:
+    state: started
+
+- name: Assert the running version
+  assert:
+    that:
+      - ansible_facts.parallels.Version.Full == parallels_app_version
+"""
+
+RETURN = """
+ansible_facts:
+  description: The C(parallels) facts, as returned by M(samdoran.macos.parallels_facts)
+  returned: always
+  type: dict
+msg:
+  description: Outcome of the state change
+  returned: when I(state) is set
+  type: str
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
+"""
@@ -0,0 +1,287 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: parallels_verify
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Verify a Parallels Desktop installation in one pass
+notes:
+  - Reading the kernel extension policy database requires root privileges.
+description:
+  - Check the kernel extension approvals, the installed version, the
+    license state and whether Parallels Desktop runs as a service, and
+    return a single verdict.
+  - The kernel extension policy database is queried in-process and
+    read-only with the Python C(sqlite3) module.
+  - The C(parallels) facts, as gathered by
+    M(samdoran.macos.parallels_facts), are returned along with the verdict.
+options:
+  app_version:
+    description:
+      - Expected full version of Parallels Desktop, such as C(16.0.0-48916).
+      - The version is not checked when unset.
+    type: str
+  check_kexts:
+    description: Whether to check the kernel extension approvals.
+    type: bool
+    default: true
+  kext_team_id:
+    description: Team ID the Parallels kernel extensions are signed with.
+    type: str
+    default: 4C6364ACXT
+  min_kexts:
+    description:
+      - Number of approved kernel extensions of I(kext_team_id) expected.
+      - Only the policy rows with C(allowed) set count. A kernel extension the
+        user was asked about but has not allowed yet has a row with C(allowed)
+        unset, so counting every row would pass before the approval.
+    type: int
+    default: 4
+  kext_policy_db:
+    description: Path of the kernel extension policy database.
+    type: path
+    default: /var/db/SystemPolicyConfiguration/KextPolicy
+  check_license:
+    description: Whether to check that the license is valid.
+    type: bool
+    default: true
+  check_service:
+    description: Whether to check that Parallels Desktop is started as a service.
+    type: bool
+    default: true
+  fail_on_mismatch:
+    description:
+      - Fail when any of the checks does not pass.
+      - When C(false), the verdict is only reported in I(ok) and I(checks).
+    type: bool
+    default: true
+  sdk_version_cache:
+    description:
+      - Path to the file caching the Parallels Virtualization SDK version.
+      - Set to an empty string to always query the SDK.
+    type: path
+    default: ~/.ansible/cache/samdoran.macos/parallels_sdk.json
+"""
+
+EXAMPLES = """
+- name: Verify the Parallels installation
+  samdoran.macos.parallels_verify:
+    app_version: 16.0.0-48916
+  become: true
+
+- name: Look at the kernel extension approvals without failing
+  samdoran.macos.parallels_verify:
+    check_license: false
+    check_service: false
+    fail_on_mismatch: false
+  become: true
+  register: parallels_verification
+"""
+
+RETURN = """
+ok:
+  description: Whether every enabled check passed
+  returned: always
+  type: bool
+failures:
+  description: Messages of the checks that did not pass
+  returned: always
+  type: list
+  elements: str
+checks:
+  description: Outcome of each check, keyed by C(kexts), C(version), C(license) and C(service)
+  returned: always
+  type: dict
+  contains:
+    kexts:
+      description: Kernel extension approvals, with the C(approved) and C(expected) counts and the C(kexts) found
+      type: dict
+      returned: when I(check_kexts) is set
+    version:
+      description: Installed version, with the C(expected) and C(actual) versions
+      type: dict
+      returned: when I(app_version) is set
+    license:
+      description: License state, with the C(actual) state
+      type: dict
+      returned: when I(check_license) is set
+    service:
+      description: Service state, with the C(actual) value of C(Started as service)
+      type: dict
+      returned: when I(check_service) is set
+  sample:
+    kexts:
+      ok: true
+      approved: 4
+      expected: 4
+      kexts:
+        - bundle_id: com.parallels.kext.hypervisor
+          allowed: true
+          developer_name: Parallels International GmbH
+    version:
+      ok: true
+      expected: 16.0.0-48916
+      actual: 16.0.0-48916
+    license:
+      ok: true
+      actual: valid
+    service:
+      ok: false
+      actual: 'off'
+ansible_facts:
+  description: The C(parallels) facts, as returned by M(samdoran.macos.parallels_facts)
+  returned: always
+  type: dict
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
+"""
+
+import sqlite3
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_native
+from ansible.module_utils.six.moves.urllib.request import pathname2url
+
+from ..module_utils.command_runner import get_command_runner
+from ..module_utils.parallels_facts import DEFAULT_SDK_VERSION_CACHE, gather_parallels_facts
+from ..module_utils.profiling import profile_entrypoint
+
+
+KEXT_POLICY_QUERY = (
+    'SELECT bundle_id, allowed, developer_name FROM kext_policy '
+    'WHERE team_id = ? ORDER BY bundle_id'
+)
+
+
+def connect_read_only(path):  # type: (str) -> sqlite3.Connection
+    """Open the SQLite database in *path* without ever writing to it."""
+    try:
+        return sqlite3.connect('file:{0}?mode=ro'.format(pathname2url(path)), uri=True)
+    except TypeError:  # Python 2 has no URI filenames
+        return sqlite3.connect(path)
+
+
+def query_kext_policy(path, team_id):  # type: (str, str) -> list[dict]
+    connection = connect_read_only(path)
+    try:
+        rows = connection.execute(KEXT_POLICY_QUERY, (team_id,)).fetchall()
+    finally:
+        connection.close()
+    return [
+        {'bundle_id': bundle_id, 'allowed': bool(allowed), 'developer_name': developer_name}
+        for bundle_id, allowed, developer_name in rows
+    ]
+
+
+def check_kexts(params):  # type: (dict) -> dict
+    check = {'expected': params['min_kexts'], 'approved': 0, 'kexts': []}
+    try:
+        check['kexts'] = query_kext_policy(params['kext_policy_db'], params['kext_team_id'])
+    except sqlite3.Error as db_err:
+        check.update({
+            'ok': False,
+            'msg': 'Unable to read the kernel extension policy from {0}: {1}'.format(
+                params['kext_policy_db'], to_native(db_err),
+            ),
+        })
+        return check
+
+    # NOTE: Rows with `allowed` unset are pending approval.
+    check['approved'] = len([kext for kext in check['kexts'] if kext['allowed']])
+    check['ok'] = check['approved'] >= params['min_kexts']
+    if not check['ok']:
+        check['msg'] = (
+            'Only {approved} of the {expected} Parallels kernel extensions are approved. '
+            'Log into the GUI, open System Preferences > Security, and click Allow.'.format(**check)
+        )
+    return check
+
+
+def check_facts(params, facts):  # type: (dict, dict) -> dict[str, dict]
+    checks = {}
+    if params['app_version'] is not None:
+        actual = facts['Version']['Full']
+        checks['version'] = {
+            'ok': actual == params['app_version'],
+            'expected': params['app_version'],
+            'actual': actual,
+        }
+        if not actual:
+            checks['version']['msg'] = 'Parallels Desktop is not installed'
+        elif not checks['version']['ok']:
+            checks['version']['msg'] = 'Parallels Desktop {0} is installed instead of {1}'.format(
+                actual, params['app_version'],
+            )
+
+    if params['check_license']:
+        actual = facts.get('License', {}).get('state')
+        checks['license'] = {'ok': actual == 'valid', 'actual': actual}
+        if not checks['license']['ok']:
+            checks['license']['msg'] = 'The Parallels Desktop license is not valid: {0}'.format(actual)
+
+    if params['check_service']:
+        actual = facts.get('Started_as_service')
+        checks['service'] = {'ok': actual == 'on', 'actual': actual}
+        if not checks['service']['ok']:
+            checks['service']['msg'] = 'Parallels Desktop is not started as a service'
+
+    return checks
+
+
+@profile_entrypoint('parallels_verify')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'app_version': {'type': 'str'},
+            'check_kexts': {'type': 'bool', 'default': True},
+            'kext_team_id': {'type': 'str', 'default': '4C6364ACXT'},
+            'min_kexts': {'type': 'int', 'default': 4},
+            'kext_policy_db': {'type': 'path', 'default': '/var/db/SystemPolicyConfiguration/KextPolicy'},
+            'check_license': {'type': 'bool', 'default': True},
+            'check_service': {'type': 'bool', 'default': True},
+            'fail_on_mismatch': {'type': 'bool', 'default': True},
+            'sdk_version_cache': {'type': 'path', 'default': DEFAULT_SDK_VERSION_CACHE},
+        },
+        supports_check_mode=True,
+    )
+    runner = get_command_runner(module)
+    params = module.params
+
+    facts = gather_parallels_facts(module, params['sdk_version_cache'])
+    checks = check_facts(params, facts)
+    if params['check_kexts']:
+        checks['kexts'] = check_kexts(params)
+
+    failures = [
+        checks[name]['msg']
+        for name in ('version', 'license', 'service', 'kexts')
+        if name in checks and not checks[name]['ok']
+    ]
+    results = {
+        'changed': False,
+        'ok': not failures,
+        'failures': failures,
+        'checks': checks,
+        'ansible_facts': {'parallels': facts},
+    }
+    if failures and params['fail_on_mismatch']:
+        results['msg'] = 'Parallels Desktop verification failed: {0}'.format(' '.join(failures))
+        module.fail_json(**runner.annotate(results))
+
+    module.exit_json(**runner.annotate(results))
+
+
+if __name__ == '__main__':
+    main()
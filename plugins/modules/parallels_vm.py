@@ -0,0 +1,346 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: parallels_vm
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Control the power state of Parallels Desktop virtual machines
+notes:
+  - Readiness is detected from the C(ip_configured) field of
+    C(prlctl list), which requires Parallels Tools in the guest.
+description:
+  - Bring a set of virtual machines to the requested power state with
+    C(prlctl), working on several VMs at a time.
+  - The current state of every VM is read with a single C(prlctl list) call.
+  - With I(wait_for_ip), VMs brought to C(running) are only reported once
+    the guest has a configured IP address. All the waiting VMs share one
+    C(prlctl list) poll per I(poll_interval).
+options:
+  name:
+    description: Names or UUIDs of the virtual machines.
+    type: list
+    elements: str
+    required: true
+    aliases: [vms]
+  state:
+    description:
+      - Requested power state.
+      - C(restarted) always restarts running VMs and starts stopped ones.
+    type: str
+    choices: [running, stopped, suspended, restarted]
+    default: running
+  stop_mode:
+    description: Whether to shut the guest down cleanly or to power it off.
+    type: str
+    choices: [graceful, kill]
+    default: graceful
+  wait_for_ip:
+    description: Wait for running VMs to report a configured IP address.
+    type: bool
+    default: false
+  wait_timeout:
+    description: Seconds to wait for each VM, transition and readiness included.
+    type: int
+    default: 300
+  poll_interval:
+    description: Seconds between two readiness polls.
+    type: float
+    default: 2
+  max_workers:
+    description: Number of VMs operated on at the same time.
+    type: int
+    default: 4
+"""
+
+EXAMPLES = """
+- name: Start the CI guests and wait for their addresses
+  samdoran.macos.parallels_vm:
+    name:
+      - ci-guest-0001
+      - ci-guest-0002
+      - ci-guest-0003
+    state: running
+    wait_for_ip: true
+  register: ci_guests
+
+- name: Power off every guest of the pool
+  samdoran.macos.parallels_vm:
+    name: "{{ ci_guests.vms | map(attribute='uuid') | list }}"
+    state: stopped
+    stop_mode: kill
+    max_workers: 8
+"""
+
+RETURN = """
+vms:
+  description: Outcome for every requested VM, in the order requested.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Name of the VM
+      type: str
+    uuid:
+      description: UUID of the VM
+      type: str
+    status_before:
+      description: Status of the VM before the module ran
+      type: str
+    status:
+      description: Status of the VM after the module ran
+      type: str
+    actions:
+      description: C(prlctl) subcommands run for the VM, in order
+      type: list
+      elements: str
+    changed:
+      description: Whether the VM changed state
+      type: bool
+    failed:
+      description: Whether the transition failed or timed out
+      type: bool
+    ip:
+      description: Configured IP address of the VM
+      type: str
+    ready:
+      description: Whether a VM brought to C(running) reported a configured IP address
+      type: bool
+      returned: when I(wait_for_ip) is set
+    transition_seconds:
+      description: Time spent bringing the VM to the requested state, readiness wait included
+      type: float
+    msg:
+      description: Reason of the failure
+      type: str
+      returned: when failed
+  sample:
+    - name: ci-guest-0001
+      uuid: c9eb5191-c85e-4758-bfe7-a983c79af343
+      status_before: stopped
+      status: running
+      actions: [start]
+      changed: true
+      failed: false
+      ip: 10.111.77.22
+      ready: true
+      transition_seconds: 21.4
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
+"""
+
+import threading
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..module_utils.command_runner import CmdFailedError, get_command_runner, run_concurrently
+from ..module_utils.parallels import PRLCTL_LIST_ARGS, get_vm_address, get_vm_uuid, parse_vm_list
+from ..module_utils.profiling import profile_entrypoint
+
+
+# NOTE: `prlctl` subcommands taking a VM from a status to the requested
+# NOTE: state. A missing entry means there is no sensible transition.
+TRANSITIONS = {
+    'running': {
+        'running': [],
+        'stopped': ['start'],
+        'suspended': ['resume'],
+        'paused': ['resume'],
+    },
+    'stopped': {
+        'running': ['stop'],
+        'stopped': [],
+        'suspended': ['resume', 'stop'],
+        'paused': ['resume', 'stop'],
+    },
+    'suspended': {
+        'running': ['suspend'],
+        'suspended': [],
+        'paused': ['resume', 'suspend'],
+    },
+    'restarted': {
+        'running': ['restart'],
+        'stopped': ['start'],
+        'suspended': ['resume', 'restart'],
+        'paused': ['resume', 'restart'],
+    },
+}
+FINAL_STATUS = {
+    'running': 'running',
+    'stopped': 'stopped',
+    'suspended': 'suspended',
+    'restarted': 'running',
+}
+
+
+class VmListPoller:
+    """``prlctl list`` shared by the worker threads, refreshed at most once per interval."""
+
+    def __init__(self, runner, prlctl, interval):  # type: (...) -> None
+        self.runner = runner
+        self.prlctl = prlctl
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.fetched_at = None
+        self.by_uuid = {}
+
+    def refresh(self):  # type: () -> dict[str, dict]
+        res = self.runner.run([self.prlctl] + list(PRLCTL_LIST_ARGS))
+        self.by_uuid = dict((get_vm_uuid(vm), vm) for vm in parse_vm_list(res['stdout']))
+        self.fetched_at = time.time()
+        return self.by_uuid
+
+    def get(self, uuid):  # type: (str) -> dict | None
+        with self.lock:
+            if self.fetched_at is None or time.time() - self.fetched_at >= self.interval:
+                self.refresh()
+            return self.by_uuid.get(uuid)
+
+
+def resolve_vms(module, names, by_uuid):  # type: (...) -> list[dict]
+    by_name = dict((vm['name'], vm) for vm in by_uuid.values())
+    requests = []
+    missing = []
+    for name in names:
+        vm = by_name.get(name) or by_uuid.get(name.strip('{}'))
+        if vm is None:
+            missing.append(name)
+            continue
+        requests.append({
+            'name': vm['name'],
+            'uuid': get_vm_uuid(vm),
+            'status_before': vm['status'],
+            'status': vm['status'],
+            'ip': get_vm_address(vm),
+        })
+    if missing:
+        module.fail_json(msg='Unknown virtual machines: {0}'.format(', '.join(missing)))
+    return requests
+
+
+def wait_for_ip(poller, request, deadline, poll_interval):  # type: (...) -> None
+    while True:
+        vm = poller.get(request['uuid'])
+        if vm is not None:
+            request['status'] = vm['status']
+            request['ip'] = get_vm_address(vm)
+        if request['ip'] is not None:
+            request['ready'] = True
+            return
+        if time.time() >= deadline:
+            request['failed'] = True
+            request['msg'] = 'Timed out waiting for a configured IP address'
+            return
+        time.sleep(poll_interval)
+
+
+def transition(module, runner, prlctl, poller, request):  # type: (...) -> None
+    params = module.params
+    started = time.time()
+    deadline = started + params['wait_timeout']
+
+    for action in request['actions']:
+        command = [prlctl, action, request['uuid']]
+        if action == 'stop' and params['stop_mode'] == 'kill':
+            command.append('--kill')
+        try:
+            runner.run(command, timeout=max(deadline - time.time(), 1))
+        except CmdFailedError as cmd_err:
+            request['failed'] = True
+            request['msg'] = cmd_err.error_args.get('stderr', '').strip() or str(cmd_err)
+            break
+        request['changed'] = True
+    else:
+        request['status'] = FINAL_STATUS[params['state']]
+        if request['status'] != 'running':
+            request['ip'] = None
+        if params['wait_for_ip'] and request['status'] == 'running':
+            wait_for_ip(poller, request, deadline, params['poll_interval'])
+
+    request['transition_seconds'] = round(time.time() - started, 3)
+
+
+@profile_entrypoint('parallels_vm')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'name': {'type': 'list', 'elements': 'str', 'required': True, 'aliases': ['vms']},
+            'state': {'type': 'str', 'choices': list(TRANSITIONS), 'default': 'running'},
+            'stop_mode': {'type': 'str', 'choices': ['graceful', 'kill'], 'default': 'graceful'},
+            'wait_for_ip': {'type': 'bool', 'default': False},
+            'wait_timeout': {'type': 'int', 'default': 300},
+            'poll_interval': {'type': 'float', 'default': 2},
+            'max_workers': {'type': 'int', 'default': 4},
+        },
+        supports_check_mode=True,
+    )
+    runner = get_command_runner(module)
+    prlctl = module.get_bin_path('prlctl', required=True, opt_dirs=['/usr/local/bin'])
+    state = module.params['state']
+
+    poller = VmListPoller(runner, prlctl, module.params['poll_interval'])
+    try:
+        requests = resolve_vms(module, module.params['name'], poller.refresh())
+    except CmdFailedError as cmd_err:
+        module.fail_json(**runner.annotate(cmd_err.error_args))
+
+    for request in requests:
+        request.update({'changed': False, 'failed': False, 'transition_seconds': 0.0})
+        if module.params['wait_for_ip']:
+            request['ready'] = request['ip'] is not None and request['status'] == 'running'
+        actions = TRANSITIONS[state].get(request['status_before'])
+        if actions is None:
+            request.update({
+                'actions': [],
+                'failed': True,
+                'msg': 'Cannot bring a {0} VM to {1}'.format(request['status_before'], state),
+            })
+        else:
+            request['actions'] = list(actions)
+
+    pending = [
+        request for request in requests
+        if not request['failed'] and (
+            request['actions'] or (module.params['wait_for_ip'] and not request['ready'])
+        )
+    ]
+    if module.check_mode:
+        for request in pending:
+            request['changed'] = bool(request['actions'])
+    else:
+        outcomes = run_concurrently(
+            lambda request: transition(module, runner, prlctl, poller, request),
+            pending,
+            max_workers=module.params['max_workers'],
+        )
+        for request, (_result, exc) in zip(pending, outcomes):
+            if exc is not None:
+                request.update({'failed': True, 'msg': str(exc)})
+
+    results = {
+        'changed': any(request['changed'] for request in requests),
+        'vms': requests,
+    }
+    failed = [request['name'] for request in requests if request['failed']]
+    if failed:
+        results['msg'] = 'Failed to bring {0} to {1}'.format(', '.join(failed), state)
+        module.fail_json(**runner.annotate(results))
+
+    module.exit_json(**runner.annotate(results))
+
+
+if __name__ == '__main__':
+    main()
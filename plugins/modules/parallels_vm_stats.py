@@ -0,0 +1,283 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: parallels_vm_stats
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Sample the resource usage of running Parallels Desktop virtual machines
+notes:
+  - The guest counters of C(prlctl statistics) require Parallels Tools in the guest.
+description:
+  - Run C(prlctl statistics) for every running virtual machine every
+    I(interval) seconds during I(window) seconds, sampling several VMs at a time.
+  - The samples are reduced on the host. Only the minimum, average and
+    95th percentile of the CPU usage, the memory usage and the disk read and
+    write throughput of each VM are returned.
+  - The virtual machines are listed with C(prlctl list), like
+    M(samdoran.macos.parallels_facts) does.
+  - A failed or timed out C(prlctl statistics) call only counts as a failed
+    sample. Any other error while sampling fails the module.
+options:
+  name:
+    description:
+      - Names or UUIDs of the virtual machines to sample.
+      - Every running VM is sampled when unset. VMs that are not running are skipped.
+    type: list
+    elements: str
+    aliases: [vms]
+  window:
+    description: Seconds during which the VMs are sampled.
+    type: float
+    default: 10
+  interval:
+    description: Seconds between two samples of a VM.
+    type: float
+    default: 2
+  max_workers:
+    description: Number of C(prlctl statistics) commands run at the same time.
+    type: int
+    default: 8
+"""
+
+EXAMPLES = """
+- name: Sample every running guest for a minute
+  samdoran.macos.parallels_vm_stats:
+    window: 60
+    interval: 5
+  register: vm_stats
+
+- name: Show the busiest guests
+  debug:
+    msg: "{{ vm_stats.vms | sort(attribute='cpu_percent.avg', reverse=true) | map(attribute='name') | list }}"
+"""
+
+RETURN = """
+vms:
+  description: Usage summary of every sampled VM, in the C(prlctl list) order
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Name of the VM
+      type: str
+    uuid:
+      description: UUID of the VM
+      type: str
+    samples:
+      description: Number of successful samples
+      type: int
+    failed_samples:
+      description: Number of C(prlctl statistics) calls that failed or timed out, for example because the VM stopped
+      type: int
+    sample_error:
+      description: Error of the first failed C(prlctl statistics) call, or C(null) when none failed
+      type: str
+    cpu_percent:
+      description: C(min), C(avg) and C(p95) of the guest CPU usage, or C(null) without samples
+      type: dict
+    memory_mb:
+      description: C(min), C(avg) and C(p95) of the guest memory usage in megabytes, or C(null) without samples
+      type: dict
+    disk_read_bps:
+      description: C(min), C(avg) and C(p95) of the disk read throughput in bytes per second, or C(null) with fewer than two samples
+      type: dict
+    disk_write_bps:
+      description: C(min), C(avg) and C(p95) of the disk write throughput in bytes per second, or C(null) with fewer than two samples
+      type: dict
+  sample:
+    - name: windows-2016
+      uuid: c9eb5191-c85e-4758-bfe7-a983c79af343
+      samples: 6
+      failed_samples: 0
+      sample_error: null
+      cpu_percent: {min: 3.0, avg: 41.5, p95: 97.0}
+      memory_mb: {min: 2011.0, avg: 2040.333, p95: 2102.0}
+      disk_read_bps: {min: 0.0, avg: 104857.6, p95: 524288.0}
+      disk_write_bps: {min: 4096.0, avg: 8192.0, p95: 16384.0}
+window:
+  description: Seconds the sampling actually took
+  returned: always
+  type: float
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
+"""
+
+import math
+import re
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_native
+
+from ..module_utils.command_runner import CmdFailedError, get_command_runner, run_concurrently
+from ..module_utils.parallels import PRLCTL_LIST_ARGS, get_vm_uuid, parse_vm_list, parse_vm_statistics
+from ..module_utils.profiling import profile_entrypoint
+
+
+STATISTICS_TIMEOUT = 30
+CPU_COUNTER = 'guest.cpu.usage'
+MEMORY_COUNTER = 'guest.ram.usage'
+# NOTE: Cumulative byte counters of every disk, e.g. `devices.hdd0.read_total`.
+DISK_COUNTER_RE = re.compile(r'^devices\.\w+\.(?P<direction>read|write)_total$')
+
+
+def select_vms(module, vm_list):  # type: (AnsibleModule, list[dict]) -> list[dict]
+    running = [vm for vm in vm_list if vm['status'] == 'running']
+    names = module.params['name']
+    if names is None:
+        return running
+
+    known = set(vm['name'] for vm in vm_list) | set(get_vm_uuid(vm) for vm in vm_list)
+    missing = [name for name in names if name.strip('{}') not in known]
+    if missing:
+        module.fail_json(msg='Unknown virtual machines: {0}'.format(', '.join(missing)))
+    wanted = set(name.strip('{}') for name in names)
+    return [vm for vm in running if vm['name'] in wanted or get_vm_uuid(vm) in wanted]
+
+
+def take_sample(runner, prlctl, vm):  # type: (...) -> dict
+    """Sample the counters of *vm*.
+
+    :raises CmdFailedError: When ``prlctl statistics`` fails or times out.
+    """
+    res = runner.run([prlctl, 'statistics', get_vm_uuid(vm)], timeout=STATISTICS_TIMEOUT)
+    return {'time': time.time(), 'counters': parse_vm_statistics(res['stdout'])}
+
+
+def describe_failure(cmd_err):  # type: (CmdFailedError) -> str
+    stderr = (cmd_err.error_args.get('stderr') or '').strip()
+    return '{0}: {1}'.format(cmd_err, stderr) if stderr else str(cmd_err)
+
+
+def collect_samples(module, runner, prlctl, vms):  # type: (...) -> tuple[list[list[dict | None]], list[str | None]]
+    """Sample every VM at each tick.
+
+    :returns: The samples of each VM, ``None`` for a failed one, and the
+              first sampling error of each VM.
+    """
+    params = module.params
+    tick_count = 1
+    if params['interval'] > 0:
+        # NOTE: The epsilon keeps e.g. a 0.3s window at 0.1s intervals at 4 ticks.
+        tick_count += int(math.floor(params['window'] / params['interval'] + 1e-9))
+    samples = [[] for _vm in vms]  # type: list[list[dict | None]]
+    errors = [None for _vm in vms]  # type: list[str | None]
+    started = time.time()
+    for tick in range(tick_count):
+        outcomes = run_concurrently(
+            lambda vm: take_sample(runner, prlctl, vm),
+            vms,
+            max_workers=params['max_workers'],
+        )
+        for vm_index, (vm, (sample, exc)) in enumerate(zip(vms, outcomes)):
+            if exc is not None and not isinstance(exc, CmdFailedError):
+                module.fail_json(**runner.annotate({
+                    'msg': 'Unable to sample {0}: {1}'.format(vm['name'], to_native(exc)),
+                }))
+            samples[vm_index].append(sample)
+            if exc is not None and errors[vm_index] is None:
+                errors[vm_index] = describe_failure(exc)
+        if tick + 1 < tick_count:
+            time.sleep(max(started + (tick + 1) * params['interval'] - time.time(), 0))
+    return samples, errors
+
+
+def summarize(values):  # type: (list[float]) -> dict | None
+    """Reduce *values* to their minimum, average and nearest-rank 95th percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        'min': round(ordered[0], 3),
+        'avg': round(sum(ordered) / len(ordered), 3),
+        'p95': round(ordered[int(math.ceil(0.95 * len(ordered))) - 1], 3),
+    }
+
+
+def get_disk_totals(counters):  # type: (dict[str, float]) -> dict[str, float]
+    totals = {'read': 0.0, 'write': 0.0}
+    for counter, value in counters.items():
+        match = DISK_COUNTER_RE.match(counter)
+        if match is not None:
+            totals[match.group('direction')] += value
+    return totals
+
+
+def get_disk_rates(samples, direction):  # type: (list[dict], str) -> list[float]
+    rates = []
+    for previous, current in zip(samples, samples[1:]):
+        elapsed = current['time'] - previous['time']
+        delta = get_disk_totals(current['counters'])[direction] - get_disk_totals(previous['counters'])[direction]
+        # NOTE: A negative delta means the counters were reset, e.g. by a VM restart.
+        if elapsed > 0 and delta >= 0:
+            rates.append(delta / elapsed)
+    return rates
+
+
+def summarize_vm(vm, vm_samples, sample_error):  # type: (dict, list[dict | None], str | None) -> dict
+    samples = [sample for sample in vm_samples if sample is not None]
+    return {
+        'name': vm['name'],
+        'uuid': get_vm_uuid(vm),
+        'samples': len(samples),
+        'failed_samples': len(vm_samples) - len(samples),
+        'sample_error': sample_error,
+        'cpu_percent': summarize([
+            sample['counters'][CPU_COUNTER] for sample in samples if CPU_COUNTER in sample['counters']
+        ]),
+        'memory_mb': summarize([
+            sample['counters'][MEMORY_COUNTER] for sample in samples if MEMORY_COUNTER in sample['counters']
+        ]),
+        'disk_read_bps': summarize(get_disk_rates(samples, 'read')),
+        'disk_write_bps': summarize(get_disk_rates(samples, 'write')),
+    }
+
+
+@profile_entrypoint('parallels_vm_stats')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'name': {'type': 'list', 'elements': 'str', 'aliases': ['vms']},
+            'window': {'type': 'float', 'default': 10},
+            'interval': {'type': 'float', 'default': 2},
+            'max_workers': {'type': 'int', 'default': 8},
+        },
+        supports_check_mode=True,
+    )
+    runner = get_command_runner(module)
+    prlctl = module.get_bin_path('prlctl', required=True, opt_dirs=['/usr/local/bin'])
+
+    try:
+        res = runner.run([prlctl] + list(PRLCTL_LIST_ARGS))
+    except CmdFailedError as cmd_err:
+        module.fail_json(**runner.annotate(cmd_err.error_args))
+    vms = select_vms(module, parse_vm_list(res['stdout']))
+
+    started = time.time()
+    samples, errors = collect_samples(module, runner, prlctl, vms) if vms else ([], [])
+    results = {
+        'changed': False,
+        'vms': [
+            summarize_vm(vm, vm_samples, sample_error)
+            for vm, vm_samples, sample_error in zip(vms, samples, errors)
+        ],
+        'window': round(time.time() - started, 3),
+    }
+    module.exit_json(**runner.annotate(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: python_build_cache
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: Keep built libyaml and wheels for a Python installation on the host
+notes:
+  - Requires the Xcode Command Line Tools when anything has to be built.
+  - Unpinned requirements are built once and then served from the cache.
+    Pin the versions in I(packages), or set I(force), to pick up new releases.
+  - In check mode nothing is built and the cache is not written.
+description:
+  - Build the static C(libyaml) library from I(libyaml_src) and the wheels
+    of I(packages) with the given I(python), and keep them in I(cache_dir)
+    so later runs install from the cache instead of compiling again.
+  - The static library is kept per C(libyaml) version and architecture.
+  - Wheels are kept in a wheelhouse per Python ABI, platform and architecture,
+    and per C(libyaml) version when one is used. Each requirement is built
+    with C(pip wheel) the first time it is requested, along with its
+    dependencies, and rebuilt when any of its wheels went missing.
+  - Install from the returned I(wheelhouse) with C(pip install --no-index --find-links).
+options:
+  python:
+    description: Path of the Python interpreter the wheels are built for.
+    type: path
+    required: true
+  packages:
+    description: Requirements to build wheels for, as accepted by C(pip).
+    type: list
+    elements: str
+    default: []
+  libyaml_src:
+    description:
+      - Path of the C(libyaml) source zip archive, as published on U(https://pyyaml.org/download/libyaml/).
+      - When set, the static library is built if it is not cached, and the
+        wheels are built against it.
+    type: path
+  libyaml_version:
+    description: Version of the C(libyaml) source in I(libyaml_src).
+    type: str
+  cache_dir:
+    description: Directory holding the built artifacts.
+    type: path
+    default: ~/.ansible/cache/samdoran.macos/python_build
+  force:
+    description: Build everything again, replacing the cached artifacts.
+    type: bool
+    default: false
+"""
+
+EXAMPLES = """
+- name: Build PyYAML against libyaml, or reuse the previous build
+  samdoran.macos.python_build_cache:
+    python: /Library/Frameworks/Python.framework/Versions/3.8/bin/python3
+    packages:
+      - PyYAML==5.3.1
+    libyaml_src: /var/tmp/macos_python/yaml-0.2.5.zip
+    libyaml_version: 0.2.5
+  register: build_cache
+
+- name: Install the prebuilt wheels
+  pip:
+    executable: /Library/Frameworks/Python.framework/Versions/3.8/bin/pip3
+    name: PyYAML==5.3.1
+    extra_args: --no-index --find-links {{ build_cache.wheelhouse }}
+"""
+
+RETURN = """
+python:
+  description: Version, ABI tag, platform and architecture of I(python)
+  returned: always
+  type: dict
+  sample:
+    version: 3.8.6
+    cache_tag: cpython-38
+    platform: macosx-10.9-x86_64
+    machine: x86_64
+libyaml_prefix:
+  description: Installation prefix of the static C(libyaml) library
+  returned: when I(libyaml_src) is set
+  type: str
+  sample: /Users/admin/.ansible/cache/samdoran.macos/python_build/libyaml/0.2.5-x86_64
+wheelhouse:
+  description: Directory holding the wheels built for I(python)
+  returned: always
+  type: str
+  sample: /Users/admin/.ansible/cache/samdoran.macos/python_build/wheels/cpython-38-macosx-10.9-x86_64-libyaml0.2.5
+wheels:
+  description: File names of the wheels of I(packages) and their dependencies
+  returned: always
+  type: list
+  elements: str
+  sample:
+    - PyYAML-5.3.1-cp38-cp38-macosx_10_9_x86_64.whl
+cached:
+  description: Requirements whose wheels were found in the cache
+  returned: always
+  type: list
+  elements: str
+built:
+  description: Requirements whose wheels were built, or would be built in check mode
+  returned: always
+  type: list
+  elements: str
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_native
+
+from ..module_utils.archive import extract_zip_member
+from ..module_utils.command_runner import CmdFailedError, get_command_runner
+from ..module_utils.profiling import profile_entrypoint
+
+
+INDEX_FORMAT = 1
+INDEX_FILENAME = 'index.json'
+LOCK_FILENAME = '.lock'
+COMPLETE_FILENAME = '.complete'
+
+PYTHON_INFO_SCRIPT = """
+import json, platform, sys, sysconfig
+try:
+    cache_tag = sys.implementation.cache_tag
+except AttributeError:  # Python 2
+    cache_tag = '{0}-{1}{2}'.format(platform.python_implementation().lower(), *sys.version_info[:2])
+print(json.dumps({
+    'version': platform.python_version(),
+    'cache_tag': cache_tag,
+    'platform': sysconfig.get_platform(),
+    'machine': platform.machine(),
+}))
+"""
+
+
+class PythonBuildCacheError(Exception):
+    """Failure to build or cache an artifact."""
+
+
+def get_python_info(runner, python):  # type: (...) -> dict
+    """Ask *python* what its built extensions depend on."""
+    res = runner.run([python, '-c', PYTHON_INFO_SCRIPT])
+    try:
+        return json.loads(res['stdout'])
+    except ValueError:
+        raise PythonBuildCacheError('Unable to parse the output of {0}: {1}'.format(python, res['stdout']))
+
+
+def get_libyaml_prefix(cache_dir, version, python_info):  # type: (str, str, dict) -> str
+    return os.path.join(cache_dir, 'libyaml', '{0}-{1}'.format(version, python_info['machine']))
+
+
+def get_wheelhouse(cache_dir, python_info, libyaml_version=None):  # type: (...) -> str
+    name = '{cache_tag}-{platform}-{machine}'.format(**python_info)
+    if libyaml_version:
+        name += '-libyaml{0}'.format(libyaml_version)
+    return os.path.join(cache_dir, 'wheels', name)
+
+
+def is_complete(path):  # type: (str) -> bool
+    return os.path.exists(os.path.join(path, COMPLETE_FILENAME))
+
+
+def mark_complete(path, **details):  # type: (str, str) -> None
+    with open(os.path.join(path, COMPLETE_FILENAME), 'w') as complete_file:
+        json.dump(dict(details, built_at=time.time()), complete_file, sort_keys=True)
+
+
+def build_libyaml(module, src, prefix):  # type: (AnsibleModule, str, str) -> None
+    """Compile the static library from the *src* archive into *prefix*."""
+    runner = get_command_runner(module)
+    make = module.get_bin_path('make', required=True)
+    if os.path.lexists(prefix):
+        shutil.rmtree(prefix)
+
+    build_dir = tempfile.mkdtemp(prefix='libyaml-')
+    try:
+        with zipfile.ZipFile(src) as archive:
+            for info in archive.infolist():
+                extract_zip_member(archive, info, build_dir)
+        # NOTE: The source archives hold a single `yaml-<version>` directory.
+        src_dir = os.path.join(build_dir, os.listdir(build_dir)[0])
+        runner.run(
+            [
+                '/bin/sh', './configure', '--enable-shared=no', '--with-pic',
+                '--prefix={0}'.format(prefix), '--disable-dependency-tracking',
+            ],
+            cwd=src_dir,
+        )
+        runner.run([make], cwd=src_dir)
+        runner.run([make, 'install'], cwd=src_dir)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def load_index(wheelhouse):  # type: (str) -> dict
+    try:
+        with open(os.path.join(wheelhouse, INDEX_FILENAME)) as index_file:
+            index = json.load(index_file)
+    except (IOError, OSError, ValueError):
+        # NOTE: A lost index only costs a build per requirement.
+        return {'format': INDEX_FORMAT, 'requirements': {}}
+    if index.get('format') != INDEX_FORMAT:
+        return {'format': INDEX_FORMAT, 'requirements': {}}
+    return index
+
+
+def save_index(wheelhouse, index):  # type: (str, dict) -> None
+    fd, tmp_path = tempfile.mkstemp(dir=wheelhouse, prefix='.index-')
+    with os.fdopen(fd, 'w') as tmp_file:
+        json.dump(index, tmp_file, indent=2, sort_keys=True)
+    os.rename(tmp_path, os.path.join(wheelhouse, INDEX_FILENAME))
+
+
+def is_cached(wheelhouse, entry):  # type: (str, dict | None) -> bool
+    """Tell whether every wheel recorded for a requirement is still there."""
+    if not entry or not entry.get('wheels'):
+        return False
+    return all(os.path.exists(os.path.join(wheelhouse, wheel)) for wheel in entry['wheels'])
+
+
+def build_wheels(module, python, requirement, wheelhouse, libyaml_prefix=None):  # type: (...) -> list[str]
+    """Build the wheels of *requirement* and move them into *wheelhouse*."""
+    environ_update = {}
+    if libyaml_prefix:
+        environ_update = {
+            'C_INCLUDE_PATH': os.path.join(libyaml_prefix, 'include'),
+            'LIBRARY_PATH': os.path.join(libyaml_prefix, 'lib'),
+        }
+
+    wheel_dir = tempfile.mkdtemp(dir=wheelhouse, prefix='.build-')
+    try:
+        get_command_runner(module).run(
+            [
+                python, '-m', 'pip', 'wheel', '--disable-pip-version-check',
+                '--wheel-dir', wheel_dir, '--find-links', wheelhouse, requirement,
+            ],
+            environ_update=environ_update,
+        )
+        wheels = sorted(name for name in os.listdir(wheel_dir) if name.endswith('.whl'))
+        for wheel in wheels:
+            os.rename(os.path.join(wheel_dir, wheel), os.path.join(wheelhouse, wheel))
+    finally:
+        shutil.rmtree(wheel_dir, ignore_errors=True)
+    return wheels
+
+
+def update_cache(module, python_info):  # type: (AnsibleModule, dict) -> dict
+    params = module.params
+    results = {'changed': False, 'python': python_info, 'wheels': [], 'cached': [], 'built': []}
+
+    libyaml_prefix = None
+    if params['libyaml_src']:
+        libyaml_prefix = get_libyaml_prefix(params['cache_dir'], params['libyaml_version'], python_info)
+        results['libyaml_prefix'] = libyaml_prefix
+        if params['force'] or not is_complete(libyaml_prefix):
+            results['changed'] = True
+            if not module.check_mode:
+                build_libyaml(module, params['libyaml_src'], libyaml_prefix)
+                mark_complete(libyaml_prefix, version=params['libyaml_version'], machine=python_info['machine'])
+
+    wheelhouse = get_wheelhouse(params['cache_dir'], python_info, params['libyaml_version'] if libyaml_prefix else None)
+    results['wheelhouse'] = wheelhouse
+    if not module.check_mode and not os.path.isdir(wheelhouse):
+        os.makedirs(wheelhouse)
+
+    index = load_index(wheelhouse)
+    for requirement in params['packages']:
+        entry = index['requirements'].get(requirement)
+        if not params['force'] and is_cached(wheelhouse, entry):
+            results['cached'].append(requirement)
+            results['wheels'].extend(entry['wheels'])
+            continue
+
+        results['changed'] = True
+        results['built'].append(requirement)
+        if module.check_mode:
+            continue
+        wheels = build_wheels(module, params['python'], requirement, wheelhouse, libyaml_prefix)
+        index['requirements'][requirement] = {
+            'wheels': wheels,
+            'python_version': python_info['version'],
+            'built_at': time.time(),
+        }
+        save_index(wheelhouse, index)
+        results['wheels'].extend(wheels)
+
+    results['wheels'] = sorted(set(results['wheels']))
+    return results
+
+
+@profile_entrypoint('python_build_cache')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'python': {'type': 'path', 'required': True},
+            'packages': {'type': 'list', 'elements': 'str', 'default': []},
+            'libyaml_src': {'type': 'path'},
+            'libyaml_version': {'type': 'str'},
+            'cache_dir': {'type': 'path', 'default': '~/.ansible/cache/samdoran.macos/python_build'},
+            'force': {'type': 'bool', 'default': False},
+        },
+        required_together=[('libyaml_src', 'libyaml_version')],
+        supports_check_mode=True,
+    )
+    runner = get_command_runner(module)
+    cache_dir = module.params['cache_dir']
+
+    try:
+        python_info = get_python_info(runner, module.params['python'])
+    except CmdFailedError as cmd_err:
+        module.fail_json(**runner.annotate(cmd_err.error_args))
+    except PythonBuildCacheError as cache_err:
+        module.fail_json(**runner.annotate({'msg': to_native(cache_err)}))
+
+    if not os.path.isdir(cache_dir):
+        if module.check_mode:
+            # NOTE: An empty cache, everything would be built.
+            module.exit_json(**runner.annotate(update_cache(module, python_info)))
+        os.makedirs(cache_dir)
+
+    with open(os.path.join(cache_dir, LOCK_FILENAME), 'a') as lock_file:
+        # NOTE: Serializes concurrent runs against the same cache.
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            results = update_cache(module, python_info)
+        except CmdFailedError as cmd_err:
+            module.fail_json(**runner.annotate(cmd_err.error_args))
+        except (IOError, OSError, zipfile.BadZipfile) as build_err:
+            module.fail_json(**runner.annotate({'msg': 'Failed to update the build cache in {0}: {1}'.format(
+                cache_dir, to_native(build_err),
+            )}))
+
+    module.exit_json(**runner.annotate(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2020 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = """
+module: softwareupdate_catalog
+author:
+  - Sam Doran (@samdoran)
+version_added: '2.7.0'
+short_description: List the updates offered by C(softwareupdate), with an on-host cache
+notes:
+  - The Xcode Command Line Tools are only listed while the I(marker) file
+    exists. When the module creates it, it is removed again after the scan,
+    so keep the marker around with a separate task when installing them.
+  - In check mode the marker is not created and the cache is not written.
+description:
+  - Parse the output of C(softwareupdate --list) into labels, titles and
+    versions, and return the exact label of the newest update matching I(name).
+  - Scanning the catalog can take minutes. The parsed catalog is cached on
+    the host in I(cache_path) and reused for I(cache_ttl) seconds, as long as
+    the macOS version and the presence of the I(marker) did not change.
+options:
+  name:
+    description:
+      - Regular expression searched for in the labels of the updates.
+      - The label of the newest matching update is returned as I(label).
+        The module fails when no update matches.
+    type: str
+  marker:
+    description:
+      - Path of the file making C(softwareupdate) offer the Xcode Command
+        Line Tools. It is created for the duration of the scan when missing.
+      - Set to an empty string to scan without it.
+    type: path
+    default: /private/tmp/.com.apple.dt.CommandLineTools.installondemand.in-progress
+  cache_path:
+    description: Path of the file caching the parsed catalog.
+    type: path
+    default: /var/tmp/samdoran.macos/softwareupdate_catalog.json
+  cache_ttl:
+    description: Number of seconds the cached catalog is used for. C(0) disables the cache.
+    type: int
+    default: 86400
+  force:
+    description: Scan the catalog even when the cache is fresh.
+    type: bool
+    default: false
+  timeout:
+    description: Seconds to wait for C(softwareupdate) to scan the catalog.
+    type: int
+    default: 900
+"""
+
+EXAMPLES = """
+- name: Look up the Xcode Command Line Tools label
+  samdoran.macos.softwareupdate_catalog:
+    name: ^Command Line Tools for Xcode-
+  register: catalog
+
+- name: Install the Xcode Command Line Tools
+  command: softwareupdate --install {{ catalog.label | quote }}
+
+- name: List the recommended updates, scanning the catalog again
+  samdoran.macos.softwareupdate_catalog:
+    marker: ''
+    force: true
+  register: catalog
+"""
+
+RETURN = """
+label:
+  description: Label of the newest update matching I(name)
+  returned: when I(name) is set
+  type: str
+  sample: Command Line Tools for Xcode-15.3
+version:
+  description: Version of the update returned in I(label)
+  returned: when I(name) is set
+  type: str
+  sample: '15.3'
+updates:
+  description: Updates offered by C(softwareupdate), in the catalog order
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    label:
+      description: Label to pass to C(softwareupdate --install)
+      type: str
+    title:
+      description: Human readable name of the update
+      type: str
+    version:
+      description: Version of the update
+      type: str
+    size:
+      description: Download size, as reported by C(softwareupdate)
+      type: str
+    recommended:
+      description: Whether Apple recommends the update
+      type: bool
+    action:
+      description: Action needed after installing, such as C(restart)
+      type: str
+  sample:
+    - label: Command Line Tools for Xcode-15.3
+      title: Command Line Tools for Xcode
+      version: '15.3'
+      size: 707501KiB
+      recommended: true
+      action: ''
+cached:
+  description: Whether the catalog came from the cache
+  returned: always
+  type: bool
+cache_age:
+  description: Age in seconds of the returned catalog
+  returned: always
+  type: float
+command_stats:
+  description:
+    - Count and latency of the subprocesses run by the module.
+    - Only reported when the C(SAMDORAN_MACOS_COMMAND_STATS) environment variable is set to a true value on the target.
+  returned: when requested
+  type: dict
+"""
+
+import json
+import os
+import platform
+import re
+import tempfile
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_native
+
+from ..module_utils.command_runner import CmdFailedError, get_command_runner
+from ..module_utils.profiling import profile_entrypoint
+
+
+CACHE_FORMAT = 1
+# NOTE: macOS 10.15 and later list updates as `* Label: <label>` followed
+# NOTE: by a `Title: ..., Version: ..., Size: ...` line.
+LABEL_RE = re.compile(r'^\s*\* (?:Label: )?(?P<label>.+?)\s*$')
+DETAIL_FIELD_RE = re.compile(r'(\w+): ([^,]*)')
+# NOTE: Older releases print `<title> (<version>), <size> [recommended]`.
+LEGACY_DETAIL_RE = re.compile(
+    r'^\s*(?P<title>.+) \((?P<version>[^)]*)\), (?P<size>\d+\w*)(?P<flags>.*)$',
+)
+
+
+def parse_detail(update, line):  # type: (dict, str) -> None
+    fields = dict(
+        (key.lower(), value.strip())
+        for key, value in DETAIL_FIELD_RE.findall(line)
+    )
+    if 'title' in fields:
+        update.update({
+            'title': fields['title'],
+            'version': fields.get('version', ''),
+            'size': fields.get('size', ''),
+            'recommended': fields.get('recommended', '').upper() == 'YES',
+            'action': fields.get('action', ''),
+        })
+        return
+
+    legacy = LEGACY_DETAIL_RE.match(line)
+    if legacy is not None:
+        flags = legacy.group('flags')
+        update.update({
+            'title': legacy.group('title'),
+            'version': legacy.group('version'),
+            'size': legacy.group('size'),
+            'recommended': '[recommended]' in flags,
+            'action': 'restart' if '[restart]' in flags else '',
+        })
+
+
+def parse_catalog(stdout):  # type: (str) -> list[dict]
+    """Parse the output of ``softwareupdate --list``."""
+    updates = []
+    for line in stdout.splitlines():
+        label = LABEL_RE.match(line)
+        if label is not None:
+            updates.append({
+                'label': label.group('label'),
+                'title': label.group('label'),
+                'version': '',
+                'size': '',
+                'recommended': False,
+                'action': '',
+            })
+        elif updates and line.startswith('\t'):
+            parse_detail(updates[-1], line)
+    return updates
+
+
+def version_key(update):  # type: (dict) -> tuple[int, ...]
+    version = update['version'] or update['label'].rpartition('-')[2]
+    return tuple(int(part) for part in re.findall(r'\d+', version))
+
+
+def find_update(updates, name):  # type: (list[dict], str) -> dict | None
+    """Return the newest update whose label matches *name*."""
+    pattern = re.compile(name)
+    matches = [update for update in updates if pattern.search(update['label'])]
+    if not matches:
+        return None
+    return max(matches, key=version_key)
+
+
+def get_cache_key(marker):  # type: (str) -> dict
+    return {
+        'format': CACHE_FORMAT,
+        'macos_version': platform.mac_ver()[0],
+        'marker': bool(marker),
+    }
+
+
+def read_catalog_cache(cache_path, cache_key, ttl):  # type: (...) -> dict | None
+    try:
+        with open(cache_path) as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if not isinstance(cache, dict) or cache.get('key') != cache_key:
+        return None
+    if not 0 <= time.time() - cache.get('scanned_at', 0) < ttl:
+        return None
+    return cache
+
+
+def write_catalog_cache(module, cache_path, cache):  # type: (...) -> None
+    cache_dir = os.path.dirname(cache_path)
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.softwareupdate-')
+        with os.fdopen(fd, 'w') as tmp_file:
+            json.dump(cache, tmp_file, indent=2, sort_keys=True)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError) as err:
+        module.warn('Unable to cache the software update catalog in {path}: {err}'.format(path=cache_path, err=to_native(err)))
+
+
+def scan_catalog(module, marker):  # type: (...) -> list[dict]
+    """Run ``softwareupdate --list``, with the marker in place if requested."""
+    softwareupdate = module.get_bin_path('softwareupdate', required=True)
+    created_marker = False
+    if marker and not os.path.exists(marker) and not module.check_mode:
+        open(marker, 'a').close()
+        created_marker = True
+
+    try:
+        res = get_command_runner(module).run(
+            [softwareupdate, '--list'],
+            timeout=module.params['timeout'],
+        )
+    finally:
+        if created_marker:
+            os.remove(marker)
+
+    return parse_catalog(res['stdout'])
+
+
+@profile_entrypoint('softwareupdate_catalog')
+def main():
+    module = AnsibleModule(
+        argument_spec={
+            'name': {'type': 'str'},
+            'marker': {
+                'type': 'path',
+                'default': '/private/tmp/.com.apple.dt.CommandLineTools.installondemand.in-progress',
+            },
+            'cache_path': {'type': 'path', 'default': '/var/tmp/samdoran.macos/softwareupdate_catalog.json'},
+            'cache_ttl': {'type': 'int', 'default': 86400},
+            'force': {'type': 'bool', 'default': False},
+            'timeout': {'type': 'int', 'default': 900},
+        },
+        supports_check_mode=True,
+    )
+    runner = get_command_runner(module)
+    params = module.params
+
+    cache_key = get_cache_key(params['marker'])
+    cache = None
+    if not params['force'] and params['cache_ttl'] > 0:
+        cache = read_catalog_cache(params['cache_path'], cache_key, params['cache_ttl'])
+
+    results = {'changed': False, 'cached': cache is not None}
+    if cache is None:
+        try:
+            cache = {'key': cache_key, 'scanned_at': time.time(), 'updates': scan_catalog(module, params['marker'])}
+        except CmdFailedError as cmd_err:
+            module.fail_json(**runner.annotate(cmd_err.error_args))
+        if params['cache_ttl'] > 0 and not module.check_mode:
+            write_catalog_cache(module, params['cache_path'], cache)
+
+    results['updates'] = cache['updates']
+    results['cache_age'] = round(max(time.time() - cache['scanned_at'], 0), 3)
+
+    if params['name'] is not None:
+        update = find_update(cache['updates'], params['name'])
+        if update is None:
+            results['msg'] = 'No update matching {0} found in the software update catalog'.format(params['name'])
+            module.fail_json(**runner.annotate(results))
+        results['label'] = update['label']
+        results['version'] = update['version']
+
+    module.exit_json(**runner.annotate(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/bin/sh
+# Install the Xcode Command Line Tools unless they are already present.
+#
+# Meant to run in a single `raw` task on hosts without Python, so it only
+# relies on POSIX sh and the base system utilities. Progress goes to stderr
+# and the last line of stdout is a JSON document:
+#
+#   {"changed": true, "installed": true, "label": "...", "duration": 312, "msg": "..."}
+#
+# The exit code is 0 when the tools are installed at the end of the run.
+
+set -u
+
+tools_dir=/Library/Developer/CommandLineTools
+marker=/private/tmp/.com.apple.dt.CommandLineTools.installondemand.in-progress
+label_pattern='Command Line Tools for Xcode-.*'
+
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --tools-dir) tools_dir=$2; shift 2 ;;
+        --marker) marker=$2; shift 2 ;;
+        --label-pattern) label_pattern=$2; shift 2 ;;
+        *) echo "Unknown argument: $1" >&2; exit 2 ;;
+    esac
+done
+
+started=$(date +%s)
+label=
+
+json_string() {
+    printf '"%s"' "$(printf '%s' "$1" | sed -e 's/\\/\\\\/g' -e 's/"/\\"/g')"
+}
+
+# report CHANGED INSTALLED MSG
+report() {
+    if [ -n "$label" ]; then
+        label_json=$(json_string "$label")
+    else
+        label_json=null
+    fi
+    printf '{"changed": %s, "installed": %s, "label": %s, "duration": %s, "msg": %s}\n' \
+        "$1" "$2" "$label_json" "$(( $(date +%s) - started ))" "$(json_string "$3")"
+}
+
+if [ -d "$tools_dir" ]; then
+    report false true "The Xcode Command Line Tools are already installed in $tools_dir"
+    exit 0
+fi
+
+# NOTE: softwareupdate only offers the tools while the marker file exists.
+created_marker=no
+if [ ! -e "$marker" ]; then
+    touch "$marker" && created_marker=yes
+fi
+trap 'if [ "$created_marker" = yes ]; then rm -f "$marker"; fi' EXIT
+
+echo "Looking up the Xcode Command Line Tools update" >&2
+label=$(softwareupdate --list 2>/dev/null | grep -o "$label_pattern" | tail -n 1 | tr -d '\n')
+if [ -z "$label" ]; then
+    report false false "No update matching '$label_pattern' is offered by softwareupdate"
+    exit 1
+fi
+
+echo "Installing $label" >&2
+softwareupdate --install "$label" >&2
+rc=$?
+if [ "$rc" -ne 0 ]; then
+    report false false "Installing $label failed with the return code $rc"
+    exit 1
+fi
+
+if [ ! -d "$tools_dir" ]; then
+    report true false "Installing $label did not create $tools_dir"
+    exit 1
+fi
+
+report true true "Installed $label"
@@ -2,11 +2,5 @@
 
 set -euo pipefail
 
-if [[ ! -d /Library/Developer/CommandLineTools ]]; then
-    echo "Installing Xcode command line tools"
-    TMP_FILE=/private/tmp/.com.apple.dt.CommandLineTools.installondemand.in-progress
-    touch "$TMP_FILE"
-    PACKAGE_NAME=$(sudo softwareupdate -l | grep -o 'Command Line Tools for Xcode-.*' | tail -n 1 | tr -d '\n')
-    sudo softwareupdate --install "$PACKAGE_NAME"
-    rm -fv "$TMP_FILE"
-fi
+# NOTE: The role runs the same script over a single raw connection.
+exec sudo /bin/sh "$(dirname "$0")/../roles/command_line_tools/files/bootstrap.sh" "$@"
@@ -0,0 +1,109 @@
+"""Benchmark the ``bootstrap_certs`` validation modes against the real ``openssl``.
+
+The certificates of a PEM bundle, repeated as needed to reach ``--certs``,
+go through :func:`validate_certs` and :func:`validate_certs_batched`. For
+every round this records the wall-clock latency of each mode and the
+number of ``openssl`` processes it ran. The script exits non-zero when the
+modes disagree on which certificates are valid, and reports the speedup of
+the batched mode from the medians.
+
+Run from a checkout living under an ``ansible_collections/samdoran/macos``
+directory, with that tree's root on ``PYTHONPATH``::
+
+    python tests/benchmarks/bench_bootstrap_certs.py --certs 150 --rounds 5
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import itertools
+import json
+import re
+import ssl
+import statistics
+import sys
+import time
+
+from ansible.module_utils.common.process import get_bin_path
+
+from ansible_collections.samdoran.macos.plugins.module_utils.command_runner import get_command_runner
+from ansible_collections.samdoran.macos.plugins.modules import bootstrap_certs
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleStub
+
+
+CERT_RE = re.compile(r'-----BEGIN CERTIFICATE-----.*?-----END CERTIFICATE-----', re.DOTALL)
+
+
+class OpensslModuleStub(ModuleStub):
+    """Module stand-in resolving the real executables."""
+
+    def get_bin_path(self, arg, required=False, opt_dirs=None):
+        return get_bin_path(arg, opt_dirs=opt_dirs)
+
+
+def load_certs(bundle_path, count):
+    with open(bundle_path) as bundle_file:
+        certs = CERT_RE.findall(bundle_file.read())
+    if not certs:
+        sys.exit('No certificates found in {0}'.format(bundle_path))
+    return list(itertools.islice(itertools.cycle(certs), count))
+
+
+def measure_round(certs):
+    per_cert_module = OpensslModuleStub()
+    started = time.perf_counter()
+    per_cert_valid = bootstrap_certs.validate_certs(per_cert_module, certs)
+    per_cert_done = time.perf_counter()
+
+    batched_module = OpensslModuleStub()
+    batched_valid, rechecked = bootstrap_certs.validate_certs_batched(batched_module, certs)
+    batched_done = time.perf_counter()
+
+    if per_cert_valid != batched_valid:
+        raise RuntimeError('The validation modes disagree on {0} certificates'.format(
+            len(set(per_cert_valid) ^ set(batched_valid)),
+        ))
+
+    return {
+        'per_cert_ms': (per_cert_done - started) * 1000,
+        'per_cert_processes': get_command_runner(per_cert_module).summary()['count'],
+        'batched_ms': (batched_done - per_cert_done) * 1000,
+        'batched_processes': get_command_runner(batched_module).summary()['count'],
+        'rechecked': rechecked,
+        'valid': len(batched_valid),
+    }
+
+
+def summarize(rounds):
+    return {
+        metric: round(statistics.median(
+            round_result[metric] for round_result in rounds
+        ), 3)
+        for metric in rounds[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bundle', default=ssl.get_default_verify_paths().cafile)
+    parser.add_argument('--certs', type=int, default=150)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--output', help='Write the summary JSON here')
+    args = parser.parse_args()
+
+    certs = load_certs(args.bundle, args.certs)
+    rounds = [measure_round(certs) for _round in range(args.rounds)]
+
+    summary = summarize(rounds)
+    summary['certs'] = len(certs)
+    summary['speedup'] = round(summary['per_cert_ms'] / summary['batched_ms'], 2)
+    print(json.dumps(summary, indent=2, sort_keys=True))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(summary, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
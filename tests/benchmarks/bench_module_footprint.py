@@ -0,0 +1,187 @@
+"""Benchmark the AnsiballZ payload size and cold import time of each module.
+
+For every module under ``plugins/modules/`` this builds the AnsiballZ
+payload the controller would transfer, and reports its size along with
+the size of the embedded zip and of the collection's own ``module_utils``
+inside it. The module is then imported in fresh interpreters to measure
+the cold import time, with a ``-X importtime`` breakdown of the
+collection's ``module_utils``.
+
+Run from a checkout living under an ``ansible_collections/samdoran/macos``
+directory, with that tree's root on ``PYTHONPATH``::
+
+    python tests/benchmarks/bench_module_footprint.py --rounds 10
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import base64
+import io
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import zipfile
+
+
+MODULE_FQN_PREFIX = 'ansible_collections.samdoran.macos.plugins.modules.'
+MODULE_UTILS_FQN_PREFIX = 'ansible_collections.samdoran.macos.plugins.module_utils.'
+
+IMPORT_PROBE = """
+import time
+_start = time.perf_counter()
+import {fqn}
+print(time.perf_counter() - _start)
+"""
+
+# NOTE: The zip is embedded as a base64 literal in every ansible-core
+# NOTE: version, but the surrounding wrapper code differs between them.
+ZIP_LITERAL_RE = re.compile(br"""['"](UEsDB[A-Za-z0-9+/=\s]+)['"]""")
+
+
+def find_collections_path():
+    # NOTE: Resolved from `sys.path` rather than `__file__` so that a
+    # NOTE: symlinked `ansible_collections` tree is honored. Nothing may be
+    # NOTE: imported from `ansible_collections` before the collection
+    # NOTE: finder gets installed, so the import system is not used here.
+    for path_entry in sys.path:
+        candidate = os.path.join(
+            path_entry or os.curdir,
+            'ansible_collections', 'samdoran', 'macos', 'plugins', 'modules',
+        )
+        if os.path.isdir(candidate):
+            return os.path.abspath(path_entry or os.curdir)
+    sys.exit('The samdoran.macos collection is not on PYTHONPATH')
+
+
+COLLECTIONS_PATH = find_collections_path()
+MODULES_DIR = os.path.join(
+    COLLECTIONS_PATH,
+    'ansible_collections', 'samdoran', 'macos', 'plugins', 'modules',
+)
+
+
+def build_payload(module_name, module_path, interpreter):
+    from ansible.executor import module_common
+    from ansible.parsing.dataloader import DataLoader
+    from ansible.template import Templar
+    from ansible.utils.collection_loader._collection_finder import (
+        _AnsibleCollectionFinder,
+    )
+
+    _AnsibleCollectionFinder(paths=[COLLECTIONS_PATH])._install()
+    built = module_common.modify_module(
+        module_name='samdoran.macos.{0}'.format(module_name),
+        module_path=module_path,
+        module_args={},
+        templar=Templar(loader=DataLoader()),
+        task_vars={'ansible_python_interpreter': interpreter},
+    )
+    # NOTE: ansible-core 2.19+ returns an object, older versions a tuple.
+    return getattr(built, 'b_module_data', None) or built[0]
+
+
+def inspect_payload(payload):
+    zip_match = ZIP_LITERAL_RE.search(payload)
+    if zip_match is None:
+        return {'zip_bytes': None, 'zip_entries': None, 'collection_utils_bytes': None}
+
+    zip_data = base64.b64decode(zip_match.group(1))
+    with zipfile.ZipFile(io.BytesIO(zip_data)) as payload_zip:
+        entries = payload_zip.infolist()
+    collection_utils = [
+        entry for entry in entries
+        if entry.filename.startswith('ansible_collections/samdoran/macos/plugins/module_utils/')
+    ]
+    return {
+        'zip_bytes': len(zip_data),
+        'zip_entries': len(entries),
+        'collection_utils_bytes': sum(entry.file_size for entry in collection_utils),
+        'collection_utils': sorted(
+            os.path.basename(entry.filename) for entry in collection_utils
+            if not entry.filename.endswith('__init__.py')
+        ),
+    }
+
+
+def probe_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [COLLECTIONS_PATH] + [
+            entry for entry in env.get('PYTHONPATH', '').split(os.pathsep)
+            if entry
+        ],
+    )
+    return env
+
+
+def measure_cold_import(fqn, rounds):
+    samples = [
+        float(subprocess.check_output(
+            (sys.executable, '-c', IMPORT_PROBE.format(fqn=fqn)),
+            env=probe_env(),
+        ).decode().strip())
+        for _round in range(rounds)
+    ]
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def measure_collection_utils_import(fqn):
+    proc = subprocess.run(
+        (sys.executable, '-X', 'importtime', '-c', 'import {0}'.format(fqn)),
+        env=probe_env(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    breakdown = {}
+    for line in proc.stderr.decode().splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _self_us, cumulative_us, imported = line[len('import time:'):].split('|')
+        imported = imported.strip()
+        if imported.startswith(MODULE_UTILS_FQN_PREFIX):
+            breakdown[imported[len(MODULE_UTILS_FQN_PREFIX):]] = (
+                int(cumulative_us) / 1000
+            )
+    return breakdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--interpreter', default='/usr/bin/python3')
+    parser.add_argument('--output', help='Write the results JSON here')
+    parser.add_argument('modules', nargs='*', help='Module names, all by default')
+    args = parser.parse_args()
+
+    module_names = args.modules or sorted(
+        file_name[:-len('.py')] for file_name in os.listdir(MODULES_DIR)
+        if file_name.endswith('.py') and not file_name.startswith('_')
+    )
+
+    results = {}
+    for module_name in module_names:
+        module_path = os.path.join(MODULES_DIR, module_name + '.py')
+        fqn = MODULE_FQN_PREFIX + module_name
+        payload = build_payload(module_name, module_path, args.interpreter)
+        module_result = {'payload_bytes': len(payload)}
+        module_result.update(inspect_payload(payload))
+        module_result['cold_import_ms'] = measure_cold_import(fqn, args.rounds)
+        module_result['module_utils_import_ms'] = (
+            measure_collection_utils_import(fqn)
+        )
+        results[module_name] = module_result
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
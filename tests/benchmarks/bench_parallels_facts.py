@@ -0,0 +1,154 @@
+"""Benchmark the ``parallels_facts`` collectors at fleet scale.
+
+The collectors run against stub ``prlsrvctl`` and ``prlctl`` binaries
+serving the recorded-style corpus from the unit tests, with the VM listing
+generated for the requested number of guests. For every round this records:
+
+* the wall-clock latency of ``get_server_info()`` and ``get_vm_info()``
+* the time spent in :func:`json.loads` on the raw CLI outputs alone
+* the serialized size of the resulting ``ansible_facts.parallels`` value
+* the peak Python memory allocated while collecting
+
+Results can be saved with ``--output`` and compared against a previous run
+with ``--baseline``; the script exits non-zero when any median regresses by
+more than ``--max-regression``.
+
+Run from a checkout living under an ``ansible_collections/samdoran/macos``
+directory, with that tree's root on ``PYTHONPATH``::
+
+    python tests/benchmarks/bench_parallels_facts.py --vms 1000 --rounds 20
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from ansible_collections.samdoran.macos.plugins.module_utils import parallels_facts
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules import parallels_corpus
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleStub
+
+
+def empty_facts():
+    return {'Version': {}, 'VMs': [], 'running_vm_count': 0}
+
+
+def measure_round(server_info_path, vm_list_path):
+    module = ModuleStub()
+    facts = empty_facts()
+
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        parallels_facts.get_server_info(module, facts)
+        server_info_done = time.perf_counter()
+        parallels_facts.get_vm_info(module, facts)
+        vm_info_done = time.perf_counter()
+        _current, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if module.warnings:
+        raise RuntimeError('Collectors failed: {0}'.format(module.warnings))
+
+    with open(server_info_path) as server_info_file:
+        raw_server_info = server_info_file.read()
+    with open(vm_list_path) as vm_list_file:
+        raw_vm_list = vm_list_file.read()
+    parse_started = time.perf_counter()
+    json.loads(raw_server_info)
+    json.loads(raw_vm_list)
+    parse_done = time.perf_counter()
+
+    return {
+        'server_info_ms': (server_info_done - started) * 1000,
+        'vm_info_ms': (vm_info_done - server_info_done) * 1000,
+        'collect_total_ms': (vm_info_done - started) * 1000,
+        'json_parse_ms': (parse_done - parse_started) * 1000,
+        'result_bytes': len(json.dumps(facts)),
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def summarize(rounds):
+    return {
+        metric: round(statistics.median(
+            round_result[metric] for round_result in rounds
+        ), 3)
+        for metric in rounds[0]
+    }
+
+
+def compare(summary, baseline, max_regression):
+    regressions = {}
+    for metric, value in sorted(summary.items()):
+        baseline_value = baseline.get(metric)
+        if metric == 'vms' or not baseline_value:
+            continue
+        change = (value - baseline_value) / baseline_value
+        print(
+            '{metric:>20}: {base:>12} -> {value:>12} ({change:+.1%})'.format(
+                metric=metric, base=baseline_value, value=value, change=change,
+            ),
+        )
+        if change > max_regression:
+            regressions[metric] = change
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vms', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--output', help='Write the summary JSON here')
+    parser.add_argument('--baseline', help='Summary JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench-parallels-facts-')
+    original_path = os.environ.get('PATH', '')
+    try:
+        bin_dir = os.path.join(work_dir, 'bin')
+        os.mkdir(bin_dir)
+        vm_list_path = parallels_corpus.write_vm_list(
+            os.path.join(work_dir, 'vms.json'), args.vms,
+        )
+        parallels_corpus.install_parallels_stubs(bin_dir, vm_list=vm_list_path)
+        os.environ['PATH'] = bin_dir
+
+        rounds = [
+            measure_round(parallels_corpus.SERVER_INFO_FIXTURE, vm_list_path)
+            for _round in range(args.rounds)
+        ]
+    finally:
+        os.environ['PATH'] = original_path
+        shutil.rmtree(work_dir)
+
+    summary = summarize(rounds)
+    summary['vms'] = args.vms
+    print(json.dumps(summary, indent=2, sort_keys=True))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(summary, output_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('vms') != args.vms:
+            sys.exit('Baseline was recorded for {0} VMs'.format(baseline.get('vms')))
+        regressions = compare(summary, baseline, args.max_regression)
+        if regressions:
+            sys.exit('Regressed: {0}'.format(', '.join(sorted(regressions))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Benchmark ``parallels_facts`` startup with and without the Parallels SDK.
+
+Each scenario runs in a fresh interpreter so import costs are not hidden by
+:data:`sys.modules`. The SDK used is either a real installation, passed via
+``--sdk-path``, or a generated stand-in whose import and initialization are
+slowed down artificially to resemble the real ``prlsdkapi``.
+
+Run from a checkout living under an ``ansible_collections/samdoran/macos``
+directory, with that tree's root on ``PYTHONPATH``::
+
+    python tests/benchmarks/bench_parallels_facts_startup.py --rounds 20
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+FAKE_SDK_SOURCE = """
+import time
+
+time.sleep({import_delay!r})
+
+
+def init_desktop_sdk():
+    time.sleep({init_delay!r})
+
+
+def deinit_sdk():
+    pass
+
+
+class ApiHelper:
+    def get_version(self):
+        return '524288'
+"""
+
+IMPORT_PROBE = """
+import time
+_start = time.perf_counter()
+from ansible_collections.samdoran.macos.plugins.module_utils import parallels_facts
+print(time.perf_counter() - _start)
+"""
+
+SDK_VERSION_PROBE = """
+import sys
+import time
+from ansible_collections.samdoran.macos.plugins.module_utils import parallels_facts
+_start = time.perf_counter()
+parallels_facts.get_sdk_version(None, sys.argv[1])
+print(time.perf_counter() - _start)
+"""
+
+
+def write_fake_sdk(site_dir, import_delay, init_delay):
+    sdk_dir = os.path.join(site_dir, 'prlsdkapi')
+    os.makedirs(sdk_dir)
+    with open(os.path.join(sdk_dir, '__init__.py'), 'w') as sdk_init:
+        sdk_init.write(FAKE_SDK_SOURCE.format(
+            import_delay=import_delay, init_delay=init_delay,
+        ))
+
+
+def run_probe(probe, python_path, *probe_args):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(python_path)
+    output = subprocess.check_output(
+        (sys.executable, '-c', probe) + probe_args,
+        env=env,
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def summarize(samples):
+    return {
+        'min_ms': round(min(samples) * 1000, 3),
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument(
+        '--sdk-path',
+        help='Directory containing a real prlsdkapi package',
+    )
+    parser.add_argument('--fake-import-delay', type=float, default=0.05)
+    parser.add_argument('--fake-init-delay', type=float, default=0.2)
+    args = parser.parse_args()
+
+    base_path = [
+        entry for entry in os.environ.get('PYTHONPATH', '').split(os.pathsep)
+        if entry
+    ]
+
+    work_dir = tempfile.mkdtemp(prefix='bench-parallels-facts-')
+    sdk_site = args.sdk_path
+    if sdk_site is None:
+        sdk_site = os.path.join(work_dir, 'site-packages')
+        write_fake_sdk(
+            sdk_site, args.fake_import_delay, args.fake_init_delay,
+        )
+    cache_path = os.path.join(work_dir, 'sdk.json')
+
+    scenarios = {
+        'import_without_sdk': lambda: run_probe(IMPORT_PROBE, base_path),
+        'import_with_sdk': lambda: run_probe(
+            IMPORT_PROBE, [sdk_site] + base_path,
+        ),
+        'sdk_version_uncached': lambda: run_probe(
+            SDK_VERSION_PROBE, [sdk_site] + base_path, '',
+        ),
+        'sdk_version_cached': lambda: run_probe(
+            SDK_VERSION_PROBE, [sdk_site] + base_path, cache_path,
+        ),
+    }
+
+    try:
+        # NOTE: Prime the cache so that the cached scenario measures hits only.
+        run_probe(SDK_VERSION_PROBE, [sdk_site] + base_path, cache_path)
+
+        results = {
+            name: summarize([scenario() for _round in range(args.rounds)])
+            for name, scenario in scenarios.items()
+        }
+    finally:
+        shutil.rmtree(work_dir)
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""Shared fixtures for the unit tests."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import pytest
+
+
+@pytest.fixture
+def stub_bin_dir(tmp_path, monkeypatch):
+    """Make a directory of stub binaries the only thing on ``PATH``."""
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    monkeypatch.setenv('PATH', str(bin_dir))
+    return bin_dir
@@ -0,0 +1,139 @@
+"""Unit tests for the Parallels state action plugin."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+COLLECTIONS_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 7))
+
+# NOTE: Every stub records its command line, so the test can tell how many
+# NOTE: times the module ran. The app "runs" once `open` created the PID file.
+STUB_PREAMBLE = """
+import json
+import os
+import sys
+
+STATE_DIR = {state_dir!r}
+PID_PATH = os.path.join(STATE_DIR, 'prl_client_app.pid')
+
+with open(os.path.join(STATE_DIR, 'calls.log'), 'a') as calls_log:
+    calls_log.write(json.dumps([os.path.basename(sys.argv[0])] + sys.argv[1:]) + '\\n')
+"""
+
+STUB_SOURCES = {
+    'pgrep': """
+if not os.path.exists(PID_PATH):
+    sys.exit(1)
+with open(PID_PATH) as pid_file:
+    print(pid_file.read())
+""",
+    'open': """
+with open(PID_PATH, 'w') as pid_file:
+    pid_file.write('4242')
+""",
+    'osascript': """
+sys.exit(0)
+""",
+    'prlsrvctl': """
+print(json.dumps({
+    'Version': 'Desktop 18.1.0-53311',
+    'Hostname': 'mac-ci-01',
+    'License': {'state': 'valid'},
+    'Started as service': 'on' if os.path.exists(PID_PATH) else 'off',
+}))
+""",
+    'prlctl': """
+print(json.dumps([
+    {'uuid': '{c9eb5191-c85e-4758-bfe7-a983c79af343}', 'name': 'windows-2016',
+     'status': 'running', 'ip_configured': '10.111.77.22'},
+]))
+""",
+}
+
+PLAYBOOK = """
+- hosts: localhost
+  gather_facts: false
+  tasks:
+    - samdoran.macos.parallels_state:
+        {args}
+      register: parallels_state_result
+
+    - copy:
+        content: "{{{{ {{'result': parallels_state_result, 'facts': ansible_facts.parallels}} | to_json }}}}"
+        dest: {output_path}
+"""
+
+
+@pytest.fixture
+def stub_host(stub_bin_dir, tmp_path):
+    """Install the Parallels Desktop stubs and return their state dir."""
+    state_dir = tmp_path / 'state'
+    state_dir.mkdir()
+    for name, source in STUB_SOURCES.items():
+        write_stub_command(
+            stub_bin_dir, name,
+            STUB_PREAMBLE.format(state_dir=str(state_dir)) + source,
+        )
+    return state_dir
+
+
+def _run_playbook(tmp_path, stub_bin_dir, args):  # type: (...) -> dict
+    output_path = tmp_path / 'output.json'
+    playbook_path = tmp_path / 'playbook.yml'
+    playbook_path.write_text(PLAYBOOK.format(
+        args='\n        '.join('{0}: {1}'.format(key, value) for key, value in args.items()),
+        output_path=output_path,
+    ))
+
+    env = dict(
+        os.environ,
+        PATH=os.pathsep.join((str(stub_bin_dir), '/usr/bin', '/bin')),
+        ANSIBLE_COLLECTIONS_PATH=COLLECTIONS_ROOT,
+        ANSIBLE_PYTHON_INTERPRETER=sys.executable,
+        ANSIBLE_LOCAL_TEMP=str(tmp_path / 'local-tmp'),
+        ANSIBLE_REMOTE_TEMP=str(tmp_path / 'remote-tmp'),
+    )
+    proc = subprocess.run(
+        [sys.executable, '-m', 'ansible', 'playbook', '-i', 'localhost,', '-c', 'local', str(playbook_path)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env,
+    )
+    assert proc.returncode == 0, proc.stdout.decode()
+    return json.loads(output_path.read_text())
+
+
+def _calls(state_dir):  # type: (...) -> list[list[str]]
+    with open(str(state_dir / 'calls.log')) as calls_log:
+        return [json.loads(line) for line in calls_log]
+
+
+def test_start_and_refresh_facts_in_one_run(tmp_path, stub_bin_dir, stub_host):
+    """Check that the app is started and the facts describe the result."""
+    output = _run_playbook(tmp_path, stub_bin_dir, {
+        'state': 'started',
+        'sdk_version_cache': str(tmp_path / 'sdk.json'),
+    })
+
+    assert output['result']['changed']
+    assert 'has been started successfully' in output['result']['msg']
+    assert output['facts']['Version']['Full'] == '18.1.0-53311'
+    assert output['facts']['Started_as_service'] == 'on'
+    assert output['facts']['running_vm_count'] == 1
+    assert [call[0] for call in _calls(stub_host)] == ['pgrep', 'open', 'pgrep', 'prlsrvctl', 'prlctl']
+
+
+def test_facts_only_without_state(tmp_path, stub_bin_dir, stub_host):
+    """Check that leaving the state out only gathers the facts."""
+    output = _run_playbook(tmp_path, stub_bin_dir, {})
+
+    assert not output['result'].get('changed')
+    assert output['facts']['Started_as_service'] == 'off'
+    assert [call[0] for call in _calls(stub_host)] == ['prlsrvctl', 'prlctl']
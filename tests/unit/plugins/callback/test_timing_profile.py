@@ -0,0 +1,145 @@
+"""Unit tests for the timing profile callback plugin."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import csv
+import glob
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.callback import timing_profile
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules import parallels_corpus
+
+
+COLLECTIONS_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 7))
+
+PLAYBOOK = """
+- name: Sample the guests
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Sample the running VMs
+      samdoran.macos.parallels_vm_stats:
+        window: 0
+      environment:
+        SAMDORAN_MACOS_COMMAND_STATS: '1'
+
+    - name: Not from the collection
+      debug:
+        msg: ignored
+
+    - name: Skipped sampling
+      samdoran.macos.parallels_vm_stats:
+      when: false
+
+- name: Read progress files
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Read the progress files
+      samdoran.macos.parallels_desktop_status:
+        path: "{{{{ item }}}}"
+      loop:
+        - {tmp_path}/one.json
+        - {tmp_path}/two.json
+"""
+
+
+@pytest.fixture
+def reports(stub_bin_dir, tmp_path):
+    """Run a playbook with the callback enabled and return the report paths."""
+    # NOTE: The stub only serves the listing, so every statistics call fails.
+    parallels_corpus.install_parallels_stubs(stub_bin_dir)
+    playbook_path = tmp_path / 'site.yml'
+    playbook_path.write_text(PLAYBOOK.format(tmp_path=tmp_path))
+    output_dir = tmp_path / 'timing'
+
+    env = dict(
+        os.environ,
+        PATH=os.pathsep.join((str(stub_bin_dir), '/usr/bin', '/bin')),
+        ANSIBLE_COLLECTIONS_PATH=COLLECTIONS_ROOT,
+        ANSIBLE_PYTHON_INTERPRETER=sys.executable,
+        ANSIBLE_LOCAL_TEMP=str(tmp_path / 'local-tmp'),
+        ANSIBLE_REMOTE_TEMP=str(tmp_path / 'remote-tmp'),
+        ANSIBLE_CALLBACKS_ENABLED='samdoran.macos.timing_profile',
+        SAMDORAN_MACOS_TIMING_DIR=str(output_dir),
+        SAMDORAN_MACOS_TIMING_BUCKETS='0.001,60',
+    )
+    proc = subprocess.run(
+        [sys.executable, '-m', 'ansible', 'playbook', '-i', 'localhost,', '-c', 'local', str(playbook_path)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env,
+    )
+    assert proc.returncode == 0, proc.stdout.decode()
+    json_paths = glob.glob(str(output_dir / 'site-*.json'))
+    assert len(json_paths) == 1
+    return json_paths[0], json_paths[0][:-len('.json')] + '.csv'
+
+
+def test_json_report(reports):
+    """Check that only the collection tasks are profiled, per host."""
+    with open(reports[0]) as json_file:
+        report = json.load(json_file)
+
+    assert report['playbook'] == 'site'
+    assert [(record['play'], record['task'], record['status']) for record in report['records']] == [
+        ('Sample the guests', 'Sample the running VMs', 'ok'),
+        ('Sample the guests', 'Skipped sampling', 'skipped'),
+        ('Read progress files', 'Read the progress files', 'ok'),
+    ]
+    sampling = report['records'][0]
+    assert sampling['action'] == 'samdoran.macos.parallels_vm_stats'
+    assert sampling['timing']['command_stats']['count'] == 1 + 2
+    assert sampling['timing']['command_stats']['total_seconds'] > 0
+    assert sampling['duration'] >= sampling['timing']['command_stats']['total_seconds']
+
+    localhost = report['hosts']['localhost']
+    assert localhost['task_count'] == 3
+    assert sum(localhost['histogram'].values()) == 3
+    assert list(localhost['histogram']) == ['<=0.001s', '<=60s', '>60s']
+    assert localhost['actions']['samdoran.macos.parallels_vm_stats']['count'] == 2
+    assert localhost['slowest'][0]['duration'] == max(record['duration'] for record in report['records'])
+    assert report['summary']['task_count'] == 3
+
+
+def test_csv_report(reports):
+    """Check that the CSV report has one row per profiled task."""
+    with open(reports[1]) as csv_file:
+        rows = list(csv.DictReader(csv_file))
+
+    assert [row['task'] for row in rows] == [
+        'Sample the running VMs', 'Skipped sampling', 'Read the progress files',
+    ]
+    assert rows[0]['command_count'] == '3'
+    assert rows[1]['command_count'] == ''
+
+
+@pytest.mark.parametrize(('result', 'expected'), (
+    ({'changed': False, 'elapsed': 1.5, 'transition_seconds': True}, {'elapsed': 1.5}),
+    (
+        {'results': [
+            {'command_stats': {'count': 2, 'total_seconds': 0.5, 'max_seconds': 0.4, 'calls': []}},
+            {'command_stats': {'count': 1, 'total_seconds': 0.25, 'max_seconds': 0.25}, 'duration': 2},
+            'skipped item',
+        ]},
+        {
+            'command_stats': {'count': 3, 'failed': 0, 'timed_out': 0, 'total_seconds': 0.75, 'max_seconds': 0.4},
+            'duration': 2,
+        },
+    ),
+))
+def test_extract_timing(result, expected):
+    """Check that timing data is picked out of results and loop items."""
+    assert timing_profile.extract_timing(result) == expected
+
+
+def test_collection_tasks():
+    """Check which tasks are profiled."""
+    assert timing_profile.is_collection_task('samdoran.macos.bootstrap_certs', None)
+    assert timing_profile.is_collection_task('ansible.builtin.pip', 'samdoran.macos.python')
+    assert not timing_profile.is_collection_task('ansible.builtin.pip', 'geerlingguy.pip')
+    assert not timing_profile.is_collection_task('debug', None)
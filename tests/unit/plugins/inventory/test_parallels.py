@@ -0,0 +1,167 @@
+"""Unit tests for the Parallels Desktop VM inventory plugin."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible.errors import AnsibleParserError
+from ansible.inventory.data import InventoryData
+from ansible.parsing.dataloader import DataLoader
+
+try:
+    from ansible.template import trust_as_template
+except ImportError:  # ansible-core < 2.19 trusts every expression
+    def trust_as_template(value):  # type: (str) -> str
+        return value
+
+from ansible_collections.samdoran.macos.plugins.inventory.parallels import InventoryModule
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.parallels_corpus import VM_LIST_FIXTURE
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+DEFAULT_OPTIONS = {
+    'hosts': ['localhost'],
+    'prlctl_path': 'prlctl',
+    'ssh_executable': 'ssh',
+    'ssh_args': ['-o', 'BatchMode=yes'],
+    'timeout': 30,
+    'max_workers': 8,
+    'cache': False,
+    'strict': False,
+    'compose': {},
+    'groups': {},
+    'keyed_groups': [],
+    'use_extra_vars': False,
+    'leading_separator': True,
+}
+
+# NOTE: Answers for `localhost` directly and for other hosts through the
+# NOTE: `ssh` stub, which gets the remote command as its last argument.
+PRLCTL_STUB_SOURCE = """
+import os
+import sys
+
+with open({calls_path!r}, 'a') as calls_file:
+    calls_file.write(' '.join(sys.argv[1:]) + '\\n')
+if 'unreachable' in sys.argv:
+    sys.stderr.write('ssh: connect to host unreachable port 22: Connection refused\\n')
+    sys.exit(255)
+with open({fixture!r}) as fixture_file:
+    sys.stdout.write(fixture_file.read())
+"""
+
+
+@pytest.fixture
+def plugin(monkeypatch, stub_bin_dir, tmp_path):
+    calls_path = tmp_path / 'calls.log'
+    for stub_name in ('prlctl', 'ssh'):
+        write_stub_command(stub_bin_dir, stub_name, PRLCTL_STUB_SOURCE.format(
+            calls_path=str(calls_path), fixture=VM_LIST_FIXTURE,
+        ))
+
+    inventory_plugin = InventoryModule()
+    options = dict(DEFAULT_OPTIONS)
+    monkeypatch.setattr(inventory_plugin, 'get_option', options.get)
+    monkeypatch.setattr(inventory_plugin, '_read_config_data', lambda path: None)
+    inventory_plugin._cache = {}  # noqa: WPS437
+    inventory_plugin.test_options = options
+    inventory_plugin.calls_path = calls_path
+    return inventory_plugin
+
+
+def _parse(inventory_plugin, cache=True):  # type: (...) -> InventoryData
+    inventory = InventoryData()
+    inventory_plugin.parse(inventory, DataLoader(), '/tmp/parallels.yml', cache=cache)
+    return inventory
+
+
+def _query_count(inventory_plugin):  # type: (...) -> int
+    if not inventory_plugin.calls_path.exists():
+        return 0
+    return len(inventory_plugin.calls_path.read_text().splitlines())
+
+
+def test_verify_file(tmp_path):
+    """Check that only ``parallels.yml`` sources are claimed."""
+    for file_name in ('parallels.yml', 'hosts.yml'):
+        (tmp_path / file_name).write_text('plugin: samdoran.macos.parallels\n')
+
+    assert InventoryModule().verify_file(str(tmp_path / 'parallels.yml'))
+    assert not InventoryModule().verify_file(str(tmp_path / 'hosts.yml'))
+
+
+def test_populate_from_recorded_listing(plugin):
+    """Check the hostvars and groups built from the recorded listing."""
+    inventory = _parse(plugin)
+
+    assert sorted(inventory.hosts) == ['macOS-10.15', 'rhel-9', 'ubuntu-22.04', 'windows-2016']
+    windows_vars = inventory.get_host('windows-2016').vars
+    assert windows_vars['ansible_host'] == '10.111.77.22'
+    assert windows_vars['parallels_uuid'] == 'c9eb5191-c85e-4758-bfe7-a983c79af343'
+    assert windows_vars['parallels_host'] == 'localhost'
+    assert 'ansible_host' not in inventory.get_host('macOS-10.15').vars
+    assert inventory.get_host('macOS-10.15').vars['parallels_ip'] is None
+
+    assert sorted(host.name for host in inventory.groups['parallels_running'].get_hosts()) == ['rhel-9', 'windows-2016']
+    assert [host.name for host in inventory.groups['parallels_suspended'].get_hosts()] == ['ubuntu-22.04']
+    assert len(inventory.groups['parallels_host_localhost'].get_hosts()) == 4
+
+
+def test_remote_hosts_over_ssh(plugin):
+    """Check that remote hosts are queried over SSH and failures skipped."""
+    plugin.test_options['hosts'] = ['mac-01.example.com', 'unreachable']
+
+    inventory = _parse(plugin)
+
+    calls = sorted(plugin.calls_path.read_text().splitlines())
+    assert calls == [
+        '-o BatchMode=yes mac-01.example.com prlctl list --full --all --json',
+        '-o BatchMode=yes unreachable prlctl list --full --all --json',
+    ]
+    assert inventory.get_host('rhel-9').vars['parallels_host'] == 'mac-01.example.com'
+    assert 'parallels_host_unreachable' not in inventory.groups
+
+
+def test_strict_fails_on_unreachable_host(plugin):
+    """Check that strict mode turns a failed host into an error."""
+    plugin.test_options.update(hosts=['unreachable'], strict=True)
+
+    with pytest.raises(AnsibleParserError, match='Failed to list the VMs of unreachable'):
+        _parse(plugin)
+
+
+def test_inventory_cache(plugin):
+    """Check that cached listings spare the hosts from being queried."""
+    plugin.test_options['cache'] = True
+
+    _parse(plugin, cache=False)
+    assert _query_count(plugin) == 1
+
+    inventory = _parse(plugin, cache=True)
+    assert _query_count(plugin) == 1
+    assert len(inventory.hosts) == 4
+
+    # NOTE: An expired entry is dropped by the cache plugin.
+    plugin._cache.clear()  # noqa: WPS437
+    _parse(plugin, cache=True)
+    assert _query_count(plugin) == 2
+    assert json.loads(json.dumps(list(plugin._cache.values())))  # noqa: WPS437
+
+
+def test_keyed_groups(plugin):
+    """Check that constructed groups can use the Parallels hostvars."""
+    # NOTE: Options read from an inventory source are trusted templates.
+    plugin.test_options['keyed_groups'] = [
+        {'key': trust_as_template('parallels_status'), 'prefix': 'status'},
+    ]
+    plugin.test_options['groups'] = {
+        'linux': trust_as_template("parallels_name.startswith(('rhel', 'ubuntu'))"),
+    }
+
+    inventory = _parse(plugin)
+
+    assert [host.name for host in inventory.groups['status_stopped'].get_hosts()] == ['macOS-10.15']
+    assert sorted(host.name for host in inventory.groups['linux'].get_hosts()) == ['rhel-9', 'ubuntu-22.04']
@@ -0,0 +1,211 @@
+"""Unit tests for the instrumented command runner."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import errno
+import sys
+import time
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.module_utils.command_runner import CmdFailedError
+from ansible_collections.samdoran.macos.plugins.module_utils.command_runner import CmdTimeoutError
+from ansible_collections.samdoran.macos.plugins.module_utils.command_runner import COMMAND_STATS_ENV_VAR
+from ansible_collections.samdoran.macos.plugins.module_utils.command_runner import CommandRunner
+from ansible_collections.samdoran.macos.plugins.module_utils.command_runner import get_command_runner
+from ansible_collections.samdoran.macos.plugins.module_utils.command_runner import run_concurrently
+
+
+class _ModuleStub:
+    def debug(self, msg):  # type: (str) -> None
+        pass
+
+
+def _python_cmd(code):  # type: (str) -> tuple[str, ...]
+    return sys.executable, '-c', code
+
+
+@pytest.fixture
+def runner():  # type: () -> CommandRunner
+    """Return a runner bound to a stub module."""
+    return CommandRunner(_ModuleStub())
+
+
+def test_run_success(runner):
+    """Check the result mapping of a successful command."""
+    res = runner.run(_python_cmd('print("hello")'))
+
+    assert res['rc'] == 0
+    assert res['stdout'] == 'hello\n'
+    assert res['stderr'] == ''
+    assert res['duration'] >= 0
+    assert res['cmd_string'].endswith("""'print("hello")'""")
+
+
+def test_run_stdin_data(runner):
+    """Check that data is fed to the standard input."""
+    res = runner.run(
+        _python_cmd('import sys; sys.stdout.write(sys.stdin.read())'),
+        data='payload',
+    )
+
+    assert res['stdout'] == 'payload\n'
+
+
+def test_no_log_values_are_masked():
+    """Check that the module no_log values never leave the runner."""
+    module = _ModuleStub()
+    module.no_log_values = {'s3cr3t'}
+    runner = CommandRunner(module)
+
+    with pytest.raises(CmdFailedError) as exc_info:
+        runner.run(_python_cmd(
+            'import sys; print("token s3cr3t"); sys.stderr.write("bad s3cr3t"); sys.exit(1)  # s3cr3t',
+        ))
+
+    error_args = exc_info.value.error_args
+    rendered = repr((error_args, str(exc_info.value), runner.summary()))
+    assert 's3cr3t' not in rendered
+    assert error_args['stdout'] == 'token ********\n'
+    assert error_args['stderr'] == 'bad ********'
+
+
+def test_run_failure_raises(runner):
+    """Check that a non-zero return code raises a structured error."""
+    with pytest.raises(CmdFailedError) as exc_info:
+        runner.run(_python_cmd('import sys; sys.exit(3)'))
+
+    assert exc_info.value.error_args['rc'] == 3
+    assert str(exc_info.value).startswith('[rc=3] Running `')
+
+
+def test_run_failure_unchecked(runner):
+    """Check that ``check=False`` returns the failed result."""
+    res = runner.run(_python_cmd('import sys; sys.exit(3)'), check=False)
+
+    assert res['rc'] == 3
+
+
+def test_missing_executable(runner, tmp_path):
+    """Check that a command that cannot start fails like any other."""
+    missing = str(tmp_path / 'missing')
+
+    with pytest.raises(CmdFailedError) as exc_info:
+        runner.run([missing, '--help'])
+    res = runner.run([missing], check=False)
+
+    assert exc_info.value.error_args['rc'] == errno.ENOENT
+    assert 'No such file or directory' in exc_info.value.error_args['stderr']
+    assert (res['rc'], res['stdout']) == (errno.ENOENT, '')
+    assert runner.summary()['failed'] == 2
+
+
+def test_string_command_is_split(runner):
+    """Check that a string command is split instead of run by a shell."""
+    res = runner.run('{0} -c "import sys; print(sys.argv[1:])" "a b" $HOME'.format(sys.executable))
+
+    assert res['stdout'] == "['a b', '$HOME']\n"
+
+
+def test_run_timeout(runner):
+    """Check that a command exceeding its timeout is killed."""
+    started = time.time()
+    with pytest.raises(CmdTimeoutError) as exc_info:
+        runner.run(_python_cmd('import time; time.sleep(30)'), timeout=0.2)
+
+    assert time.time() - started < 10
+    assert isinstance(exc_info.value, CmdFailedError)
+    assert 'timed out' in str(exc_info.value)
+    assert runner.summary()['timed_out'] == 1
+
+
+def test_run_many_is_concurrent_and_ordered(runner):
+    """Check that a batch runs in parallel and keeps the input order."""
+    calls = [
+        {'cmd': _python_cmd('import time; time.sleep(0.5); print({0})'.format(idx))}
+        for idx in range(4)
+    ]
+
+    started = time.time()
+    results = runner.run_many(calls, max_workers=4)
+
+    assert time.time() - started < 1.5
+    assert [res['stdout'].strip() for res in results] == ['0', '1', '2', '3']
+
+
+def test_run_many_raises_first_failure(runner):
+    """Check that a failing batch member is reported after the batch."""
+    calls = [
+        {'cmd': _python_cmd('print(1)')},
+        {'cmd': _python_cmd('import sys; sys.exit(4)')},
+        {'cmd': _python_cmd('import sys; sys.exit(5)')},
+    ]
+
+    with pytest.raises(CmdFailedError) as exc_info:
+        runner.run_many(calls)
+
+    assert exc_info.value.error_args['rc'] == 4
+    assert runner.summary()['count'] == 3
+
+
+def test_run_concurrently_collects_exceptions():
+    """Check that exceptions are returned next to their items."""
+    def halve(number):  # type: (int) -> float
+        if number < 0:
+            raise ValueError(number)
+        return number / 2
+
+    outcomes = run_concurrently(halve, [2, -1, 4], max_workers=2)
+
+    assert outcomes[0] == (1, None)
+    assert outcomes[2] == (2, None)
+    assert outcomes[1][0] is None
+    assert isinstance(outcomes[1][1], ValueError)
+
+
+def test_run_concurrently_empty():
+    """Check that an empty batch needs no workers."""
+    assert run_concurrently(len, []) == []
+
+
+def test_summary(runner):
+    """Check the aggregated call statistics."""
+    runner.run(_python_cmd('pass'))
+    runner.run(_python_cmd('import sys; sys.exit(1)'), check=False)
+
+    summary = runner.summary()
+
+    assert summary['count'] == 2
+    assert summary['failed'] == 1
+    assert summary['timed_out'] == 0
+    assert summary['max_seconds'] <= summary['total_seconds']
+    assert [call['rc'] for call in summary['calls']] == [0, 1]
+
+
+@pytest.mark.parametrize(
+    ('env_value', 'expect_stats'),
+    (
+        pytest.param(None, False, id='unset'),
+        pytest.param('0', False, id='disabled'),
+        pytest.param('1', True, id='enabled'),
+        pytest.param('yes', True, id='enabled-word'),
+    ),
+)
+def test_annotate(runner, monkeypatch, env_value, expect_stats):
+    """Check that command stats are only reported when requested."""
+    if env_value is None:
+        monkeypatch.delenv(COMMAND_STATS_ENV_VAR, raising=False)
+    else:
+        monkeypatch.setenv(COMMAND_STATS_ENV_VAR, env_value)
+
+    result = runner.annotate({'changed': False})
+
+    assert ('command_stats' in result) is expect_stats
+
+
+def test_get_command_runner_is_cached():
+    """Check that a module gets a single runner."""
+    module = _ModuleStub()
+
+    assert get_command_runner(module) is get_command_runner(module)
@@ -0,0 +1,26 @@
+"""Unit tests for the shared Parallels CLI output parsing."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from ansible_collections.samdoran.macos.plugins.module_utils.parallels import count_running
+from ansible_collections.samdoran.macos.plugins.module_utils.parallels import get_vm_address
+from ansible_collections.samdoran.macos.plugins.module_utils.parallels import get_vm_uuid
+from ansible_collections.samdoran.macos.plugins.module_utils.parallels import parse_vm_list
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.parallels_corpus import VM_LIST_FIXTURE
+
+
+def test_parse_recorded_vm_list():
+    """Check the helpers against the recorded ``prlctl list`` output."""
+    with open(VM_LIST_FIXTURE) as fixture_file:
+        vm_list = parse_vm_list(fixture_file.read())
+
+    assert count_running(vm_list) == 2
+    assert get_vm_uuid(vm_list[0]) == 'c9eb5191-c85e-4758-bfe7-a983c79af343'
+    assert get_vm_address(vm_list[0]) == '10.111.77.22'
+    assert get_vm_address(vm_list[1]) is None
+
+
+def test_vm_without_address_field():
+    """Check that a VM listed without ``ip_configured`` has no address."""
+    assert get_vm_address({'name': 'bare', 'status': 'stopped'}) is None
@@ -0,0 +1,233 @@
+"""Unit tests for the Parallels facts collectors."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import importlib
+import json
+import sys
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.module_utils import parallels_facts
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules import parallels_corpus
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleStub
+
+
+FAKE_SDK_SOURCE = """
+import os
+
+_CALLS_LOG = os.path.join(os.path.dirname(__file__), 'calls.log')
+
+
+def _record(call):
+    with open(_CALLS_LOG, 'a') as calls_log:
+        calls_log.write(call + '\\n')
+
+
+def init_desktop_sdk():
+    _record('init')
+
+
+def deinit_sdk():
+    _record('deinit')
+
+
+class ApiHelper:
+    def get_version(self):
+        return {version!r}
+"""
+
+
+@pytest.fixture
+def fake_sdk(tmp_path, monkeypatch):
+    """Install a fake ``prlsdkapi`` package on :data:`sys.path`."""
+    sdk_dir = tmp_path / 'site-packages' / 'prlsdkapi'
+    sdk_dir.mkdir(parents=True)
+    (sdk_dir / '__init__.py').write_text(
+        FAKE_SDK_SOURCE.format(version='524288'),
+    )
+    monkeypatch.syspath_prepend(str(sdk_dir.parent))
+    monkeypatch.delitem(sys.modules, 'prlsdkapi', raising=False)
+    importlib.invalidate_caches()
+    yield sdk_dir
+    sys.modules.pop('prlsdkapi', None)
+
+
+def _empty_facts():  # type: () -> dict
+    return {'Version': {}, 'VMs': [], 'running_vm_count': 0}
+
+
+def _sdk_calls(sdk_dir):  # type: (...) -> list[str]
+    calls_log = sdk_dir / 'calls.log'
+    if not calls_log.exists():
+        return []
+    return calls_log.read_text().splitlines()
+
+
+def test_module_import_does_not_load_sdk(fake_sdk):
+    """Check that importing the module leaves ``prlsdkapi`` alone."""
+    assert 'prlsdkapi' not in sys.modules
+    assert parallels_facts.find_sdk_package() == str(fake_sdk)
+    assert 'prlsdkapi' not in sys.modules
+
+
+def test_sdk_version_without_sdk(monkeypatch, tmp_path):
+    """Check that a missing SDK results in an empty version."""
+    monkeypatch.setattr(parallels_facts, 'find_sdk_package', lambda: None)
+    cache_path = tmp_path / 'sdk.json'
+
+    assert parallels_facts.get_sdk_version(ModuleStub(), str(cache_path)) == ''
+    assert not cache_path.exists()
+
+
+def test_sdk_version_is_cached(fake_sdk, tmp_path):
+    """Check that the SDK is only initialized on a cache miss."""
+    cache_path = tmp_path / 'cache' / 'sdk.json'
+    module = ModuleStub()
+
+    assert parallels_facts.get_sdk_version(module, str(cache_path)) == '524288'
+    assert _sdk_calls(fake_sdk) == ['init', 'deinit']
+    assert json.loads(cache_path.read_text())['sdk_version'] == '524288'
+
+    sys.modules.pop('prlsdkapi', None)
+    assert parallels_facts.get_sdk_version(module, str(cache_path)) == '524288'
+    assert _sdk_calls(fake_sdk) == ['init', 'deinit']
+    assert 'prlsdkapi' not in sys.modules
+    assert not module.warnings
+
+
+def test_sdk_version_cache_not_written_in_check_mode(fake_sdk, tmp_path):
+    """Check that check mode queries the SDK without creating the cache."""
+    cache_path = tmp_path / 'cache' / 'sdk.json'
+    module = ModuleStub()
+    module.check_mode = True
+
+    assert parallels_facts.get_sdk_version(module, str(cache_path)) == '524288'
+    assert _sdk_calls(fake_sdk) == ['init', 'deinit']
+    assert not cache_path.parent.exists()
+
+
+def test_sdk_version_cache_invalidated_by_fingerprint(fake_sdk, tmp_path):
+    """Check that changing the SDK files forces a fresh version query."""
+    cache_path = tmp_path / 'sdk.json'
+    parallels_facts.get_sdk_version(ModuleStub(), str(cache_path))
+
+    (fake_sdk / '__init__.py').write_text(
+        FAKE_SDK_SOURCE.format(version='524289') + '\n# upgraded\n',
+    )
+    sys.modules.pop('prlsdkapi', None)
+    importlib.invalidate_caches()
+
+    assert parallels_facts.get_sdk_version(ModuleStub(), str(cache_path)) == '524289'
+    assert _sdk_calls(fake_sdk) == ['init', 'deinit', 'init', 'deinit']
+
+
+def test_sdk_version_cache_disabled(fake_sdk):
+    """Check that an empty cache path always queries the SDK."""
+    assert parallels_facts.get_sdk_version(ModuleStub(), '') == '524288'
+    assert parallels_facts.get_sdk_version(ModuleStub(), '') == '524288'
+    assert _sdk_calls(fake_sdk) == ['init', 'deinit'] * 2
+
+
+def test_sdk_version_cache_unwritable(fake_sdk, tmp_path):
+    """Check that a cache write failure is only a warning."""
+    blocker = tmp_path / 'not-a-dir'
+    blocker.write_text('')
+    module = ModuleStub()
+
+    version = parallels_facts.get_sdk_version(
+        module, str(blocker / 'sdk.json'),
+    )
+
+    assert version == '524288'
+    assert len(module.warnings) == 1
+
+
+def test_server_info_parsing(stub_bin_dir):
+    """Check the ``prlsrvctl info`` payload post-processing."""
+    parallels_corpus.install_parallels_stubs(stub_bin_dir)
+    module = ModuleStub()
+    facts = _empty_facts()
+
+    parallels_facts.get_server_info(module, facts)
+
+    assert facts['Version'] == {
+        'Edition': 'Desktop',
+        'Full': '16.0.0-48916',
+        'Major': '16',
+        'MajorMinor': '16.0.0',
+        'Release': '48916',
+    }
+    assert facts['Started_as_service'] == 'on'
+    assert facts['License']['state'] == 'valid'
+    assert not any(' ' in fact_name for fact_name in facts)
+    assert not module.warnings
+
+
+@pytest.mark.parametrize(
+    ('vm_list_fixture', 'expected_vm_count', 'expected_running_count'),
+    (
+        pytest.param(parallels_corpus.VM_LIST_FIXTURE, 4, 2, id='recorded'),
+        pytest.param(parallels_corpus.EMPTY_VM_LIST_FIXTURE, 0, 0, id='empty'),
+    ),
+)
+def test_vm_info_parsing(
+        stub_bin_dir,  # noqa: WPS318
+        vm_list_fixture,
+        expected_vm_count,
+        expected_running_count,
+):
+    """Check the ``prlctl list`` payload post-processing."""
+    parallels_corpus.install_parallels_stubs(
+        stub_bin_dir, vm_list=vm_list_fixture,
+    )
+    facts = _empty_facts()
+
+    parallels_facts.get_vm_info(ModuleStub(), facts)
+
+    assert len(facts['VMs']) == expected_vm_count
+    assert facts['running_vm_count'] == expected_running_count
+
+
+def test_vm_info_fleet_scale(stub_bin_dir, tmp_path):
+    """Check the VM collector against a synthetic 1,000 VM host."""
+    vm_list = parallels_corpus.write_vm_list(tmp_path / 'vms.json', 1000)
+    parallels_corpus.install_parallels_stubs(stub_bin_dir, vm_list=vm_list)
+    facts = _empty_facts()
+
+    parallels_facts.get_vm_info(ModuleStub(), facts)
+
+    assert len(facts['VMs']) == 1000
+    assert facts['running_vm_count'] == 600
+    assert len({vm['uuid'] for vm in facts['VMs']}) == 1000
+
+
+def test_collectors_warn_on_failure(stub_bin_dir):
+    """Check that failing Parallels CLIs produce warnings, not errors."""
+    parallels_corpus.install_parallels_stubs(
+        stub_bin_dir, server_info_rc=1, vm_list_rc=1,
+    )
+    module = ModuleStub()
+    facts = _empty_facts()
+
+    parallels_facts.get_server_info(module, facts)
+    parallels_facts.get_vm_info(module, facts)
+
+    assert facts == _empty_facts()
+    assert module.warnings == [
+        'Failed to gather Parallels facts',
+        'Failed to gather Parallels virtual machine facts',
+    ]
+
+
+def test_collectors_without_parallels(stub_bin_dir):
+    """Check that hosts without Parallels keep the default facts."""
+    module = ModuleStub()
+    facts = _empty_facts()
+
+    parallels_facts.get_server_info(module, facts)
+    parallels_facts.get_vm_info(module, facts)
+
+    assert facts == _empty_facts()
+    assert not module.warnings
@@ -0,0 +1,76 @@
+"""Unit tests for the opt-in module profiling hook."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import pstats
+import sys
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.module_utils.profiling import PROFILE_DIR_ENV_VAR
+from ansible_collections.samdoran.macos.plugins.module_utils.profiling import PROFILE_TOP_ENV_VAR
+from ansible_collections.samdoran.macos.plugins.module_utils.profiling import profile_entrypoint
+
+
+def _busy_entrypoint(exit_code=None):  # type: (int | None) -> int
+    squares = [number * number for number in range(10000)]
+    if exit_code is not None:
+        sys.exit(exit_code)
+    return len(squares)
+
+
+def test_disabled_profiling_is_transparent(monkeypatch, tmp_path):
+    """Check that nothing gets profiled without the environment variable."""
+    monkeypatch.delenv(PROFILE_DIR_ENV_VAR, raising=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delitem(sys.modules, 'cProfile', raising=False)
+
+    assert profile_entrypoint('probe')(_busy_entrypoint)() == 10000
+    assert 'cProfile' not in sys.modules
+    assert not list(tmp_path.iterdir())
+
+
+def test_profile_reports_written(monkeypatch, tmp_path):
+    """Check that enabled profiling leaves stats and a summary."""
+    profile_dir = tmp_path / 'profiles'
+    monkeypatch.setenv(PROFILE_DIR_ENV_VAR, str(profile_dir))
+    monkeypatch.setenv(PROFILE_TOP_ENV_VAR, '5')
+
+    assert profile_entrypoint('probe')(_busy_entrypoint)() == 10000
+
+    pstats_files = list(profile_dir.glob('probe-*.pstats'))
+    summary_files = list(profile_dir.glob('probe-*.txt'))
+    assert len(pstats_files) == 1
+    assert len(summary_files) == 1
+
+    stats = pstats.Stats(str(pstats_files[0]))
+    assert any(
+        func_name == '_busy_entrypoint'
+        for _file, _line, func_name in stats.stats  # noqa: WPS361
+    )
+
+    summary = summary_files[0].read_text()
+    assert summary.startswith('Wall time: ')
+    assert 'Peak traced memory: ' in summary
+    assert 'Top 5 allocation sites:' in summary
+
+
+def test_profile_written_on_module_exit(monkeypatch, tmp_path):
+    """Check that ``exit_json()``-style exits still produce reports."""
+    monkeypatch.setenv(PROFILE_DIR_ENV_VAR, str(tmp_path))
+
+    with pytest.raises(SystemExit):
+        profile_entrypoint('probe')(_busy_entrypoint)(exit_code=0)
+
+    assert len(list(tmp_path.glob('probe-*.pstats'))) == 1
+
+
+def test_profile_write_failure_is_not_fatal(monkeypatch, tmp_path, capsys):
+    """Check that an unusable profile directory only logs to stderr."""
+    blocker = tmp_path / 'not-a-dir'
+    blocker.write_text('')
+    monkeypatch.setenv(PROFILE_DIR_ENV_VAR, str(blocker / 'profiles'))
+
+    assert profile_entrypoint('probe')(_busy_entrypoint)() == 10000
+    assert 'Failed to write the profile of probe' in capsys.readouterr().err
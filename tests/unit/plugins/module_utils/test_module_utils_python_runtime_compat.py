@@ -9,7 +9,9 @@ import sys
 
 import pytest
 
+from ansible_collections.samdoran.macos.plugins.module_utils import python_runtime_compat
 from ansible_collections.samdoran.macos.plugins.module_utils.python_runtime_compat import get_signal_name
+from ansible_collections.samdoran.macos.plugins.module_utils.python_runtime_compat import raise_from
 from ansible_collections.samdoran.macos.plugins.module_utils.python_runtime_compat import shlex_join
 from ansible_collections.samdoran.macos.plugins.module_utils.python_runtime_compat import TimeoutError
 
@@ -52,3 +54,56 @@ def test_timeout_error_errno():
 def test_get_signal_name():  # type: () -> None
     """Verify :py:func:`get_signal_name`'s advertised behavior."""
     assert 'SIGSEGV' == get_signal_name(signal.SIGSEGV)
+
+
+def test_get_signal_name_accepts_enum_and_int():  # type: () -> None
+    """Check that plain integers resolve like the signal constants."""
+    assert get_signal_name(int(signal.SIGKILL)) == 'SIGKILL'
+    assert get_signal_name(signal.SIGTERM) == 'SIGTERM'
+
+
+def test_get_signal_name_unknown():  # type: () -> None
+    """Check that unknown signals raise :exc:`LookupError`."""
+    with pytest.raises(LookupError):
+        get_signal_name(-1)
+
+
+def test_get_signal_name_table_built_once(monkeypatch):  # type: (...) -> None
+    """Check that the signal name table is computed a single time."""
+    monkeypatch.setattr(python_runtime_compat, '_SIGNAL_NAMES', {})
+    build_calls = []
+    build_signal_names = python_runtime_compat._build_signal_names
+
+    def counting_build():  # type: () -> dict[int, str]
+        build_calls.append(None)
+        return build_signal_names()
+
+    monkeypatch.setattr(
+        python_runtime_compat, '_build_signal_names', counting_build,
+    )
+
+    assert get_signal_name(signal.SIGINT) == 'SIGINT'
+    assert get_signal_name(signal.SIGSEGV) == 'SIGSEGV'
+    assert len(build_calls) == 1
+
+
+def test_raise_from_chains_cause():  # type: () -> None
+    """Verify :py:func:`raise_from` matches ``raise ... from ...``."""
+    original_exc = KeyError('original')
+
+    with pytest.raises(LookupError) as exc_info:
+        try:
+            raise original_exc
+        except KeyError as key_err:
+            raise_from(LookupError('wrapped'), key_err)
+
+    assert exc_info.value.__cause__ is original_exc
+    assert exc_info.value.__suppress_context__
+
+
+def test_raise_from_instantiates_classes():  # type: () -> None
+    """Check that an exception class is instantiated before raising."""
+    with pytest.raises(LookupError) as exc_info:
+        raise_from(LookupError, StopIteration())
+
+    assert isinstance(exc_info.value.__cause__, StopIteration)
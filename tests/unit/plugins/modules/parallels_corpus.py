@@ -0,0 +1,99 @@
+"""Recorded-style Parallels CLI outputs and stub binaries serving them.
+
+The static fixtures under ``fixtures/parallels/`` mimic what
+``prlsrvctl info --json`` and ``prlctl list --full --all --json`` print on
+a real host. Fleet-scale VM listings are generated deterministically by
+:func:`generate_vm_list` instead of being committed.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import uuid
+
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'parallels',
+)
+
+SERVER_INFO_FIXTURE = os.path.join(FIXTURES_DIR, 'prlsrvctl_info.json')
+VM_LIST_FIXTURE = os.path.join(FIXTURES_DIR, 'prlctl_list.json')
+EMPTY_VM_LIST_FIXTURE = os.path.join(FIXTURES_DIR, 'prlctl_list_empty.json')
+
+# NOTE: Ratios are roughly what a busy CI host looks like.
+_VM_STATUS_CYCLE = ('running',) * 6 + ('stopped',) * 3 + ('suspended',)
+
+STATIC_RESPONSE_STUB_SOURCE = """
+import sys
+
+RESPONSES = {responses!r}
+
+key = ' '.join(sys.argv[1:])
+if key not in RESPONSES:
+    sys.stderr.write('stub: unexpected arguments: %s\\n' % key)
+    sys.exit(2)
+
+rc, output_path = RESPONSES[key]
+if output_path:
+    with open(output_path) as output_file:
+        sys.stdout.write(output_file.read())
+sys.exit(rc)
+"""
+
+
+def generate_vm_list(vm_count):  # type: (int) -> list[dict[str, str]]
+    """Return a deterministic ``prlctl list --full --all --json`` payload."""
+    vm_list = []
+    for vm_index in range(vm_count):
+        status = _VM_STATUS_CYCLE[vm_index % len(_VM_STATUS_CYCLE)]
+        ip_configured = '-'
+        if status == 'running':
+            ip_configured = '10.{hi}.{mid}.{lo}'.format(
+                hi=vm_index // 65536 % 256,
+                mid=vm_index // 256 % 256,
+                lo=vm_index % 256,
+            )
+        vm_list.append({
+            'uuid': '{{{uuid}}}'.format(
+                uuid=uuid.UUID(int=vm_index + 1, version=4),
+            ),
+            'status': status,
+            'ip_configured': ip_configured,
+            'name': 'ci-guest-{index:04d}'.format(index=vm_index),
+        })
+    return vm_list
+
+
+def write_vm_list(path, vm_count):  # type: (str, int) -> str
+    """Write a generated VM listing of *vm_count* guests to *path*."""
+    with open(str(path), 'w') as vm_list_file:
+        json.dump(generate_vm_list(vm_count), vm_list_file, indent=2)
+    return str(path)
+
+
+def install_parallels_stubs(
+        bin_dir,  # noqa: WPS318
+        server_info=SERVER_INFO_FIXTURE,
+        vm_list=VM_LIST_FIXTURE,
+        server_info_rc=0,
+        vm_list_rc=0,
+):
+    """Put ``prlsrvctl`` and ``prlctl`` stubs serving fixtures in *bin_dir*."""
+    write_stub_command(
+        bin_dir,
+        'prlsrvctl',
+        STATIC_RESPONSE_STUB_SOURCE.format(responses={
+            'info --json': (server_info_rc, str(server_info)),
+        }),
+    )
+    write_stub_command(
+        bin_dir,
+        'prlctl',
+        STATIC_RESPONSE_STUB_SOURCE.format(responses={
+            'list --full --all --json': (vm_list_rc, str(vm_list)),
+        }),
+    )
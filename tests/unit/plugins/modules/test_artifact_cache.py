@@ -0,0 +1,263 @@
+"""Unit tests for the content-addressed artifact cache module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import json
+import os
+import re
+import stat
+import threading
+
+import pytest
+
+from ansible.module_utils.six.moves import BaseHTTPServer
+
+from ansible_collections.samdoran.macos.plugins.modules import artifact_cache
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+
+
+ARTIFACT = bytes(bytearray(range(256))) * 4096  # 1 MiB
+ARTIFACT_SHA256 = hashlib.sha256(ARTIFACT).hexdigest()
+RANGE_RE = re.compile(r'^bytes=(\d+)-$')
+
+
+class ArtifactHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serve artifacts with range support, optionally dropping connections."""
+
+    def do_GET(self):  # noqa: N802
+        server = self.server
+        server.requests.append({'path': self.path, 'range': self.headers.get('Range')})
+        body = server.artifacts.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+
+        start = 0
+        range_match = RANGE_RE.match(self.headers.get('Range') or '')
+        if range_match and server.honor_ranges:
+            start = int(range_match.group(1))
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{0}'.format(len(body)))
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(start, len(body) - 1, len(body)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.send_header('ETag', '"artifact"')
+        self.end_headers()
+
+        payload = body[start:]
+        if server.drop_after:
+            # NOTE: Simulates a connection lost mid-transfer.
+            payload = payload[:server.drop_after.pop(0)]
+            self.close_connection = True
+        self.wfile.write(payload)
+
+    def log_message(self, *args):  # noqa: WPS110
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def http_server(monkeypatch):
+    for proxy_var in ('http_proxy', 'HTTP_PROXY', 'no_proxy', 'NO_PROXY'):
+        monkeypatch.delenv(proxy_var, raising=False)
+
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), ArtifactHandler)
+    server.artifacts = {'/installer.dmg': ARTIFACT}
+    server.requests = []
+    server.drop_after = []
+    server.honor_ranges = True
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    server.url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache_args(http_server, tmp_path):  # type: (...) -> dict
+    return {
+        'url': http_server.url + '/installer.dmg',
+        'cache_dir': str(tmp_path / 'cache'),
+        'retries': 0,
+    }
+
+
+def _read(path):  # type: (str) -> bytes
+    with open(path, 'rb') as artifact_file:
+        return artifact_file.read()
+
+
+def test_download_and_cache_hit(monkeypatch, http_server, cache_args, tmp_path):
+    """Check that a cached artifact is not downloaded again."""
+    cache_args['dest'] = str(tmp_path / 'ParallelsDesktop.dmg')
+
+    first = run_module(monkeypatch, artifact_cache.main, cache_args)
+    second = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert first['changed'] and not first['cache_hit']
+    assert first['checksum'] == 'sha256:' + ARTIFACT_SHA256
+    assert first['path'].endswith(os.path.join('objects', 'sha256', ARTIFACT_SHA256))
+    assert first['downloaded_bytes'] == len(ARTIFACT)
+    assert _read(cache_args['dest']) == ARTIFACT
+
+    assert not second['changed'] and second['cache_hit']
+    assert second['downloaded_bytes'] == 0
+    assert len(http_server.requests) == 1
+
+
+def test_file_attributes_apply_to_cached_artifact(monkeypatch, http_server, cache_args, tmp_path):
+    """Check that the mode is set on the artifact dest links to."""
+    cache_args.update(dest=str(tmp_path / 'ParallelsDesktop.dmg'), mode='0600')
+
+    first = run_module(monkeypatch, artifact_cache.main, cache_args)
+    second = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert stat.S_IMODE(os.stat(first['path']).st_mode) == 0o600
+    assert os.path.islink(cache_args['dest'])
+    assert first['changed'] and not second['changed']
+
+
+def test_known_checksum_skips_network(monkeypatch, http_server, cache_args):
+    """Check that a known checksum is served from the cache by digest."""
+    run_module(monkeypatch, artifact_cache.main, cache_args)
+    cache_args['url'] = http_server.url + '/mirror/installer.dmg'
+    cache_args['checksum'] = 'sha256:' + ARTIFACT_SHA256.upper()
+
+    result = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert result['cache_hit']
+    assert len(http_server.requests) == 1
+
+
+def test_interrupted_transfer_resumes(monkeypatch, http_server, cache_args):
+    """Check that a dropped transfer is resumed with a range request."""
+    http_server.drop_after = [300000, 200000]
+    cache_args['retries'] = 1
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, artifact_cache.main, cache_args)
+    assert 'next run resumes' in exc_info.value.result['msg']
+    assert exc_info.value.result['downloaded_bytes'] == 500000
+
+    result = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert result['checksum'] == 'sha256:' + ARTIFACT_SHA256
+    assert result['resumed_from'] == 500000
+    assert result['downloaded_bytes'] == len(ARTIFACT) - 500000
+    assert [request['range'] for request in http_server.requests] == [
+        None, 'bytes=300000-', 'bytes=500000-',
+    ]
+    assert _read(result['path']) == ARTIFACT
+    assert os.listdir(os.path.join(cache_args['cache_dir'], 'partial')) == []
+
+
+def test_ignored_range_restarts_transfer(monkeypatch, http_server, cache_args):
+    """Check that a server ignoring ranges gets the artifact rehashed."""
+    http_server.drop_after = [300000]
+    http_server.honor_ranges = False
+    cache_args['retries'] = 1
+
+    result = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert result['checksum'] == 'sha256:' + ARTIFACT_SHA256
+    assert _read(result['path']) == ARTIFACT
+
+
+def _write_partial(cache_args, content):  # type: (dict, bytes) -> None
+    partial_path = artifact_cache.ArtifactCache(cache_args['cache_dir']).partial_path(cache_args['url'])
+    os.makedirs(os.path.dirname(partial_path))
+    with open(partial_path, 'wb') as partial_file:
+        partial_file.write(content)
+
+
+def test_complete_partial_is_not_downloaded_again(monkeypatch, http_server, cache_args):
+    """Check that a partial file as large as the artifact is taken as complete."""
+    _write_partial(cache_args, ARTIFACT)
+
+    result = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert result['checksum'] == 'sha256:' + ARTIFACT_SHA256
+    assert result['downloaded_bytes'] == 0
+    assert [request['range'] for request in http_server.requests] == ['bytes={0}-'.format(len(ARTIFACT))]
+
+
+def test_oversized_partial_is_refetched(monkeypatch, http_server, cache_args):
+    """Check that a partial file larger than the artifact is discarded."""
+    _write_partial(cache_args, ARTIFACT + b'stale')
+
+    result = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert result['checksum'] == 'sha256:' + ARTIFACT_SHA256
+    assert result['downloaded_bytes'] == len(ARTIFACT)
+    assert [request['range'] for request in http_server.requests] == [
+        'bytes={0}-'.format(len(ARTIFACT) + 5), None,
+    ]
+    assert _read(result['path']) == ARTIFACT
+
+
+def test_checksum_mismatch_discards_download(monkeypatch, cache_args):
+    """Check that a corrupt download is neither kept nor resumed."""
+    cache_args['checksum'] = 'sha256:' + '0' * 64
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert 'does not match' in exc_info.value.result['msg']
+    assert os.listdir(os.path.join(cache_args['cache_dir'], 'partial')) == []
+
+
+def test_lru_eviction(monkeypatch, http_server, cache_args):
+    """Check that the least recently used artifacts are evicted first."""
+    for name in ('a', 'b', 'c'):
+        http_server.artifacts['/{0}.pkg'.format(name)] = name.encode() * len(ARTIFACT)
+    cache_args['max_size'] = str(3 * len(ARTIFACT))
+
+    for name in ('a', 'b', 'c'):
+        run_module(monkeypatch, artifact_cache.main, dict(cache_args, url=http_server.url + '/{0}.pkg'.format(name)))
+    run_module(monkeypatch, artifact_cache.main, dict(cache_args, url=http_server.url + '/a.pkg'))
+    result = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    evicted_digest = hashlib.sha256(b'b' * len(ARTIFACT)).hexdigest()
+    assert result['evicted'] == ['sha256/' + evicted_digest]
+    assert result['changed']
+
+    with open(os.path.join(cache_args['cache_dir'], 'index.json')) as index_file:
+        index = json.load(index_file)
+    assert len(index['entries']) == 3
+    assert http_server.url + '/b.pkg' not in index['urls']
+
+
+def test_check_mode_reports_download(monkeypatch, http_server, cache_args):
+    """Check that check mode reports a needed download without fetching."""
+    cache_args['_ansible_check_mode'] = True
+
+    result = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert result['changed']
+    assert not result['cache_hit']
+    assert http_server.requests == []
+
+
+@pytest.mark.parametrize('existing_cache', (False, True))
+def test_check_mode_reports_dest(monkeypatch, http_server, cache_args, tmp_path, existing_cache):
+    """Check that check mode returns the would-be symlink on a cache miss."""
+    if existing_cache:
+        os.makedirs(cache_args['cache_dir'])
+    cache_args.update(dest=str(tmp_path / 'python.pkg'), _ansible_check_mode=True)
+
+    result = run_module(monkeypatch, artifact_cache.main, cache_args)
+
+    assert result['changed'] and not result['cache_hit']
+    assert (result['url'], result['dest']) == (cache_args['url'], cache_args['dest'])
+    assert 'path' not in result
+    assert not os.path.lexists(cache_args['dest'])
+    assert os.path.isdir(cache_args['cache_dir']) is existing_cache
@@ -0,0 +1,220 @@
+"""Unit tests for the CA file bootstrapping module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import base64
+import collections
+import json
+import os
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import bootstrap_certs
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+TRUST_SETTINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'trust_settings')
+ADMIN_TRUST_SETTINGS = os.path.join(TRUST_SETTINGS_DIR, 'admin.plist')
+SYSTEM_TRUST_SETTINGS = os.path.join(TRUST_SETTINGS_DIR, 'system.plist')
+
+SYSTEM_KEYCHAIN = '/Library/Keychains/System.keychain'
+
+SECURITY_STUB_SOURCE = """
+import json
+import shutil
+import sys
+
+STATE = json.loads({state!r})
+
+args = sys.argv[1:]
+if args[0] == 'find-certificate':
+    sys.stdout.write('\\n'.join(STATE['keychains'][args[-1]]))
+elif args[0] == 'trust-settings-export':
+    export = STATE['trust_settings'].get(args[1])
+    if export is None:
+        sys.stderr.write('SecTrustSettingsCreateExternalRepresentation: No Trust Settings were found.\\n')
+        sys.exit(1)
+    shutil.copy(export, args[2])
+"""
+
+# NOTE: Certificates whose body decodes to something containing
+# NOTE: "expired" or "unreadable" fail `openssl x509 -checkend 0`.
+# NOTE: `openssl verify` reports the expired ones, cannot load the
+# NOTE: unreadable ones and rejects the "notyet" ones for another reason.
+OPENSSL_STUB_SOURCE = """
+import base64
+import re
+import sys
+
+def decode(cert):
+    return base64.b64decode(re.sub(r'-----[A-Z ]+-----|\\\\s', '', cert))
+
+args = sys.argv[1:]
+with open({calls_path!r}, 'a') as calls_file:
+    calls_file.write(args[0] + '\\n')
+if args[0] == 'x509':
+    sys.exit(1 if re.search(b'expired|unreadable', decode(sys.stdin.read())) else 0)
+
+failed = False
+for cert_file in args[args.index('-partial_chain') + 1:]:
+    with open(cert_file) as cert:
+        body = decode(cert.read())
+    if b'unreadable' in body:
+        sys.stderr.write('Could not read certificate file from ' + cert_file + '\\n')
+        failed = True
+    elif b'expired' in body or b'notyet' in body:
+        code = 10 if b'expired' in body else 9
+        sys.stderr.write('CN = cert\\nerror %d at 0 depth lookup: certificate error\\n' % code)
+        sys.stderr.write('error ' + cert_file + ': verification failed\\n')
+        failed = True
+    else:
+        print(cert_file + ': OK')
+sys.exit(2 if failed else 0)
+"""
+
+
+def _fake_cert(name):  # type: (str) -> str
+    body = base64.b64encode('fake-cert-{0}'.format(name).encode()).decode()
+    return '-----BEGIN CERTIFICATE-----\n{0}\n-----END CERTIFICATE-----'.format(body)
+
+
+@pytest.fixture
+def keychains(stub_bin_dir, tmp_path, monkeypatch):
+    """Install ``security`` and ``openssl`` stubs and return the certs they serve."""
+    certs = {
+        bootstrap_certs.SYSTEM_ROOTS_KEYCHAIN: [
+            _fake_cert(name) for name in (
+                'apple-root', 'distrusted-root', 'codesigning-root', 'overridden-root', 'expired-root',
+            )
+        ],
+        SYSTEM_KEYCHAIN: [_fake_cert(name) for name in ('ssl-root', 'corp-root', 'unlisted-admin')],
+    }
+    state = {
+        'keychains': certs,
+        'trust_settings': {'-d': ADMIN_TRUST_SETTINGS, '-s': SYSTEM_TRUST_SETTINGS},
+    }
+    write_stub_command(stub_bin_dir, 'security', SECURITY_STUB_SOURCE.format(state=json.dumps(state)))
+    calls_path = tmp_path / 'openssl-calls'
+    calls_path.write_text('')
+    write_stub_command(stub_bin_dir, 'openssl', OPENSSL_STUB_SOURCE.format(calls_path=str(calls_path)))
+
+    cafile = tmp_path / 'cert.pem'
+    verify_paths = collections.namedtuple('DefaultVerifyPaths', 'openssl_cafile')(str(cafile))
+    monkeypatch.setattr(bootstrap_certs.ssl, 'get_default_verify_paths', lambda: verify_paths)
+    return certs
+
+
+def test_parse_trust_settings():
+    """Check that an exported trust settings plist is indexed by fingerprint."""
+    with open(SYSTEM_TRUST_SETTINGS, 'rb') as export_file:
+        trust_index = bootstrap_certs.parse_trust_settings(export_file.read())
+
+    assert sorted(trust_index) == [
+        '1DEED087EB0018E344A42CDA78EAEF9945C52BB7',
+        '7CECB08FFD9173E366E369B400AF852A79D67332',
+    ]
+    assert trust_index['7CECB08FFD9173E366E369B400AF852A79D67332'][0]['kSecTrustSettingsResult'] == 3
+
+
+@pytest.mark.parametrize(('settings', 'expected'), (
+    ([], True),
+    ([{'kSecTrustSettingsResult': 3}], False),
+    ([{'kSecTrustSettingsPolicy': bootstrap_certs.SSL_POLICY_OID, 'kSecTrustSettingsResult': 2}], True),
+    ([{'kSecTrustSettingsPolicyName': 'CodeSigning', 'kSecTrustSettingsPolicy': b'\x2a', 'kSecTrustSettingsResult': 1}], None),
+    ([{'kSecTrustSettingsPolicyString': 'intranet.example.com', 'kSecTrustSettingsResult': 1}], None),
+    ([{'kSecTrustSettingsResult': 4}, {'kSecTrustSettingsPolicyName': 'sslServer'}], True),
+))
+def test_get_ssl_trust(settings, expected):
+    """Check how trust settings are evaluated for the SSL policy."""
+    assert bootstrap_certs.get_ssl_trust(settings) is expected
+
+
+def test_keep_only_certs_trusted_for_ssl(monkeypatch, tmp_path, keychains):
+    """Check that the CA file only gets the certs trusted for SSL."""
+    result = run_module(monkeypatch, bootstrap_certs.main, {
+        'keychains': [bootstrap_certs.SYSTEM_ROOTS_KEYCHAIN, SYSTEM_KEYCHAIN],
+    })
+
+    assert result['changed']
+    assert result['cert_counts'] == {'found': 8, 'untrusted': 4, 'invalid': 1, 'written': 3}
+    assert (tmp_path / 'cert.pem').read_text() == ''.join(
+        _fake_cert(name) + '\n' for name in ('apple-root', 'ssl-root', 'corp-root')
+    )
+
+
+def test_trust_settings_can_be_ignored(monkeypatch, keychains):
+    """Check that disabling the filter keeps every valid cert."""
+    result = run_module(monkeypatch, bootstrap_certs.main, {
+        'keychains': [bootstrap_certs.SYSTEM_ROOTS_KEYCHAIN, SYSTEM_KEYCHAIN],
+        'trust_settings': False,
+    })
+
+    assert result['cert_counts'] == {'found': 8, 'untrusted': 0, 'invalid': 1, 'written': 7}
+
+
+def test_missing_admin_trust_settings(monkeypatch, stub_bin_dir, keychains):
+    """Check that a domain without trust settings is not an error."""
+    state = {
+        'keychains': keychains,
+        'trust_settings': {'-s': SYSTEM_TRUST_SETTINGS},
+    }
+    write_stub_command(stub_bin_dir, 'security', SECURITY_STUB_SOURCE.format(state=json.dumps(state)))
+
+    result = run_module(monkeypatch, bootstrap_certs.main, {})
+
+    assert result['cert_counts'] == {'found': 5, 'untrusted': 2, 'invalid': 1, 'written': 2}
+
+
+@pytest.mark.parametrize(('stdout', 'stderr'), (
+    (
+        'cert-0000.pem: OK\ncert-0003.pem: OK\n',
+        'CN = old\nerror 10 at 0 depth lookup: certificate has expired\n'
+        'error cert-0001.pem: verification failed\n'
+        'Could not read certificate file from cert-0004.pem\n'
+        'CN = intermediate\nerror 10 at 1 depth lookup: certificate has expired\n'
+        'error cert-0002.pem: verification failed\n',
+    ),
+    (
+        'cert-0000.pem: OK\n'
+        'cert-0001.pem: /CN=old\nerror 10 at 0 depth lookup:certificate has expired\n'
+        'cert-0002.pem: /CN=intermediate\nerror 10 at 1 depth lookup:certificate has expired\n'
+        'cert-0003.pem: OK\n',
+        'unable to load certificate\n',
+    ),
+))
+def test_parse_verify_output(stdout, stderr):
+    """Check that OpenSSL and LibreSSL verdicts are mapped to each cert."""
+    assert bootstrap_certs.parse_verify_output(stdout, stderr) == {
+        'cert-0000.pem': True,
+        'cert-0001.pem': False,
+        'cert-0002.pem': None,
+        'cert-0003.pem': True,
+    }
+
+
+def test_batched_validation(monkeypatch, stub_bin_dir, tmp_path, keychains):
+    """Check that batches give the same CA file, rechecking undecided certs on their own."""
+    keychains[SYSTEM_KEYCHAIN].extend(_fake_cert(name) for name in ('notyet-root', 'unreadable-root'))
+    state = {'keychains': keychains, 'trust_settings': {}}
+    write_stub_command(stub_bin_dir, 'security', SECURITY_STUB_SOURCE.format(state=json.dumps(state)))
+    monkeypatch.setattr(bootstrap_certs, 'OPENSSL_MAX_WORKERS', 3)
+
+    results = {}
+    for validation in ('batched', 'per_cert'):
+        results[validation] = run_module(monkeypatch, bootstrap_certs.main, {
+            'keychains': [bootstrap_certs.SYSTEM_ROOTS_KEYCHAIN, SYSTEM_KEYCHAIN],
+            'trust_settings': False,
+            'validation': validation,
+        })
+        results[validation]['calls'] = (tmp_path / 'openssl-calls').read_text().split()
+        (tmp_path / 'openssl-calls').write_text('')
+
+    batched, per_cert = results['batched'], results['per_cert']
+    assert batched['changed'] and not per_cert['changed']
+    assert batched['cert_counts'] == {'found': 10, 'untrusted': 0, 'invalid': 2, 'written': 8, 'rechecked': 2}
+    assert 'rechecked' not in per_cert['cert_counts']
+    assert batched['calls'] == ['verify'] * 3 + ['x509'] * 2
+    assert per_cert['calls'] == ['x509'] * 10
+    assert (tmp_path / 'cert.pem').read_text().endswith(_fake_cert('notyet-root') + '\n')
@@ -0,0 +1,229 @@
+"""Unit tests for the bulk Homebrew reconciliation module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import homebrew_reconcile
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+BREW_STUB_SOURCE = """
+import json
+import sys
+
+STATE_PATH = {state_path!r}
+
+with open(STATE_PATH) as state_file:
+    state = json.load(state_file)
+state['calls'].append(sys.argv[1:])
+
+args = sys.argv[1:]
+command = args.pop(0)
+kind = 'formulae'
+if '--cask' in args:
+    args.remove('--cask')
+    kind = 'casks'
+names = [arg for arg in args if not arg.startswith('--')]
+rc = 0
+
+if command == 'update' and 'update' in state['broken']:
+    sys.stderr.write('Error: Fetching /opt/homebrew failed!\\n')
+    rc = 1
+elif command == 'info':
+    print(json.dumps({{
+        'formulae': [
+            dict(name=name, full_name=name, **formula)
+            for name, formula in state['formulae'].items()
+        ],
+        'casks': [
+            dict(token=token, full_token=token, **cask)
+            for token, cask in state['casks'].items()
+        ],
+    }}))
+elif command == 'tap' and not names:
+    print('\\n'.join(state['taps']))
+elif command == 'tap':
+    state['taps'].extend(names)
+elif command in ('install', 'upgrade', 'uninstall'):
+    for name in names:
+        if name in state['broken']:
+            sys.stderr.write('Error: {{0}} is broken\\n'.format(name))
+            rc = 1
+            continue
+        if command == 'uninstall':
+            if name not in state[kind]:
+                sys.stderr.write('Error: No such keg: {{0}}\\n'.format(name))
+                rc = 1
+                continue
+            del state[kind][name]
+        else:
+            state[kind].setdefault(name, {{'aliases': []}})['outdated'] = False
+
+with open(STATE_PATH, 'w') as state_file:
+    json.dump(state, state_file)
+sys.exit(rc)
+"""
+
+
+@pytest.fixture
+def brew_state(stub_bin_dir, tmp_path):
+    """Install a stateful ``brew`` stub and return its state file."""
+    state_path = tmp_path / 'brew-state.json'
+    state_path.write_text(json.dumps({
+        'formulae': {
+            'git': {'outdated': True, 'aliases': []},
+            'python@3.11': {'outdated': False, 'aliases': ['python3']},
+            'node': {'outdated': False, 'aliases': []},
+        },
+        'casks': {'firefox': {'outdated': False}},
+        'taps': ['homebrew/core'],
+        'broken': [],
+        'calls': [],
+    }))
+    write_stub_command(
+        stub_bin_dir, 'brew',
+        BREW_STUB_SOURCE.format(state_path=str(state_path)),
+    )
+    return state_path
+
+
+def _load_state(state_path):  # type: (...) -> dict
+    return json.loads(state_path.read_text())
+
+
+def _set_broken(state_path, broken):  # type: (...) -> None
+    state = _load_state(state_path)
+    state['broken'] = broken
+    state_path.write_text(json.dumps(state))
+
+
+def _by_name(result):  # type: (dict) -> dict[str, dict]
+    return {package['name']: package for package in result['packages']}
+
+
+def test_reconcile_batches_commands(monkeypatch, brew_state):
+    """Check that one update and one command per action are run."""
+    result = run_module(monkeypatch, homebrew_reconcile.main, {
+        'taps': ['hashicorp/tap'],
+        'packages': [
+            'git', 'jq', 'wget', 'python3',
+            {'name': 'node', 'state': 'absent'},
+            {'name': 'ffmpeg', 'install_options': ['with-fdk-aac']},
+        ],
+        'casks': ['firefox', 'iterm2'],
+    })
+
+    calls = _load_state(brew_state)['calls']
+    assert calls == [
+        ['update'],
+        ['tap'],
+        ['info', '--json=v2', '--installed'],
+        ['tap', 'hashicorp/tap'],
+        ['install', 'ffmpeg', '--with-fdk-aac'],
+        ['install', 'jq', 'wget'],
+        ['upgrade', 'git'],
+        ['uninstall', 'node'],
+        ['install', '--cask', 'iterm2'],
+    ]
+    assert result['changed']
+    assert result['updated']
+    assert result['failed_packages'] == []
+
+    packages = _by_name(result)
+    assert packages['python3']['action'] == 'none'
+    assert packages['git']['action'] == 'upgrade'
+    assert packages['node']['action'] == 'uninstall'
+    assert packages['firefox']['changed'] is False
+    assert packages['hashicorp/tap']['kind'] == 'tap'
+
+
+def test_reconcile_is_idempotent(monkeypatch, brew_state):
+    """Check that an already reconciled host only gets read."""
+    result = run_module(monkeypatch, homebrew_reconcile.main, {
+        'packages': ['git', 'node'],
+        'casks': ['firefox'],
+        'state': 'present',
+        'update_homebrew': False,
+    })
+
+    assert not result['changed']
+    assert _load_state(brew_state)['calls'] == [
+        ['info', '--json=v2', '--installed'],
+    ]
+
+
+def test_reconcile_check_mode(monkeypatch, brew_state):
+    """Check that check mode plans without touching Homebrew."""
+    result = run_module(monkeypatch, homebrew_reconcile.main, {
+        'packages': ['jq'],
+        '_ansible_check_mode': True,
+    })
+
+    assert result['changed']
+    assert not result['updated']
+    assert _by_name(result)['jq']['action'] == 'install'
+    assert _load_state(brew_state)['calls'] == [
+        ['info', '--json=v2', '--installed'],
+    ]
+
+
+def test_reconcile_attributes_batch_failures(monkeypatch, brew_state):
+    """Check that a failing batch is retried per package."""
+    _set_broken(brew_state, ['wget'])
+
+    result = run_module(monkeypatch, homebrew_reconcile.main, {
+        'packages': ['jq', 'wget', 'tree'],
+        'update_homebrew': False,
+        'fail_on_error': False,
+    })
+
+    packages = _by_name(result)
+    assert result['failed_packages'] == ['wget']
+    assert packages['wget']['failed']
+    assert packages['wget']['msg'] == 'Error: wget is broken'
+    assert packages['jq']['changed'] and not packages['jq']['failed']
+    assert packages['tree']['changed']
+    assert _load_state(brew_state)['calls'][-1] == ['install', 'wget']
+
+
+def test_reconcile_fails_on_error(monkeypatch, brew_state):
+    """Check that package failures fail the task by default."""
+    _set_broken(brew_state, ['wget'])
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, homebrew_reconcile.main, {
+            'packages': ['wget'],
+            'update_homebrew': False,
+        })
+
+    assert exc_info.value.result['msg'] == 'Failed to reconcile: wget'
+    assert exc_info.value.result['failed_packages'] == ['wget']
+
+
+def test_reconcile_rejects_invalid_items(monkeypatch, brew_state):
+    """Check that malformed package entries are reported."""
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, homebrew_reconcile.main, {
+            'packages': [{'state': 'present'}],
+        })
+
+    assert 'must be a name' in exc_info.value.result['msg']
+
+
+def test_failed_update_only_warns(monkeypatch, brew_state):
+    """Check that a failing update does not stop the reconciliation."""
+    _set_broken(brew_state, ['update'])
+    warnings = []
+    monkeypatch.setattr(homebrew_reconcile.AnsibleModule, 'warn', lambda module, warning: warnings.append(warning))
+
+    result = run_module(monkeypatch, homebrew_reconcile.main, {'packages': ['jq'], 'fail_on_error': False})
+
+    assert not result['updated']
+    assert result['changed'] and result['failed_packages'] == []
+    assert warnings == ['brew update failed, using the current Homebrew index: Error: Fetching /opt/homebrew failed!']
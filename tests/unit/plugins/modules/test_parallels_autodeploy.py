@@ -0,0 +1,135 @@
+"""Unit tests for the Parallels auto-deploy preparation module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+import stat
+import zipfile
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import parallels_autodeploy
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+
+
+PACKAGE_ROOT = 'Parallels Desktop mass deployment package v1.6.1'
+SCRIPTS_DIR = PACKAGE_ROOT + '/Parallels Desktop Autodeploy/Scripts'
+DEPLOY_CFG = """\
+# Parallels Desktop mass deployment configuration
+#license_key="XXXXXX-XXXXXX-XXXXXX-XXXXXX-XXXXXX"
+# updates_auto_check="1"
+updates_auto_download="on"
+"""
+
+
+def _add_member(archive, name, data, mode=0o644):
+    info = zipfile.ZipInfo(name)
+    info.external_attr = (stat.S_IFREG | mode) << 16
+    archive.writestr(info, data)
+
+
+def _build_zip(path, deploy_cfg=DEPLOY_CFG):  # type: (...) -> str
+    with zipfile.ZipFile(str(path), 'w') as archive:
+        archive.writestr(PACKAGE_ROOT + '/', '')
+        _add_member(archive, SCRIPTS_DIR + '/prepare', '#!/bin/sh\nexit 0\n', 0o755)
+        _add_member(archive, SCRIPTS_DIR + '/License Key and Configuration/deploy.cfg', deploy_cfg)
+        _add_member(archive, SCRIPTS_DIR + '/Parallels Desktop DMG/ParallelsDesktop-0.0.0-0.dmg', '')
+    return str(path)
+
+
+@pytest.fixture
+def autodeploy_args(tmp_path):  # type: (...) -> dict
+    installer_dmg = tmp_path / 'ParallelsDesktop-16.0.0-48916.dmg'
+    installer_dmg.write_text('')
+    return {
+        'src': _build_zip(tmp_path / 'pd-autodeploy.zip'),
+        'dest': str(tmp_path / 'pd-autodeploy'),
+        'license_key': 'AAAAAA-BBBBBB-CCCCCC-DDDDDD-EEEEEE',
+        'installer_dmg': str(installer_dmg),
+    }
+
+
+def test_render_config_single_pass():
+    """Check that settings are uncommented, replaced or appended."""
+    content, changed = parallels_autodeploy.render_config(DEPLOY_CFG, {
+        'license_key': 'KEY',
+        'updates_auto_check': '0',
+        'updates_auto_download': 'off',
+        'start_as_service': 'on',
+    })
+
+    assert content.splitlines() == [
+        '# Parallels Desktop mass deployment configuration',
+        'license_key="KEY"',
+        'updates_auto_check="0"',
+        'updates_auto_download="off"',
+        'start_as_service="on"',
+    ]
+    assert changed == ['license_key', 'updates_auto_check', 'updates_auto_download', 'start_as_service']
+
+
+def test_prepare_package(monkeypatch, autodeploy_args):
+    """Check that a first run extracts, configures and links the DMG."""
+    result = run_module(monkeypatch, parallels_autodeploy.main, autodeploy_args)
+
+    assert result['changed']
+    assert result['extracted']
+    assert result['version'] == '1.6.1'
+    assert result['package_root'] == os.path.join(autodeploy_args['dest'], PACKAGE_ROOT)
+    assert os.access(os.path.join(result['scripts_dir'], 'prepare'), os.X_OK)
+
+    with open(result['config']) as config_file:
+        config = config_file.read()
+    assert 'license_key="AAAAAA-BBBBBB-CCCCCC-DDDDDD-EEEEEE"' in config
+    assert 'updates_auto_check="0"' in config
+    assert 'updates_auto_download="off"' in config
+
+    assert os.listdir(result['dmg_dir']) == ['ParallelsDesktop-16.0.0-48916.dmg']
+    assert os.readlink(os.path.join(result['dmg_dir'], 'ParallelsDesktop-16.0.0-48916.dmg')) == autodeploy_args['installer_dmg']
+
+
+def test_prepare_package_is_idempotent(monkeypatch, autodeploy_args):
+    """Check that an unchanged archive is not extracted again."""
+    run_module(monkeypatch, parallels_autodeploy.main, autodeploy_args)
+    result = run_module(monkeypatch, parallels_autodeploy.main, autodeploy_args)
+
+    assert not result['changed']
+    assert not result['extracted']
+    assert result['config_changed'] == []
+
+
+def test_prepare_package_reextracts_changed_archive(monkeypatch, autodeploy_args):
+    """Check that a new archive is extracted and configured again."""
+    first = run_module(monkeypatch, parallels_autodeploy.main, autodeploy_args)
+    _build_zip(autodeploy_args['src'], deploy_cfg=DEPLOY_CFG + '#start_as_service="off"\n')
+
+    result = run_module(monkeypatch, parallels_autodeploy.main, autodeploy_args)
+
+    assert result['extracted']
+    assert result['content_hash'] != first['content_hash']
+    assert result['config_changed'] == ['license_key', 'updates_auto_check', 'updates_auto_download']
+
+
+def test_prepare_package_check_mode(monkeypatch, autodeploy_args):
+    """Check that the version is read from the index without extracting."""
+    autodeploy_args['_ansible_check_mode'] = True
+
+    result = run_module(monkeypatch, parallels_autodeploy.main, autodeploy_args)
+
+    assert result['changed']
+    assert result['version'] == '1.6.1'
+    assert not os.path.exists(autodeploy_args['dest'])
+
+
+def test_prepare_package_rejects_unsafe_member(monkeypatch, autodeploy_args):
+    """Check that members escaping the destination are refused."""
+    with zipfile.ZipFile(autodeploy_args['src'], 'a') as archive:
+        archive.writestr('../escaped', 'boom')
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_autodeploy.main, autodeploy_args)
+
+    assert 'outside of' in exc_info.value.result['msg']
+    assert not os.path.exists(os.path.join(os.path.dirname(autodeploy_args['dest']), 'escaped'))
@@ -0,0 +1,251 @@
+"""Unit tests for the Parallels linked clone pool module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import parallels_clone_pool
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+PRLCTL_STUB_SOURCE = """
+import fcntl
+import json
+import sys
+import uuid
+
+with open({state_path!r}, 'r+') as state_file:
+    fcntl.flock(state_file, fcntl.LOCK_EX)
+    state = json.load(state_file)
+    args = sys.argv[1:]
+    state['calls'].append(args)
+    vms = state['vms']
+    rc = 0
+
+    if args[0] == 'list':
+        print(json.dumps([dict(vm, ip_configured='-') for vm in vms]))
+    elif args[0] == 'clone':
+        name = args[args.index('--name') + 1]
+        if name in state['broken'] or any(vm['name'] == name for vm in vms):
+            sys.stderr.write('Failed to clone the VM: {{0}}\\n'.format(name))
+            rc = 1
+        else:
+            vms.append({{'name': name, 'uuid': '{{%s}}' % uuid.uuid4(), 'status': 'stopped'}})
+    else:
+        matches = [vm for vm in vms if vm['name'] == args[1]]
+        if not matches or (args[0] == 'stop' and matches[0]['status'] == 'stopped'):
+            sys.stderr.write('Failed to {{0}} the VM\\n'.format(args[0]))
+            rc = 1
+        elif args[0] == 'stop':
+            matches[0]['status'] = 'stopped'
+        elif args[0] == 'delete' and args[1] in state['undeletable']:
+            sys.stderr.write('Failed to delete the VM\\n')
+            rc = 1
+        elif args[0] == 'delete':
+            vms.remove(matches[0])
+
+    state_file.seek(0)
+    state_file.truncate()
+    json.dump(state, state_file)
+sys.exit(rc)
+"""
+
+
+@pytest.fixture
+def pool_env(stub_bin_dir, tmp_path):
+    """Install a stateful ``prlctl`` stub and return the module arguments."""
+    state_path = tmp_path / 'prlctl-state.json'
+    state_path.write_text(json.dumps({
+        'vms': [{'name': 'macOS-template', 'uuid': '{00000000-0000-4000-8000-000000000000}', 'status': 'stopped'}],
+        'broken': [],
+        'undeletable': [],
+        'calls': [],
+    }))
+    write_stub_command(stub_bin_dir, 'prlctl', PRLCTL_STUB_SOURCE.format(state_path=str(state_path)))
+    return {
+        'args': {
+            'pool': 'ci',
+            'template': 'macOS-template',
+            'size': 3,
+            'index_dir': str(tmp_path / 'pools'),
+        },
+        'state_path': state_path,
+        'index_path': tmp_path / 'pools' / 'ci.json',
+    }
+
+
+def _prlctl_state(pool_env):  # type: (dict) -> dict
+    return json.loads(pool_env['state_path'].read_text())
+
+
+def _vm_names(pool_env):  # type: (dict) -> list[str]
+    return sorted(vm['name'] for vm in _prlctl_state(pool_env)['vms'] if vm['name'].startswith('ci-'))
+
+
+def _wait_for_background(pool_env):  # type: (dict) -> None
+    """Reap the background workers, as init would once the module exits."""
+    index = json.loads(pool_env['index_path'].read_text())
+    for clone in index['clones'].values():
+        if clone.get('pid'):
+            try:
+                os.waitpid(clone['pid'], 0)
+            except OSError:
+                pass
+
+
+def _run(monkeypatch, pool_env, **args):  # type: (...) -> dict
+    return run_module(monkeypatch, parallels_clone_pool.main, dict(pool_env['args'], **args))
+
+
+def test_fill_pool(monkeypatch, pool_env):
+    """Check that the pool is filled and then left alone."""
+    first = _run(monkeypatch, pool_env)
+    second = _run(monkeypatch, pool_env)
+
+    assert first['created'] == ['ci-0001', 'ci-0002', 'ci-0003']
+    assert first['pool_status']['ready'] == 3
+    assert _vm_names(pool_env) == ['ci-0001', 'ci-0002', 'ci-0003']
+    assert not second['changed']
+    assert ['clone', 'macOS-template', '--name', 'ci-0001', '--linked'] in _prlctl_state(pool_env)['calls']
+
+
+def test_acquire_and_top_up(monkeypatch, pool_env):
+    """Check that a lease is instant and the pool refilled in background."""
+    _run(monkeypatch, pool_env)
+
+    result = _run(monkeypatch, pool_env, state='acquired')
+    _wait_for_background(pool_env)
+
+    assert result['clone']['name'] == 'ci-0001'
+    assert result['clone']['uuid'] in [vm['uuid'].strip('{}') for vm in _prlctl_state(pool_env)['vms']]
+    assert result['created'] == []
+    assert result['scheduled'] == ['ci-0004']
+    assert _vm_names(pool_env) == ['ci-0001', 'ci-0002', 'ci-0003', 'ci-0004']
+
+    status = _run(monkeypatch, pool_env)['pool_status']
+    assert status['ready'] == 3
+    assert status['leased'] == 1
+
+
+def test_acquire_from_empty_pool(monkeypatch, pool_env):
+    """Check that an empty pool creates the leased clone on the spot."""
+    result = _run(monkeypatch, pool_env, state='acquired', size=1)
+    _wait_for_background(pool_env)
+
+    assert result['created'] == ['ci-0001']
+    assert result['clone']['name'] == 'ci-0001'
+    assert result['scheduled'] == ['ci-0002']
+
+
+def test_release_recycles_clone(monkeypatch, pool_env):
+    """Check that a released clone is recreated from the template."""
+    _run(monkeypatch, pool_env, size=1)
+    lease = _run(monkeypatch, pool_env, state='acquired', size=1)
+    _wait_for_background(pool_env)
+
+    result = _run(monkeypatch, pool_env, state='released', clone='ci-0001', size=1)
+    assert result['scheduled'] == ['ci-0001']
+    assert result['pool_status']['recycling'] == 1
+    _wait_for_background(pool_env)
+
+    status = _run(monkeypatch, pool_env, size=2)
+    assert status['pool_status'] == {
+        'ready': 2, 'leased': 0, 'creating': 0, 'recycling': 0, 'deleting': 0, 'stale': 0,
+    }
+    new_uuid = [vm['uuid'] for vm in _prlctl_state(pool_env)['vms'] if vm['name'] == 'ci-0001'][0]
+    assert new_uuid.strip('{}') != lease['clone']['uuid']
+
+
+def test_release_without_recycle(monkeypatch, pool_env):
+    """Check that a released clone is only destroyed without recycling."""
+    _run(monkeypatch, pool_env, size=1)
+    _run(monkeypatch, pool_env, state='acquired', size=0)
+
+    _run(monkeypatch, pool_env, state='released', clone='ci-0001', recycle=False)
+    _wait_for_background(pool_env)
+
+    assert _vm_names(pool_env) == []
+    assert _run(monkeypatch, pool_env, size=0)['pool_status']['deleting'] == 0
+
+
+def test_failed_recycle_is_not_leased_again(monkeypatch, pool_env):
+    """Check that a clone whose recycle failed to delete it is destroyed, not leased."""
+    _run(monkeypatch, pool_env, size=1)
+    lease = _run(monkeypatch, pool_env, state='acquired', size=0)
+    state = _prlctl_state(pool_env)
+    state['undeletable'] = ['ci-0001']
+    pool_env['state_path'].write_text(json.dumps(state))
+
+    _run(monkeypatch, pool_env, state='released', clone='ci-0001')
+    _wait_for_background(pool_env)
+    result = _run(monkeypatch, pool_env, size=1)
+    _wait_for_background(pool_env)
+
+    assert result['scheduled'] == ['ci-0001']
+    assert result['created'] == ['ci-0002']
+    assert result['pool_status']['ready'] == 1
+    assert _run(monkeypatch, pool_env, state='acquired', size=0)['clone']['name'] == 'ci-0002'
+    assert lease['clone']['name'] == 'ci-0001'
+
+
+def test_absent_skips_busy_clones(monkeypatch, pool_env):
+    """Check that clones with live background work are not deleted under it."""
+    _run(monkeypatch, pool_env, size=1)
+    index = json.loads(pool_env['index_path'].read_text())
+    index['clones']['ci-0001'].update(state='creating', pid=os.getpid())
+    pool_env['index_path'].write_text(json.dumps(index))
+
+    result = _run(monkeypatch, pool_env, state='absent')
+
+    assert result['scheduled'] == []
+    assert result['pool_status']['creating'] == 1
+    assert json.loads(pool_env['index_path'].read_text())['clones']['ci-0001']['pid'] == os.getpid()
+
+
+def test_absent_destroys_pool(monkeypatch, pool_env):
+    """Check that every clone is scheduled for removal."""
+    _run(monkeypatch, pool_env)
+
+    result = _run(monkeypatch, pool_env, state='absent')
+    _wait_for_background(pool_env)
+
+    assert result['scheduled'] == ['ci-0001', 'ci-0002', 'ci-0003']
+    assert _vm_names(pool_env) == []
+    assert [vm['name'] for vm in _prlctl_state(pool_env)['vms']] == ['macOS-template']
+
+
+def test_clone_failure(monkeypatch, pool_env):
+    """Check that failed clones are reported and the others kept."""
+    state = _prlctl_state(pool_env)
+    state['broken'] = ['ci-0002']
+    pool_env['state_path'].write_text(json.dumps(state))
+
+    with pytest.raises(ModuleExit) as exc_info:
+        _run(monkeypatch, pool_env)
+
+    assert exc_info.value.result['created'] == ['ci-0001', 'ci-0003']
+    assert 'ci-0002: Failed to clone the VM: ci-0002' in exc_info.value.result['msg']
+
+
+def test_release_unknown_clone(monkeypatch, pool_env):
+    """Check that only clones of the pool can be released."""
+    with pytest.raises(ModuleExit) as exc_info:
+        _run(monkeypatch, pool_env, state='released', clone='macOS-template')
+
+    assert exc_info.value.result['msg'] == 'macOS-template is not a clone of the ci pool'
+
+
+def test_check_mode_without_index(monkeypatch, pool_env):
+    """Check that check mode treats a missing index as an empty pool and leaves it missing."""
+    result = _run(monkeypatch, pool_env, _ansible_check_mode=True)
+
+    assert result['changed']
+    assert result['pool_status']['ready'] == 0
+    assert not pool_env['index_path'].parent.exists()
+    assert _vm_names(pool_env) == []
@@ -0,0 +1,300 @@
+"""Unit tests for the Parallels Desktop app state modules."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import errno
+import json
+import signal
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.module_utils.progress import ProgressFile
+from ansible_collections.samdoran.macos.plugins.modules import parallels_desktop
+from ansible_collections.samdoran.macos.plugins.modules import parallels_desktop_status
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+# NOTE: VMs listed in `stubborn` ignore the ACPI shutdown request and only
+# NOTE: the app instances listed in `quitting` obey `osascript`.
+STUB_PREAMBLE = """
+import json
+import sys
+
+STATE_PATH = {state_path!r}
+
+with open(STATE_PATH) as state_file:
+    state = json.load(state_file)
+args = sys.argv[1:]
+state['calls'].append(args)
+"""
+
+STUB_EPILOGUE = """
+with open(STATE_PATH, 'w') as state_file:
+    json.dump(state, state_file)
+"""
+
+STUB_SOURCES = {
+    'pgrep': """
+for pid in state['app_pids']:
+    print(pid)
+""",
+    'osascript': """
+state['app_pids'] = [pid for pid in state['app_pids'] if pid not in state['quitting']]
+""",
+    'prlctl': """
+if args[0] == 'list':
+    print('UUID                                    STATUS       IP_ADDR         NAME')
+    for uuid in state['running_vms']:
+        print('{0}  running      -               guest'.format(uuid))
+elif args[0] == 'stop' and (args[2] == '--kill' or args[1] not in state['stubborn']):
+    state['running_vms'].remove(args[1])
+""",
+}
+
+# NOTE: `pgrep` exits with 1 when nothing matches.
+PGREP_EXIT = """
+sys.exit(0 if state['app_pids'] else 1)
+"""
+
+
+@pytest.fixture
+def app_state(stub_bin_dir, tmp_path, monkeypatch):
+    """Install stateful ``pgrep``, ``osascript`` and ``prlctl`` stubs."""
+    state_path = tmp_path / 'app-state.json'
+    state_path.write_text(json.dumps({
+        'app_pids': [4242],
+        'quitting': [4242],
+        'running_vms': ['{vm-1}', '{vm-2}'],
+        'stubborn': ['{vm-2}'],
+        'calls': [],
+    }))
+    for name, source in STUB_SOURCES.items():
+        epilogue = STUB_EPILOGUE + (PGREP_EXIT if name == 'pgrep' else '')
+        write_stub_command(
+            stub_bin_dir, name,
+            STUB_PREAMBLE.format(state_path=str(state_path)) + source + epilogue,
+        )
+    monkeypatch.setattr(parallels_desktop, 'VM_SHUTDOWN_GRACE_DELAY', 1)
+    monkeypatch.setattr(parallels_desktop, 'VM_SHUTDOWN_POLL_INTERVAL', 0.1)
+    monkeypatch.setattr(parallels_desktop, 'APP_EXIT_POLL_INTERVAL', 0.01)
+    return state_path
+
+
+@pytest.fixture
+def signals(monkeypatch, app_state):
+    """Route the signals sent to the app instances to the stub state.
+
+    Instances listed in ``ignoring`` survive ``SIGTERM`` and the ones listed
+    in ``foreign`` belong to another user.
+    """
+    sent = []
+    state_lock = threading.Lock()
+
+    def kill(pid, process_signal):
+        with state_lock:
+            sent.append((pid, process_signal))
+            state = json.loads(app_state.read_text())
+            if pid in state.get('foreign', []):
+                raise PermissionError(errno.EPERM, 'Operation not permitted')
+            if process_signal == signal.SIGKILL or pid not in state.get('ignoring', []):
+                state['app_pids'] = [app_pid for app_pid in state['app_pids'] if app_pid != pid]
+            app_state.write_text(json.dumps(state))
+
+    monkeypatch.setattr(parallels_desktop.os, 'kill', kill)
+    return sent
+
+
+def _calls(state_path):  # type: (...) -> list[list[str]]
+    return json.loads(state_path.read_text())['calls']
+
+
+def _update_state(state_path, **changes):  # type: (...) -> None
+    state_path.write_text(json.dumps(dict(json.loads(state_path.read_text()), **changes)))
+
+
+def _outcomes(processes):  # type: (list[dict]) -> list[tuple[int, str]]
+    return [(process['pid'], process['outcome']) for process in processes]
+
+
+def test_termination_reports_progress(monkeypatch, tmp_path, app_state):
+    """Check that each termination stage lands in the progress file."""
+    progress_path = tmp_path / 'progress.json'
+
+    result = run_module(monkeypatch, parallels_desktop.ParallelsDesktopAnsibleModule.execute, {
+        'state': 'terminated',
+        'progress_file': str(progress_path),
+    })
+
+    assert result['changed']
+    assert ['stop', '{vm-2}', '--kill'] in _calls(app_state)
+
+    progress = json.loads(progress_path.read_text())
+    assert progress['finished'] and not progress['failed']
+    assert progress['msg'] == result['msg']
+    assert progress['requested_state'] == 'terminated'
+    assert [event['stage'] for event in progress['events']] == [
+        'checking_app',
+        'stopping_vms',
+        'waiting_for_vms',
+        'killing_vms',
+        'quitting_app',
+        'finished',
+    ]
+    waiting = progress['events'][2]['details']
+    assert waiting['remaining_vms'] == ['{vm-1}', '{vm-2}']
+    assert progress['events'][3]['details'] == {'remaining_vms': ['{vm-2}']}
+    assert progress['events'][4]['details']['pids'] == [4242]
+    assert _outcomes(result['processes']) == [(4242, 'terminated')]
+
+
+def test_termination_of_several_instances(monkeypatch, app_state, signals):
+    """Check that every instance is escalated until it exits."""
+    _update_state(app_state, app_pids=[4444, 4242, 4343], ignoring=[4444])
+
+    result = run_module(monkeypatch, parallels_desktop.ParallelsDesktopAnsibleModule.execute, {
+        'state': 'murdered',
+    })
+
+    assert result['changed']
+    assert 'PIDs: `4242, 4343, 4444`) has been murdered.' in result['msg']
+    assert _outcomes(result['processes']) == [(4242, 'terminated'), (4343, 'killed'), (4444, 'murdered')]
+    assert not any(process['errors'] for process in result['processes'])
+    assert sorted(signals[:2]) == [(4343, signal.SIGTERM), (4444, signal.SIGTERM)]
+    assert signals[2:] == [(4444, signal.SIGKILL)]
+    seconds = [process['seconds'] for process in result['processes']]
+    assert seconds == sorted(seconds)
+
+
+def test_termination_in_check_mode(monkeypatch, app_state, signals):
+    """Check that check mode does not claim any instance exited."""
+    _update_state(app_state, app_pids=[4242, 4343])
+
+    result = run_module(monkeypatch, parallels_desktop.ParallelsDesktopAnsibleModule.execute, {
+        'state': 'murdered',
+        '_ansible_check_mode': True,
+    })
+
+    assert result['changed']
+    assert [(process['outcome'], process['seconds']) for process in result['processes']] == [('running', None)] * 2
+    assert signals == []
+    assert json.loads(app_state.read_text())['app_pids'] == [4242, 4343]
+
+
+def test_termination_timeout_reports_survivors(monkeypatch, app_state, signals):
+    """Check that instances surviving the requested method fail the run."""
+    _update_state(app_state, app_pids=[4242, 4343], ignoring=[4343])
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_desktop.ParallelsDesktopAnsibleModule.execute, {
+            'state': 'killed',
+        })
+
+    result = exc_info.value.result
+    assert exc_info.value.failed and not result['changed']
+    assert result['msg'].endswith('Timed out waiting for PIDs 4343.')
+    assert _outcomes(result['processes']) == [(4242, 'terminated'), (4343, 'running')]
+    assert result['processes'][1]['seconds'] is None
+    assert signals == [(4343, signal.SIGTERM)]
+
+
+def test_foreign_instance(monkeypatch, app_state, signals):
+    """Check that an instance that cannot be signalled is reported."""
+    _update_state(app_state, app_pids=[4242, 4343], quitting=[], foreign=[4343])
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_desktop.ParallelsDesktopAnsibleModule.execute, {
+            'state': 'murdered',
+        })
+
+    result = exc_info.value.result
+    assert list(result['cmd']) == ['kill', '-SIGKILL', '4343']
+    assert _outcomes(result['processes']) == [(4242, 'killed'), (4343, 'running')]
+    assert result['processes'][1]['errors'] == [
+        '[rc=1] Running `kill -SIGTERM 4343` was unsuccessful',
+        '[rc=1] Running `kill -SIGKILL 4343` was unsuccessful',
+    ]
+
+
+def test_graceful_shutdown_does_not_wait_for_the_delay(monkeypatch, app_state):
+    """Check that the grace delay ends once every VM is gone."""
+    state = json.loads(app_state.read_text())
+    state['stubborn'] = []
+    app_state.write_text(json.dumps(state))
+    monkeypatch.setattr(parallels_desktop, 'VM_SHUTDOWN_GRACE_DELAY', 600)
+
+    run_module(monkeypatch, parallels_desktop.ParallelsDesktopAnsibleModule.execute, {
+        'state': 'terminated',
+    })
+
+    assert not [call for call in _calls(app_state) if '--kill' in call]
+
+
+def test_facts_failure_only_warns(monkeypatch, app_state, signals):
+    """Check that the achieved state is reported when the facts cannot be gathered."""
+    warnings = []
+
+    def broken_facts(module, sdk_version_cache=None):
+        raise ValueError('No JSON object could be decoded')
+
+    monkeypatch.setattr(parallels_desktop, 'gather_parallels_facts', broken_facts)
+    monkeypatch.setattr(parallels_desktop.ParallelsDesktopAnsibleModule, 'warn', lambda module, msg: warnings.append(msg))
+
+    result = run_module(monkeypatch, parallels_desktop.ParallelsDesktopAnsibleModule.execute, {
+        'state': 'murdered',
+        'gather_facts': True,
+    })
+
+    assert result['changed']
+    assert 'ansible_facts' not in result
+    assert warnings == ['Unable to gather the Parallels facts: No JSON object could be decoded']
+
+
+def test_status_of_a_finished_run(monkeypatch, tmp_path, app_state):
+    """Check that the status module reports a completed run."""
+    progress_path = tmp_path / 'progress.json'
+    run_module(monkeypatch, parallels_desktop.ParallelsDesktopAnsibleModule.execute, {
+        'state': 'terminated',
+        'progress_file': str(progress_path),
+    })
+
+    status = run_module(monkeypatch, parallels_desktop_status.main, {'path': str(progress_path)})
+
+    assert status['exists'] and status['finished']
+    assert not status['running'] and not status['failed_run']
+    assert status['stage'] == 'finished'
+    assert status['run_msg'].startswith('Achieving the `terminated` state succeeded.')
+    assert not status['changed']
+
+
+def test_status_of_an_unfinished_run(monkeypatch, tmp_path):
+    """Check that a run is only reported running while its process lives."""
+    gone = subprocess.Popen([sys.executable, '-c', 'pass'])
+    gone.wait()
+    progress_path = tmp_path / 'progress.json'
+    progress = ProgressFile(str(progress_path), requested_state='murdered')
+    progress.update('waiting_for_vms', remaining_vms=['{vm-2}'], grace_seconds_left=12.5)
+
+    alive = run_module(monkeypatch, parallels_desktop_status.main, {'path': str(progress_path)})
+    progress.document['pid'] = gone.pid
+    progress.refresh(grace_seconds_left=7.5)
+    dead = run_module(monkeypatch, parallels_desktop_status.main, {'path': str(progress_path)})
+
+    assert alive['running'] and not alive['finished']
+    assert alive['details'] == {'remaining_vms': ['{vm-2}'], 'grace_seconds_left': 12.5}
+    assert not dead['running']
+    assert dead['details']['grace_seconds_left'] == 7.5
+    assert len(dead['events']) == 1
+
+
+def test_status_before_the_file_exists(monkeypatch, tmp_path):
+    """Check that a missing progress file is not an error."""
+    status = run_module(monkeypatch, parallels_desktop_status.main, {'path': str(tmp_path / 'nope.json')})
+
+    assert not status['exists']
+    assert not status['finished'] and not status['running']
@@ -0,0 +1,169 @@
+"""Unit tests for the Parallels SDK install module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import parallels_sdk_install
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+SDK_PKG = 'Parallels Virtualization SDK.pkg'
+
+STUB_PREAMBLE = """
+import json
+import os
+import plistlib
+import sys
+
+STATE_PATH = {state_path!r}
+
+with open(STATE_PATH) as state_file:
+    state = json.load(state_file)
+args = sys.argv[1:]
+state['calls'].append([os.path.basename(sys.argv[0])] + args)
+rc = 0
+"""
+
+STUB_EPILOGUE = """
+with open(STATE_PATH, 'w') as state_file:
+    json.dump(state, state_file)
+sys.exit(rc)
+"""
+
+# NOTE: `attach` mounts the image at `volume` and `installer` records the
+# NOTE: version of the image as the receipt version, unless `broken` is set.
+STUB_SOURCES = {
+    'pkgutil': """
+receipts = dict(state['receipts'], **{'com.apple.pkg.Safari': '17.0'})
+if args == ['--pkgs']:
+    print('\\n'.join(sorted(receipts)))
+else:
+    sys.stdout.write(plistlib.dumps({'pkgid': args[1], 'pkg-version': receipts[args[1]]}).decode())
+""",
+    'hdiutil': """
+images = [
+    {'image-path': path, 'system-entities': [{'content-hint': 'GUID_partition_scheme'}, {'mount-point': mount}]}
+    for path, mount in state['mounted'].items()
+]
+if args[0] == 'info':
+    sys.stdout.write(plistlib.dumps({'images': images}).decode())
+elif args[0] == 'attach':
+    state['mounted'][args[-1]] = state['volume']
+    sys.stdout.write(plistlib.dumps({'system-entities': [{'mount-point': state['volume']}]}).decode())
+elif args[0] == 'detach':
+    state['mounted'] = dict((path, mount) for path, mount in state['mounted'].items() if mount != args[-1])
+""",
+    'installer': """
+if state['broken'] or not os.path.exists(args[1]):
+    sys.stderr.write('installer: Error - the package path specified was invalid\\n')
+    rc = 1
+else:
+    state['receipts'] = {'com.parallels.pkg.sdk': state['image_version']}
+""",
+}
+
+
+@pytest.fixture
+def host(stub_bin_dir, tmp_path):
+    """Install ``pkgutil``, ``hdiutil`` and ``installer`` stubs and return their state file."""
+    dmg = tmp_path / 'sdk.dmg'
+    dmg.write_text('')
+    volume = tmp_path / 'Volumes' / 'Parallels Virtualization SDK'
+    (volume / SDK_PKG).mkdir(parents=True)
+    state_path = tmp_path / 'state.json'
+    state_path.write_text(json.dumps({
+        'calls': [],
+        'receipts': {'com.parallels.pkg.sdk': '17.1.4'},
+        'mounted': {},
+        'volume': str(volume),
+        'image_version': '18.1.1',
+        'broken': False,
+    }))
+    for name, source in STUB_SOURCES.items():
+        write_stub_command(
+            stub_bin_dir, name,
+            STUB_PREAMBLE.format(state_path=str(state_path)) + source + STUB_EPILOGUE,
+        )
+    return state_path
+
+
+def _state(host):  # type: (...) -> dict
+    return json.loads(host.read_text())
+
+
+def _update_state(host, **changes):  # type: (...) -> None
+    host.write_text(json.dumps(dict(_state(host), **changes)))
+
+
+def _tools(host):  # type: (...) -> list[list[str]]
+    return [call[:2] for call in _state(host)['calls'] if call[0] != 'pkgutil']
+
+
+def _dmg(host):  # type: (...) -> str
+    return str(host.parent / 'sdk.dmg')
+
+
+def test_installed_sdk_is_left_alone(monkeypatch, host):
+    """Check that a matching receipt is enough, without touching the image."""
+    result = run_module(monkeypatch, parallels_sdk_install.main, {'src': _dmg(host), 'version': '17.1.4'})
+
+    assert not result['changed'] and not result['install_needed']
+    assert result['installed_version'] == '17.1.4'
+    assert result['receipts'] == ['com.parallels.pkg.sdk']
+    assert _tools(host) == []
+
+
+def test_upgrade(monkeypatch, host):
+    """Check that the image is attached, installed and detached in one run."""
+    result = run_module(monkeypatch, parallels_sdk_install.main, {'src': _dmg(host), 'version': '18.1.1'})
+
+    assert result['changed']
+    assert (result['previous_version'], result['installed_version']) == ('17.1.4', '18.1.1')
+    assert result['mount_point'] == _state(host)['volume']
+    assert not result['reused_mount']
+    assert _tools(host) == [['hdiutil', 'info'], ['hdiutil', 'attach'], ['installer', '-pkg'], ['hdiutil', 'detach']]
+    assert _state(host)['mounted'] == {}
+
+
+def test_existing_mount_is_reused(monkeypatch, host):
+    """Check that an image mounted beforehand is used and left mounted."""
+    _update_state(host, receipts={}, mounted={_dmg(host): _state(host)['volume']})
+
+    result = run_module(monkeypatch, parallels_sdk_install.main, {'src': _dmg(host)})
+
+    assert result['changed'] and result['reused_mount']
+    assert result['previous_version'] is None and result['installed_version'] == '18.1.1'
+    assert _tools(host) == [['hdiutil', 'info'], ['installer', '-pkg']]
+    assert _state(host)['mounted'] == {_dmg(host): _state(host)['volume']}
+
+
+def test_failed_install_detaches(monkeypatch, host):
+    """Check that the image is detached when the installer fails."""
+    _update_state(host, broken=True)
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_sdk_install.main, {'src': _dmg(host), 'version': '18.1.1'})
+
+    assert exc_info.value.failed and not exc_info.value.result['changed']
+    assert exc_info.value.result['stderr'].startswith('installer: Error')
+    assert _tools(host)[-1] == ['hdiutil', 'detach']
+    assert _state(host)['mounted'] == {}
+
+
+def test_check_mode(monkeypatch, host):
+    """Check that check mode reports the install without attaching the image."""
+    result = run_module(monkeypatch, parallels_sdk_install.main, {
+        'src': str(host.parent / 'not-downloaded.dmg'),
+        'version': '18.1.1',
+        '_ansible_check_mode': True,
+    })
+
+    assert result['changed'] and result['install_needed']
+    assert result['installed_version'] == '17.1.4'
+    assert _tools(host) == []
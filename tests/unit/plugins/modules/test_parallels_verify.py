@@ -0,0 +1,119 @@
+"""Unit tests for the Parallels installation verification module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+import sqlite3
+import stat
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import parallels_verify
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules import parallels_corpus
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+
+
+PARALLELS_TEAM_ID = '4C6364ACXT'
+PARALLELS_KEXTS = (
+    'com.parallels.kext.hypervisor',
+    'com.parallels.kext.netbridge',
+    'com.parallels.kext.usbconnect',
+    'com.parallels.kext.vnic',
+)
+
+
+def _write_kext_policy(path, allowed_kexts):  # type: (...) -> str
+    """Create a KextPolicy database approving *allowed_kexts*."""
+    connection = sqlite3.connect(str(path))
+    with connection:
+        connection.execute(
+            'CREATE TABLE kext_policy (team_id TEXT, bundle_id TEXT, allowed BOOLEAN, '
+            'developer_name TEXT, flags INTEGER, PRIMARY KEY (team_id, bundle_id))',
+        )
+        connection.executemany(
+            'INSERT INTO kext_policy VALUES (?, ?, ?, ?, 1)',
+            [
+                (PARALLELS_TEAM_ID, bundle_id, int(bundle_id in allowed_kexts), 'Parallels International GmbH')
+                for bundle_id in PARALLELS_KEXTS
+            ] + [('EG7KH642X6', 'com.vmware.kext.vmx86', 1, 'VMware, Inc.')],
+        )
+    connection.close()
+    os.chmod(str(path), stat.S_IRUSR)
+    return str(path)
+
+
+@pytest.fixture
+def module_args(stub_bin_dir, tmp_path):  # type: (...) -> dict
+    parallels_corpus.install_parallels_stubs(stub_bin_dir)
+    return {
+        'app_version': '16.0.0-48916',
+        'kext_policy_db': _write_kext_policy(tmp_path / 'KextPolicy', PARALLELS_KEXTS),
+        'sdk_version_cache': '',
+    }
+
+
+def test_verified_installation(monkeypatch, module_args):
+    """Check that a healthy host passes every check in one call."""
+    db_before = open(module_args['kext_policy_db'], 'rb').read()
+
+    result = run_module(monkeypatch, parallels_verify.main, module_args)
+
+    assert result['ok'] and result['failures'] == []
+    assert not result['changed']
+    assert result['checks']['kexts']['approved'] == 4
+    assert [kext['bundle_id'] for kext in result['checks']['kexts']['kexts']] == list(PARALLELS_KEXTS)
+    assert result['checks']['version'] == {'ok': True, 'expected': '16.0.0-48916', 'actual': '16.0.0-48916'}
+    assert result['checks']['license'] == {'ok': True, 'actual': 'valid'}
+    assert result['checks']['service'] == {'ok': True, 'actual': 'on'}
+    assert result['ansible_facts']['parallels']['Version']['Full'] == '16.0.0-48916'
+    assert open(module_args['kext_policy_db'], 'rb').read() == db_before
+
+
+def test_unapproved_kexts_are_reported(monkeypatch, tmp_path, module_args):
+    """Check that rows with ``allowed`` unset do not count as approvals."""
+    module_args['kext_policy_db'] = _write_kext_policy(tmp_path / 'Partial', PARALLELS_KEXTS[:2])
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_verify.main, module_args)
+
+    result = exc_info.value.result
+    assert not result['ok']
+    assert [kext['allowed'] for kext in result['checks']['kexts']['kexts']] == [True, True, False, False]
+    assert result['checks']['kexts']['approved'] == 2
+    assert result['failures'] == [
+        'Only 2 of the 4 Parallels kernel extensions are approved. '
+        'Log into the GUI, open System Preferences > Security, and click Allow.',
+    ]
+    assert result['msg'].startswith('Parallels Desktop verification failed: Only 2 of the 4')
+
+
+def test_mismatches_without_failing(monkeypatch, tmp_path, module_args):
+    """Check that every failed check is reported when failing is disabled."""
+    result = run_module(monkeypatch, parallels_verify.main, dict(
+        module_args,
+        app_version='18.1.0-53311',
+        kext_policy_db=str(tmp_path / 'missing' / 'KextPolicy'),
+        fail_on_mismatch=False,
+    ))
+
+    assert not result['ok']
+    assert result['failures'][0] == 'Parallels Desktop 16.0.0-48916 is installed instead of 18.1.0-53311'
+    assert result['failures'][1].startswith('Unable to read the kernel extension policy from ')
+    assert not os.path.exists(str(tmp_path / 'missing'))
+
+
+def test_disabled_checks_are_skipped(monkeypatch, stub_bin_dir, module_args):
+    """Check that only the requested checks run."""
+    parallels_corpus.install_parallels_stubs(stub_bin_dir, server_info_rc=1)
+
+    result = run_module(monkeypatch, parallels_verify.main, {
+        'check_kexts': False,
+        'check_license': False,
+        'check_service': False,
+        'sdk_version_cache': '',
+    })
+
+    assert result['ok']
+    assert result['checks'] == {}
@@ -0,0 +1,230 @@
+"""Unit tests for the Parallels Desktop VM power state module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import parallels_vm
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+# NOTE: VMs get their address after `ip_delay` listings, like guests that
+# NOTE: take a while to boot and report through Parallels Tools.
+PRLCTL_STUB_SOURCE = """
+import fcntl
+import json
+import sys
+import time
+
+STATE_PATH = {state_path!r}
+STATUS_AFTER = {{
+    'start': 'running', 'resume': 'running', 'restart': 'running',
+    'stop': 'stopped', 'suspend': 'suspended',
+}}
+
+
+def update_state(func):
+    with open(STATE_PATH, 'r+') as state_file:
+        fcntl.flock(state_file, fcntl.LOCK_EX)
+        state = json.load(state_file)
+        result = func(state)
+        state_file.seek(0)
+        state_file.truncate()
+        json.dump(state, state_file)
+    return result
+
+
+args = sys.argv[1:]
+if args[0] == 'list':
+    def list_vms(state):
+        state['calls'].append(['list'])
+        for vm in state['vms']:
+            if vm['status'] == 'running' and vm['ip_configured'] == '-':
+                vm['ip_delay'] -= 1
+                if vm['ip_delay'] <= 0:
+                    vm['ip_configured'] = vm['ip']
+        return [
+            dict((key, vm[key]) for key in ('uuid', 'status', 'ip_configured', 'name'))
+            for vm in state['vms']
+        ]
+    print(json.dumps(update_state(list_vms)))
+    sys.exit(0)
+
+action, uuid = args[0], args[1]
+started = time.time()
+time.sleep(0.2)
+
+
+def apply_action(state):
+    state['calls'].append(args + [started, time.time()])
+    vm = [vm for vm in state['vms'] if vm['uuid'].strip('{{}}') == uuid.strip('{{}}')][0]
+    if vm['name'] in state['broken']:
+        return 'Failed to {{0}} the VM: operation failed'.format(action)
+    vm['status'] = STATUS_AFTER[action]
+    if vm['status'] != 'running':
+        vm['ip_configured'] = '-'
+    return None
+
+
+error = update_state(apply_action)
+if error:
+    sys.stderr.write(error + '\\n')
+    sys.exit(1)
+"""
+
+
+def _vm(index, status, ip_delay=1):  # type: (int, str, int) -> dict
+    return {
+        'uuid': '{{0000000{0}-0000-4000-8000-000000000000}}'.format(index),
+        'name': 'ci-guest-000{0}'.format(index),
+        'status': status,
+        'ip': '10.0.0.{0}'.format(index),
+        'ip_configured': '10.0.0.{0}'.format(index) if status == 'running' else '-',
+        'ip_delay': ip_delay,
+    }
+
+
+@pytest.fixture
+def prlctl_state(stub_bin_dir, tmp_path):
+    """Install a stateful ``prlctl`` stub and return its state file."""
+    state_path = tmp_path / 'prlctl-state.json'
+    state_path.write_text(json.dumps({
+        'vms': [
+            _vm(1, 'stopped', ip_delay=2),
+            _vm(2, 'stopped'),
+            _vm(3, 'suspended'),
+            _vm(4, 'running'),
+        ],
+        'broken': [],
+        'calls': [],
+    }))
+    write_stub_command(stub_bin_dir, 'prlctl', PRLCTL_STUB_SOURCE.format(state_path=str(state_path)))
+    return state_path
+
+
+def _load_state(state_path):  # type: (...) -> dict
+    return json.loads(state_path.read_text())
+
+
+def _update_state(state_path, **changes):  # type: (...) -> None
+    state = _load_state(state_path)
+    state.update(changes)
+    state_path.write_text(json.dumps(state))
+
+
+def _action_calls(state_path):  # type: (...) -> list[list]
+    return [call for call in _load_state(state_path)['calls'] if call[0] != 'list']
+
+
+def test_start_vms_concurrently(monkeypatch, prlctl_state):
+    """Check that VMs are started in parallel and waited for."""
+    result = run_module(monkeypatch, parallels_vm.main, {
+        'name': ['ci-guest-0001', 'ci-guest-0002', 'ci-guest-0003', 'ci-guest-0004'],
+        'wait_for_ip': True,
+        'poll_interval': 0.05,
+    })
+
+    vms = dict((vm['name'], vm) for vm in result['vms'])
+    assert result['changed']
+    assert vms['ci-guest-0001']['actions'] == ['start']
+    assert vms['ci-guest-0003']['actions'] == ['resume']
+    assert vms['ci-guest-0004']['actions'] == []
+    assert not vms['ci-guest-0004']['changed']
+    for vm in vms.values():
+        assert vm['status'] == 'running'
+        assert vm['ready']
+        assert vm['ip'] == '10.0.0.{0}'.format(vm['name'][-1])
+    assert vms['ci-guest-0001']['transition_seconds'] >= 0.2
+
+    action_calls = _action_calls(prlctl_state)
+    assert len(action_calls) == 3
+    first_end = min(call[-1] for call in action_calls)
+    assert sum(1 for call in action_calls if call[-2] < first_end) > 1
+
+
+def test_stop_is_idempotent(monkeypatch, prlctl_state):
+    """Check that VMs already in the requested state are left alone."""
+    args = {
+        'name': ['ci-guest-0002', '{00000004-0000-4000-8000-000000000000}'],
+        'state': 'stopped',
+        'stop_mode': 'kill',
+    }
+
+    first = run_module(monkeypatch, parallels_vm.main, args)
+    second = run_module(monkeypatch, parallels_vm.main, args)
+
+    assert first['changed']
+    assert not second['changed']
+    assert [call[:3] for call in _action_calls(prlctl_state)] == [
+        ['stop', '00000004-0000-4000-8000-000000000000', '--kill'],
+    ]
+    assert first['vms'][1]['ip'] is None
+
+
+def test_check_mode_plans_only(monkeypatch, prlctl_state):
+    """Check that check mode reports the plan without running it."""
+    result = run_module(monkeypatch, parallels_vm.main, {
+        'name': ['ci-guest-0003', 'ci-guest-0004'],
+        'state': 'stopped',
+        '_ansible_check_mode': True,
+    })
+
+    assert result['changed']
+    assert [vm['actions'] for vm in result['vms']] == [['resume', 'stop'], ['stop']]
+    assert _action_calls(prlctl_state) == []
+
+
+def test_failures_are_reported_per_vm(monkeypatch, prlctl_state):
+    """Check that one failing VM does not hide the others' outcome."""
+    _update_state(prlctl_state, broken=['ci-guest-0002'])
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_vm.main, {
+            'name': ['ci-guest-0001', 'ci-guest-0002'],
+        })
+
+    vms = exc_info.value.result['vms']
+    assert exc_info.value.result['msg'] == 'Failed to bring ci-guest-0002 to running'
+    assert vms[0]['changed'] and not vms[0]['failed']
+    assert vms[1]['msg'] == 'Failed to start the VM: operation failed'
+
+
+def test_wait_for_ip_times_out(monkeypatch, prlctl_state):
+    """Check that a guest never reporting an address fails the wait."""
+    state = _load_state(prlctl_state)
+    state['vms'][1]['ip_delay'] = 1000
+    prlctl_state.write_text(json.dumps(state))
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_vm.main, {
+            'name': ['ci-guest-0002'],
+            'wait_for_ip': True,
+            'wait_timeout': 1,
+            'poll_interval': 0.1,
+        })
+
+    vm = exc_info.value.result['vms'][0]
+    assert vm['changed'] and not vm['ready']
+    assert vm['msg'] == 'Timed out waiting for a configured IP address'
+
+
+def test_unknown_vm(monkeypatch, prlctl_state):
+    """Check that unknown VMs are rejected before anything runs."""
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_vm.main, {'name': ['ci-guest-0001', 'nope']})
+
+    assert exc_info.value.result['msg'] == 'Unknown virtual machines: nope'
+    assert _action_calls(prlctl_state) == []
+
+
+def test_impossible_transition(monkeypatch, prlctl_state):
+    """Check that suspending a stopped VM is refused."""
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_vm.main, {'name': ['ci-guest-0001'], 'state': 'suspended'})
+
+    assert exc_info.value.result['vms'][0]['msg'] == 'Cannot bring a stopped VM to suspended'
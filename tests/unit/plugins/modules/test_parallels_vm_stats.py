@@ -0,0 +1,144 @@
+"""Unit tests for the Parallels VM resource sampling module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import parallels_vm_stats
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules import parallels_corpus
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+WINDOWS_UUID = 'c9eb5191-c85e-4758-bfe7-a983c79af343'
+RHEL_UUID = '39a76fba-275e-4d54-8227-281e1346641e'
+
+# NOTE: Each VM counts its own `statistics` calls, so the concurrent
+# NOTE: samples of different VMs never share a file.
+PRLCTL_STUB_SOURCE = """
+import json
+import os
+import sys
+
+STATE_DIR = {state_dir!r}
+CPU = {{{windows!r}: [10, 20, 30, 100], {rhel!r}: [50, 50, 50, 50]}}
+FAILING = {{{rhel!r}: [1]}}
+
+args = sys.argv[1:]
+if args[0] == 'list':
+    with open({vm_list!r}) as vm_list_file:
+        sys.stdout.write(vm_list_file.read())
+    sys.exit(0)
+
+uuid = args[1]
+count_path = os.path.join(STATE_DIR, uuid)
+count = int(open(count_path).read()) if os.path.exists(count_path) else 0
+with open(count_path, 'w') as count_file:
+    count_file.write(str(count + 1))
+if count in FAILING.get(uuid, []):
+    sys.stderr.write('Failed to get VM statistics\\n')
+    sys.exit(255)
+
+print('guest.cpu.usage : %d' % CPU[uuid][count % 4])
+print('guest.ram.usage : %d' % (1000 + 10 * count))
+print('devices.hdd0.read_total : %d' % (1000 * count))
+print('devices.hdd0.write_total : %d' % (500 * count))
+print('devices.sata1.read_total : %d' % (1000 * count))
+print('devices.net0.pkts_in : 4242')
+print('host.cpu.time.process : not a number')
+"""
+
+
+@pytest.fixture
+def prlctl(stub_bin_dir, tmp_path):
+    """Install a ``prlctl`` stub serving the fixture listing and statistics."""
+    state_dir = tmp_path / 'statistics'
+    state_dir.mkdir()
+    write_stub_command(stub_bin_dir, 'prlctl', PRLCTL_STUB_SOURCE.format(
+        state_dir=str(state_dir),
+        windows=WINDOWS_UUID,
+        rhel=RHEL_UUID,
+        vm_list=parallels_corpus.VM_LIST_FIXTURE,
+    ))
+    return state_dir
+
+
+def test_parse_vm_statistics():
+    """Check that only the numeric counters are kept."""
+    counters = parallels_vm_stats.parse_vm_statistics(
+        'guest.cpu.usage\t:\t12\n'
+        'guest.ram.usage : 2048.5\n'
+        'host.cpu.time.process : n/a\n'
+        'VM statistics:\n',
+    )
+
+    assert counters == {'guest.cpu.usage': 12.0, 'guest.ram.usage': 2048.5}
+
+
+@pytest.mark.parametrize(('values', 'expected'), (
+    ([], None),
+    ([7], {'min': 7, 'avg': 7, 'p95': 7}),
+    (list(range(1, 21)), {'min': 1, 'avg': 10.5, 'p95': 19}),
+    (list(range(21, 0, -1)), {'min': 1, 'avg': 11, 'p95': 20}),
+))
+def test_summarize(values, expected):
+    """Check the nearest-rank percentile summary."""
+    assert parallels_vm_stats.summarize(values) == expected
+
+
+def test_sample_running_vms(monkeypatch, prlctl):
+    """Check that every running VM is sampled and summarized."""
+    result = run_module(monkeypatch, parallels_vm_stats.main, {'window': 0.3, 'interval': 0.1})
+
+    assert not result['changed']
+    assert [vm['name'] for vm in result['vms']] == ['windows-2016', 'rhel-9']
+    windows, rhel = result['vms']
+    assert windows['samples'] == 4 and windows['failed_samples'] == 0
+    assert windows['sample_error'] is None
+    assert windows['cpu_percent'] == {'min': 10, 'avg': 40, 'p95': 100}
+    assert windows['memory_mb'] == {'min': 1000, 'avg': 1015, 'p95': 1030}
+    assert 0 < windows['disk_write_bps']['min'] < windows['disk_read_bps']['min']
+    assert rhel['samples'] == 3 and rhel['failed_samples'] == 1
+    assert rhel['sample_error'].startswith('[rc=255] Running `')
+    assert rhel['sample_error'].endswith('was unsuccessful: Failed to get VM statistics')
+    assert rhel['cpu_percent'] == {'min': 50, 'avg': 50, 'p95': 50}
+    assert result['window'] >= 0.3
+
+
+def test_unexpected_sampling_error_fails(monkeypatch, prlctl):
+    """Check that an error other than a failed command is not counted as a failed sample."""
+    def broken_parser(stdout):
+        raise ValueError('unexpected statistics line')
+
+    monkeypatch.setattr(parallels_vm_stats, 'parse_vm_statistics', broken_parser)
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_vm_stats.main, {'window': 0})
+
+    assert exc_info.value.failed
+    assert exc_info.value.result['msg'] == 'Unable to sample windows-2016: unexpected statistics line'
+
+
+def test_sample_selected_vms(monkeypatch, prlctl):
+    """Check that only the named running VMs are sampled."""
+    result = run_module(monkeypatch, parallels_vm_stats.main, {
+        'name': ['{' + RHEL_UUID + '}', 'macOS-10.15'],
+        'window': 0,
+    })
+
+    assert [vm['name'] for vm in result['vms']] == ['rhel-9']
+    assert result['vms'][0]['samples'] == 1
+    assert result['vms'][0]['disk_read_bps'] is None
+    assert sorted(path.name for path in prlctl.iterdir()) == [RHEL_UUID]
+
+
+def test_unknown_vm(monkeypatch, prlctl):
+    """Check that naming a VM that does not exist fails."""
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, parallels_vm_stats.main, {'name': ['nope']})
+
+    assert exc_info.value.failed
+    assert exc_info.value.result['msg'] == 'Unknown virtual machines: nope'
+    assert not list(prlctl.iterdir())
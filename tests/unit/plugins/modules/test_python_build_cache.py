@@ -0,0 +1,181 @@
+"""Unit tests for the libyaml and wheel build cache module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import zipfile
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import python_build_cache
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+# NOTE: `pip wheel` writes a wheel named after the requirement, plus one
+# NOTE: for each dependency listed in `DEPENDENCIES`.
+PYTHON_STUB_SOURCE = """
+import json
+import os
+import sys
+
+STATE_PATH = {state_path!r}
+DEPENDENCIES = {{'requests==2.24.0': ['idna==2.10']}}
+
+with open(STATE_PATH) as state_file:
+    state = json.load(state_file)
+args = sys.argv[1:]
+if args[0] == '-c':
+    print(json.dumps(state['info']))
+else:
+    wheel_dir = args[args.index('--wheel-dir') + 1]
+    requirement = args[-1]
+    state['builds'].append({{'requirement': requirement, 'c_include_path': os.environ.get('C_INCLUDE_PATH')}})
+    if requirement in state['broken']:
+        sys.exit('ERROR: Failed building wheel for ' + requirement)
+    for built in [requirement] + DEPENDENCIES.get(requirement, []):
+        name, version = built.split('==')
+        open(os.path.join(wheel_dir, '{{0}}-{{1}}-cp38-cp38-macosx_10_9_x86_64.whl'.format(name, version)), 'w').close()
+    with open(STATE_PATH, 'w') as state_file:
+        json.dump(state, state_file)
+"""
+
+MAKE_STUB_SOURCE = """
+import os
+import sys
+
+with open('config.prefix') as prefix_file:
+    prefix = prefix_file.read().strip()
+if sys.argv[1:] == ['install']:
+    os.makedirs(os.path.join(prefix, 'lib'))
+    os.makedirs(os.path.join(prefix, 'include'))
+    open(os.path.join(prefix, 'lib', 'libyaml.a'), 'w').close()
+    open(os.path.join(prefix, 'include', 'yaml.h'), 'w').close()
+with open({log_path!r}, 'a') as log_file:
+    log_file.write(' '.join(['make'] + sys.argv[1:]) + '\\n')
+"""
+
+CONFIGURE_SOURCE = """#!/bin/sh
+for arg in "$@"; do
+  case "$arg" in
+    --prefix=*) echo "${arg#--prefix=}" > config.prefix ;;
+  esac
+done
+"""
+
+PYTHON_INFO = {
+    'version': '3.8.6',
+    'cache_tag': 'cpython-38',
+    'platform': 'macosx-10.9-x86_64',
+    'machine': 'x86_64',
+}
+
+
+@pytest.fixture
+def build_env(stub_bin_dir, tmp_path):
+    """Install ``python3`` and ``make`` stubs and return the module arguments."""
+    state_path = tmp_path / 'python-state.json'
+    state_path.write_text(json.dumps({'info': PYTHON_INFO, 'builds': [], 'broken': []}))
+    python = write_stub_command(stub_bin_dir, 'python3', PYTHON_STUB_SOURCE.format(state_path=str(state_path)))
+    write_stub_command(stub_bin_dir, 'make', MAKE_STUB_SOURCE.format(log_path=str(tmp_path / 'make.log')))
+
+    libyaml_src = tmp_path / 'yaml-0.2.5.zip'
+    with zipfile.ZipFile(str(libyaml_src), 'w') as archive:
+        archive.writestr('yaml-0.2.5/', '')
+        archive.writestr('yaml-0.2.5/configure', CONFIGURE_SOURCE)
+
+    return {
+        'state_path': state_path,
+        'make_log': tmp_path / 'make.log',
+        'args': {
+            'python': python,
+            'packages': ['PyYAML==5.3.1', 'requests==2.24.0'],
+            'libyaml_src': str(libyaml_src),
+            'libyaml_version': '0.2.5',
+            'cache_dir': str(tmp_path / 'cache'),
+        },
+    }
+
+
+def _builds(build_env):  # type: (dict) -> list[dict]
+    return json.loads(build_env['state_path'].read_text())['builds']
+
+
+def _set_python_info(build_env, **info):  # type: (dict, str) -> None
+    state = json.loads(build_env['state_path'].read_text())
+    state['info'].update(info)
+    build_env['state_path'].write_text(json.dumps(state))
+
+
+def test_build_then_reuse(monkeypatch, build_env):
+    """Check that a second run installs nothing new."""
+    first = run_module(monkeypatch, python_build_cache.main, build_env['args'])
+    second = run_module(monkeypatch, python_build_cache.main, build_env['args'])
+
+    cache_dir = build_env['args']['cache_dir']
+    libyaml_prefix = os.path.join(cache_dir, 'libyaml', '0.2.5-x86_64')
+    assert first['changed'] and not second['changed']
+    assert first['built'] == ['PyYAML==5.3.1', 'requests==2.24.0'] and first['cached'] == []
+    assert second['built'] == [] and second['cached'] == first['built']
+    assert first['libyaml_prefix'] == second['libyaml_prefix'] == libyaml_prefix
+    assert os.path.exists(os.path.join(libyaml_prefix, 'lib', 'libyaml.a'))
+    assert first['wheelhouse'] == os.path.join(cache_dir, 'wheels', 'cpython-38-macosx-10.9-x86_64-x86_64-libyaml0.2.5')
+    assert first['wheels'] == second['wheels'] == [
+        'PyYAML-5.3.1-cp38-cp38-macosx_10_9_x86_64.whl',
+        'idna-2.10-cp38-cp38-macosx_10_9_x86_64.whl',
+        'requests-2.24.0-cp38-cp38-macosx_10_9_x86_64.whl',
+    ]
+    assert [build['c_include_path'] for build in _builds(build_env)] == [os.path.join(libyaml_prefix, 'include')] * 2
+    assert build_env['make_log'].read_text() == 'make\nmake install\n'
+
+
+def test_missing_wheel_is_rebuilt(monkeypatch, build_env):
+    """Check that only the requirement that lost a wheel is built again."""
+    first = run_module(monkeypatch, python_build_cache.main, build_env['args'])
+    os.remove(os.path.join(first['wheelhouse'], 'idna-2.10-cp38-cp38-macosx_10_9_x86_64.whl'))
+
+    second = run_module(monkeypatch, python_build_cache.main, build_env['args'])
+
+    assert second['changed']
+    assert second['built'] == ['requests==2.24.0'] and second['cached'] == ['PyYAML==5.3.1']
+    assert build_env['make_log'].read_text() == 'make\nmake install\n'
+
+
+def test_new_python_gets_its_own_wheelhouse(monkeypatch, build_env):
+    """Check that wheels built for another Python ABI are not reused."""
+    first = run_module(monkeypatch, python_build_cache.main, build_env['args'])
+    _set_python_info(build_env, version='3.9.1', cache_tag='cpython-39')
+
+    second = run_module(monkeypatch, python_build_cache.main, build_env['args'])
+
+    assert second['wheelhouse'] != first['wheelhouse']
+    assert second['built'] == first['built']
+    assert second['libyaml_prefix'] == first['libyaml_prefix']
+    assert len(_builds(build_env)) == 4
+
+
+def test_check_mode_builds_nothing(monkeypatch, build_env):
+    """Check that check mode only reports what would be built."""
+    result = run_module(monkeypatch, python_build_cache.main, dict(build_env['args'], _ansible_check_mode=True))
+
+    assert result['changed']
+    assert result['built'] == ['PyYAML==5.3.1', 'requests==2.24.0']
+    assert not os.path.exists(build_env['args']['cache_dir'])
+    assert _builds(build_env) == []
+
+
+def test_failed_build_is_not_cached(monkeypatch, build_env):
+    """Check that a failed build leaves nothing behind in the wheelhouse."""
+    state = json.loads(build_env['state_path'].read_text())
+    state['broken'] = ['requests==2.24.0']
+    build_env['state_path'].write_text(json.dumps(state))
+
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, python_build_cache.main, build_env['args'])
+
+    assert exc_info.value.failed
+    wheelhouse = python_build_cache.get_wheelhouse(build_env['args']['cache_dir'], PYTHON_INFO, '0.2.5')
+    assert sorted(os.listdir(wheelhouse)) == ['PyYAML-5.3.1-cp38-cp38-macosx_10_9_x86_64.whl', 'index.json']
@@ -0,0 +1,181 @@
+"""Unit tests for the cached software update catalog module."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.samdoran.macos.plugins.modules import softwareupdate_catalog
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import ModuleExit
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import run_module
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+CATALOG = """Software Update Tool
+
+Finding available software
+Software Update found the following new or updated software:
+* Label: Command Line Tools for Xcode-15.1
+\tTitle: Command Line Tools for Xcode, Version: 15.1, Size: 735538KiB, Recommended: YES,
+* Label: macOS Sonoma 14.4.1-23E224
+\tTitle: macOS Sonoma 14.4.1, Version: 14.4.1, Size: 6942208K, Recommended: YES, Action: restart,
+* Label: Command Line Tools for Xcode-15.3
+\tTitle: Command Line Tools for Xcode, Version: 15.3, Size: 707501KiB, Recommended: YES,
+"""
+
+LEGACY_CATALOG = """Software Update Tool
+
+Finding available software
+Software Update found the following new or updated software:
+   * Command Line Tools (macOS Mojave version 10.14) for Xcode-10.3
+\tCommand Line Tools (macOS Mojave version 10.14) for Xcode (10.3), 199140K [recommended]
+   * Security Update 2020-004-10.14.6
+\tSecurity Update 2020-004 (10.14.6), 1684800K [recommended] [restart]
+"""
+
+# NOTE: Like the real tool, the stub only offers the Command Line Tools
+# NOTE: while the on-demand marker file exists.
+SOFTWAREUPDATE_STUB_SOURCE = """
+import json
+import os
+import sys
+
+STATE_PATH = {state_path!r}
+
+with open(STATE_PATH) as state_file:
+    state = json.load(state_file)
+marker_present = os.path.exists(state['marker'])
+state['calls'].append({{'args': sys.argv[1:], 'marker_present': marker_present}})
+with open(STATE_PATH, 'w') as state_file:
+    json.dump(state, state_file)
+
+for line in state['catalog'].splitlines(True):
+    if line.lstrip().startswith('*'):
+        hidden = not marker_present and 'Command Line Tools' in line
+    if not (line.startswith(('*', '\\t')) and hidden):
+        sys.stdout.write(line)
+"""
+
+
+@pytest.fixture
+def softwareupdate_state(stub_bin_dir, tmp_path):
+    """Install a ``softwareupdate`` stub and return its state file."""
+    state_path = tmp_path / 'softwareupdate-state.json'
+    state_path.write_text(json.dumps({
+        'catalog': CATALOG,
+        'marker': str(tmp_path / 'in-progress'),
+        'calls': [],
+    }))
+    write_stub_command(stub_bin_dir, 'softwareupdate', SOFTWAREUPDATE_STUB_SOURCE.format(state_path=str(state_path)))
+    return state_path
+
+
+@pytest.fixture
+def module_args(tmp_path):  # type: (...) -> dict
+    return {
+        'name': '^Command Line Tools for Xcode-',
+        'marker': str(tmp_path / 'in-progress'),
+        'cache_path': str(tmp_path / 'cache' / 'catalog.json'),
+    }
+
+
+def _calls(state_path):  # type: (...) -> list[dict]
+    return json.loads(state_path.read_text())['calls']
+
+
+def test_parse_catalog():
+    """Check the parsing of the current ``softwareupdate`` output."""
+    updates = softwareupdate_catalog.parse_catalog(CATALOG)
+
+    assert [update['label'] for update in updates] == [
+        'Command Line Tools for Xcode-15.1',
+        'macOS Sonoma 14.4.1-23E224',
+        'Command Line Tools for Xcode-15.3',
+    ]
+    assert updates[1] == {
+        'label': 'macOS Sonoma 14.4.1-23E224',
+        'title': 'macOS Sonoma 14.4.1',
+        'version': '14.4.1',
+        'size': '6942208K',
+        'recommended': True,
+        'action': 'restart',
+    }
+
+
+def test_parse_legacy_catalog():
+    """Check the parsing of the pre-Catalina ``softwareupdate`` output."""
+    updates = softwareupdate_catalog.parse_catalog(LEGACY_CATALOG)
+
+    assert updates[0]['label'] == 'Command Line Tools (macOS Mojave version 10.14) for Xcode-10.3'
+    assert updates[0]['version'] == '10.3'
+    assert updates[0]['action'] == ''
+    assert updates[1]['title'] == 'Security Update 2020-004'
+    assert updates[1]['recommended']
+    assert updates[1]['action'] == 'restart'
+
+
+def test_scan_once_then_use_cache(monkeypatch, tmp_path, softwareupdate_state, module_args):
+    """Check that the newest label is returned and the catalog cached."""
+    first = run_module(monkeypatch, softwareupdate_catalog.main, module_args)
+    second = run_module(monkeypatch, softwareupdate_catalog.main, module_args)
+
+    assert first['label'] == second['label'] == 'Command Line Tools for Xcode-15.3'
+    assert first['version'] == '15.3'
+    assert not first['cached']
+    assert second['cached']
+    assert not first['changed'] and not second['changed']
+    assert _calls(softwareupdate_state) == [{'args': ['--list'], 'marker_present': True}]
+    # NOTE: The marker the module created is gone after the scan.
+    assert not (tmp_path / 'in-progress').exists()
+
+
+def test_existing_marker_is_kept(monkeypatch, tmp_path, softwareupdate_state, module_args):
+    """Check that a marker created by the role outlives the scan."""
+    (tmp_path / 'in-progress').write_text('')
+
+    run_module(monkeypatch, softwareupdate_catalog.main, module_args)
+
+    assert (tmp_path / 'in-progress').exists()
+
+
+def test_expired_or_forced_cache_rescans(monkeypatch, softwareupdate_state, module_args):
+    """Check that an expired cache and I(force) both scan again."""
+    run_module(monkeypatch, softwareupdate_catalog.main, module_args)
+    run_module(monkeypatch, softwareupdate_catalog.main, dict(module_args, force=True))
+    result = run_module(monkeypatch, softwareupdate_catalog.main, dict(module_args, cache_ttl=0))
+
+    assert not result['cached']
+    assert len(_calls(softwareupdate_state)) == 3
+
+
+def test_cache_is_keyed_on_the_marker(monkeypatch, softwareupdate_state, module_args):
+    """Check that a catalog scanned without the marker is not reused with it."""
+    without_marker = run_module(monkeypatch, softwareupdate_catalog.main, {
+        'marker': '',
+        'cache_path': module_args['cache_path'],
+    })
+    with_marker = run_module(monkeypatch, softwareupdate_catalog.main, module_args)
+
+    assert [update['label'] for update in without_marker['updates']] == ['macOS Sonoma 14.4.1-23E224']
+    assert 'label' not in without_marker
+    assert not with_marker['cached']
+    assert [call['marker_present'] for call in _calls(softwareupdate_state)] == [False, True]
+
+
+def test_check_mode_leaves_no_trace(monkeypatch, tmp_path, softwareupdate_state, module_args):
+    """Check that check mode neither creates the marker nor writes the cache."""
+    run_module(monkeypatch, softwareupdate_catalog.main, dict(module_args, name=None, _ansible_check_mode=True))
+
+    assert _calls(softwareupdate_state) == [{'args': ['--list'], 'marker_present': False}]
+    assert not (tmp_path / 'cache').exists()
+
+
+def test_no_matching_update(monkeypatch, softwareupdate_state, module_args):
+    """Check that a missing update fails with the scanned catalog."""
+    with pytest.raises(ModuleExit) as exc_info:
+        run_module(monkeypatch, softwareupdate_catalog.main, dict(module_args, name='^Xcode-'))
+
+    assert exc_info.value.result['msg'] == 'No update matching ^Xcode- found in the software update catalog'
+    assert len(exc_info.value.result['updates']) == 3
@@ -0,0 +1,96 @@
+"""Shared helpers for the module unit tests."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import stat
+import sys
+
+
+def write_stub_command(bin_dir, name, source):
+    """Create an executable Python stub named *name* inside *bin_dir*.
+
+    The stub runs under the interpreter executing the tests so that it
+    does not depend on any particular ``python`` being on ``PATH``.
+    """
+    stub_path = os.path.join(str(bin_dir), name)
+    with open(stub_path, 'w') as stub_file:
+        stub_file.write('#!{python}\n'.format(python=sys.executable))
+        stub_file.write(source)
+    os.chmod(
+        stub_path,
+        stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH,
+    )
+    return stub_path
+
+
+class ModuleStub:
+    """Minimal stand-in for :class:`AnsibleModule`.
+
+    It collects warnings instead of emitting them. Commands are run for
+    real by the command runner, so stub binaries on ``PATH`` get exercised.
+    """
+
+    check_mode = False
+
+    def __init__(self, params=None):  # type: (dict | None) -> None
+        self.params = params or {}
+        self.warnings = []  # type: list[str]
+
+    def warn(self, warning):  # type: (str) -> None
+        self.warnings.append(warning)
+
+    def debug(self, msg):  # type: (str) -> None
+        pass
+
+    def log(self, msg):  # type: (str) -> None
+        pass
+
+
+class ModuleExit(Exception):
+    """Carry the result of an :meth:`AnsibleModule.exit_json` call."""
+
+    def __init__(self, result, failed=False):  # type: (dict, bool) -> None
+        super(ModuleExit, self).__init__(result)
+        self.result = result
+        self.failed = failed
+
+
+def run_module(monkeypatch, entrypoint, module_args):
+    """Invoke a module entry point with *module_args*.
+
+    :returns: The result the module exited with.
+
+    :raises ModuleExit: When the module fails, with ``failed`` set.
+    """
+    from ansible.module_utils import basic
+    from ansible.module_utils.common.text.converters import to_bytes
+
+    monkeypatch.setattr(
+        basic,
+        '_ANSIBLE_ARGS',
+        to_bytes(json.dumps({'ANSIBLE_MODULE_ARGS': module_args})),
+    )
+    # NOTE: ansible-core 2.19+ also needs a serialization profile.
+    monkeypatch.setattr(basic, '_ANSIBLE_PROFILE', 'legacy', raising=False)
+
+    def exit_json(module, **kwargs):  # type: (...) -> None
+        raise ModuleExit(kwargs)
+
+    def fail_json(module, msg, **kwargs):  # type: (...) -> None
+        kwargs['msg'] = msg
+        raise ModuleExit(kwargs, failed=True)
+
+    monkeypatch.setattr(basic.AnsibleModule, 'exit_json', exit_json)
+    monkeypatch.setattr(basic.AnsibleModule, 'fail_json', fail_json)
+
+    try:
+        entrypoint()
+    except ModuleExit as module_exit:
+        if module_exit.failed:
+            raise
+        return module_exit.result
+
+    raise AssertionError('The module did not exit')
@@ -0,0 +1,183 @@
+"""Unit tests for the Xcode Command Line Tools bootstrap script."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ansible_collections.samdoran.macos.tests.unit.plugins.modules.utils import write_stub_command
+
+
+COLLECTIONS_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 6))
+ROLE_DIR = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), *[os.pardir] * 3 + ['roles', 'command_line_tools']
+))
+BOOTSTRAP_SCRIPT = os.path.join(ROLE_DIR, 'files', 'bootstrap.sh')
+
+# NOTE: The tools are only listed while the marker exists, and installing
+# NOTE: them creates the tools directory unless `broken` is set.
+SOFTWAREUPDATE_STUB_SOURCE = """
+import json
+import os
+import sys
+
+STATE_PATH = {state_path!r}
+
+with open(STATE_PATH) as state_file:
+    state = json.load(state_file)
+args = sys.argv[1:]
+state['calls'].append(args)
+if args == ['--list']:
+    print('Software Update Tool\\n\\nFinding available software')
+    print('Software Update found the following new or updated software:')
+    if os.path.exists(state['marker']):
+        for version in state['versions']:
+            print('* Label: Command Line Tools for Xcode-' + version)
+            print('\\tTitle: Command Line Tools for Xcode, Version: ' + version + ', Size: 707501KiB,')
+elif args[0] == '--install':
+    print('Downloading ' + args[1])
+    if not state['broken']:
+        os.makedirs(state['tools_dir'])
+
+with open(STATE_PATH, 'w') as state_file:
+    json.dump(state, state_file)
+sys.exit(state['broken'] if args[0] == '--install' else 0)
+"""
+
+PLAYBOOK = """
+- hosts: localhost
+  gather_facts: false
+  tasks:
+    - import_role:
+        name: samdoran.macos.command_line_tools
+        tasks_from: bootstrap.yml
+
+    - copy:
+        content: "{{{{ macos_cli_bootstrap | to_json }}}}"
+        dest: {output_path}
+"""
+
+
+@pytest.fixture
+def host(stub_bin_dir, tmp_path):
+    """Install a ``softwareupdate`` stub and return its state file."""
+    state_path = tmp_path / 'softwareupdate.json'
+    state_path.write_text(json.dumps({
+        'calls': [],
+        'versions': ['14.3', '15.3'],
+        'broken': 0,
+        'marker': str(tmp_path / 'in-progress'),
+        'tools_dir': str(tmp_path / 'CommandLineTools'),
+    }))
+    write_stub_command(stub_bin_dir, 'softwareupdate', SOFTWAREUPDATE_STUB_SOURCE.format(state_path=str(state_path)))
+    return state_path
+
+
+def _state(host):  # type: (...) -> dict
+    return json.loads(host.read_text())
+
+
+def _update_state(host, **changes):  # type: (...) -> None
+    host.write_text(json.dumps(dict(_state(host), **changes)))
+
+
+def _bootstrap(stub_bin_dir, host):  # type: (...) -> tuple[int, dict]
+    state = _state(host)
+    proc = subprocess.run(
+        ['/bin/sh', BOOTSTRAP_SCRIPT, '--tools-dir', state['tools_dir'], '--marker', state['marker']],
+        stdout=subprocess.PIPE,
+        env=dict(os.environ, PATH=os.pathsep.join((str(stub_bin_dir), '/usr/bin', '/bin'))),
+    )
+    return proc.returncode, json.loads(proc.stdout.decode().splitlines()[-1])
+
+
+def test_install(stub_bin_dir, host):
+    """Check that the newest tools are installed and the marker is removed."""
+    rc, report = _bootstrap(stub_bin_dir, host)
+
+    assert rc == 0
+    assert report['changed'] and report['installed']
+    assert report['label'] == 'Command Line Tools for Xcode-15.3'
+    assert report['msg'] == 'Installed Command Line Tools for Xcode-15.3'
+    assert isinstance(report['duration'], int)
+    assert _state(host)['calls'] == [['--list'], ['--install', 'Command Line Tools for Xcode-15.3']]
+    assert not os.path.exists(_state(host)['marker'])
+
+
+def test_already_installed(stub_bin_dir, host):
+    """Check that nothing runs when the tools are present."""
+    os.makedirs(_state(host)['tools_dir'])
+
+    rc, report = _bootstrap(stub_bin_dir, host)
+
+    assert rc == 0
+    assert not report['changed'] and report['installed']
+    assert report['label'] is None
+    assert _state(host)['calls'] == []
+
+
+def test_no_update_offered(stub_bin_dir, host):
+    """Check that a catalog without the tools is reported as a failure."""
+    _update_state(host, versions=[])
+
+    rc, report = _bootstrap(stub_bin_dir, host)
+
+    assert rc == 1
+    assert not report['changed'] and not report['installed']
+    assert report['msg'] == "No update matching 'Command Line Tools for Xcode-.*' is offered by softwareupdate"
+    assert not os.path.exists(_state(host)['marker'])
+
+
+def test_failed_install_keeps_existing_marker(stub_bin_dir, host):
+    """Check that a failed install is reported and a marker the script did not create stays."""
+    _update_state(host, broken=3)
+    open(_state(host)['marker'], 'w').close()
+
+    rc, report = _bootstrap(stub_bin_dir, host)
+
+    assert rc == 1
+    assert not report['installed']
+    assert report['msg'] == 'Installing Command Line Tools for Xcode-15.3 failed with the return code 3'
+    assert os.path.exists(_state(host)['marker'])
+
+
+def test_role_bootstrap_tasks(stub_bin_dir, tmp_path, host):
+    """Check that the role registers the script report and is idempotent."""
+    output_path = tmp_path / 'output.json'
+    playbook_path = tmp_path / 'playbook.yml'
+    playbook_path.write_text(PLAYBOOK.format(output_path=output_path))
+    state = _state(host)
+    env = dict(
+        os.environ,
+        PATH=os.pathsep.join((str(stub_bin_dir), '/usr/bin', '/bin')),
+        ANSIBLE_COLLECTIONS_PATH=COLLECTIONS_ROOT,
+        ANSIBLE_PYTHON_INTERPRETER=sys.executable,
+        ANSIBLE_LOCAL_TEMP=str(tmp_path / 'local-tmp'),
+        ANSIBLE_REMOTE_TEMP=str(tmp_path / 'remote-tmp'),
+    )
+    command = [
+        sys.executable, '-m', 'ansible', 'playbook', '-i', 'localhost,', '-c', 'local',
+        '-e', json.dumps({
+            '_macos_cli_tools_dir': state['tools_dir'],
+            '_macos_cli_inprogress_file': state['marker'],
+            'macos_cli_python_interpreter': sys.executable,
+        }),
+        str(playbook_path),
+    ]
+
+    results = []
+    for _run in range(2):
+        proc = subprocess.run(
+            command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env,
+        )
+        assert proc.returncode == 0, proc.stdout.decode()
+        results.append(json.loads(output_path.read_text()))
+
+    assert results[0]['changed'] and not results[1]['changed']
+    assert 'Installed Command Line Tools for Xcode-15.3' in results[0]['stdout']
+    assert len(_state(host)['calls']) == 2